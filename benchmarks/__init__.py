@@ -0,0 +1 @@
+"""Throughput benchmarks. Run: uv run python -m benchmarks.sps"""
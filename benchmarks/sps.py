@@ -0,0 +1,296 @@
+"""
+Steps-per-second benchmark suite for every Flappy variant, layer by layer:
+
+  raw       C vec_init/vec_step on NumPy buffers (no Python env object)
+  wrapper   the variant's Flappy / FlappyCurriculum PufferEnv
+  vector    pufferlib.vector Serial and Multiprocessing at several worker counts
+  evaluate  PuffeRL.evaluate() with the Default + LSTMWrapper policy
+
+Each layer adds one source of overhead to the one before it, so a regression
+shows up as a drop in one specific row. Results (plus host info) go to a JSON
+file; variants whose C extension is not built are recorded as skipped.
+
+Run from repo root (build the variants' C extensions first):
+  uv run python -m benchmarks.sps
+  uv run python -m benchmarks.sps --variants flappyv3 --layers raw wrapper --seconds 1
+  uv run python -m benchmarks.sps --out benchmarks/results/baseline.json
+"""
+
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+VARIANTS = {
+    "flappy_rl": {"module": "flappy_rl.flappy", "env": "Flappy", "creator": "flappy_env_creator", "curriculum": False},
+    "flappy": {"module": "variations.flappy", "env": "FlappyCurriculum", "creator": "curriculum_env_creator", "curriculum": True},
+    "flappyv2": {"module": "variations.flappyv2", "env": "FlappyCurriculum", "creator": "curriculum_env_creator", "curriculum": True},
+    "flappyv3": {"module": "variations.flappyv3", "env": "FlappyCurriculum", "creator": "curriculum_env_creator", "curriculum": True},
+}
+LAYERS = ("raw", "wrapper", "vector", "evaluate")
+OBS_DIM = 5
+
+
+def load_variant(name):
+    """Import a variant package; returns (module, None) or (None, reason)."""
+    spec = VARIANTS[name]
+    try:
+        module = importlib.import_module(spec["module"])
+    except ImportError as e:
+        return None, f"import failed: {e}"
+    if getattr(module, "binding", None) is None:
+        return None, "C extension not built"
+    return module, None
+
+
+def host_info():
+    info = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "python": platform.python_version(),
+        "cpu_count_logical": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+    try:
+        import psutil
+
+        info["cpu_count_physical"] = psutil.cpu_count(logical=False)
+        info["memory_gb"] = round(psutil.virtual_memory().total / 2**30, 1)
+    except ImportError:
+        pass
+    for pkg in ("torch", "pufferlib"):
+        try:
+            info[pkg] = importlib.import_module(pkg).__version__
+        except ImportError:
+            info[pkg] = None
+    try:
+        info["git_commit"] = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        info["git_commit"] = None
+    return info
+
+
+def _timed(step, num_agents, seconds, warmup=8, chunk=16):
+    """Call step(i) for ~seconds after a short warmup; return agent steps/sec."""
+    for i in range(warmup):
+        step(i)
+    steps = 0
+    start = time.perf_counter()
+    while True:
+        for i in range(chunk):
+            step(i)
+        steps += chunk
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return steps * num_agents / elapsed
+
+
+def _action_bank(num_agents, seed=0):
+    return np.random.default_rng(seed).integers(0, 2, size=(64, num_agents), dtype=np.int32)
+
+
+def bench_raw(name, module, num_envs, seconds, difficulty):
+    binding = module.binding
+    observations = np.zeros((num_envs, OBS_DIM), dtype=np.float32)
+    actions = np.zeros(num_envs, dtype=np.int32)
+    rewards = np.zeros(num_envs, dtype=np.float32)
+    terminals = np.zeros(num_envs, dtype=np.bool_)
+    truncations = np.zeros(num_envs, dtype=np.bool_)
+    c_envs = binding.vec_init(
+        observations, actions, rewards, terminals, truncations, num_envs, 0,
+        width=400, height=600, max_steps=5000,
+    )
+    bank = _action_bank(num_envs)
+    if VARIANTS[name]["curriculum"]:
+        binding.vec_reset(c_envs, 0, difficulty)
+
+        def step(i):
+            actions[:] = bank[i % 64]
+            binding.vec_step(c_envs, difficulty)
+    else:
+        binding.vec_reset(c_envs, 0)
+
+        def step(i):
+            actions[:] = bank[i % 64]
+            binding.vec_step(c_envs)
+
+    sps = _timed(step, num_envs, seconds)
+    binding.vec_close(c_envs)
+    return sps
+
+
+def _env_kwargs(name, num_envs, difficulty):
+    kwargs = {"num_envs": num_envs, "width": 400, "height": 600}
+    if VARIANTS[name]["curriculum"]:
+        kwargs["curriculum_difficulty_value"] = multiprocessing.Value("f", difficulty)
+    return kwargs
+
+
+def bench_wrapper(name, module, num_envs, seconds, difficulty):
+    env = getattr(module, VARIANTS[name]["env"])(**_env_kwargs(name, num_envs, difficulty))
+    env.reset(seed=0)
+    bank = _action_bank(num_envs)
+    sps = _timed(lambda i: env.step(bank[i % 64]), num_envs, seconds)
+    env.close()
+    return sps
+
+
+def make_vecenv(name, module, backend, num_workers, envs_per_worker, difficulty):
+    """num_workers env objects of envs_per_worker C envs each, stepped as one batch."""
+    import pufferlib.vector
+
+    kwargs = {"backend": backend, "num_envs": num_workers}
+    if backend == "Multiprocessing":
+        kwargs.update(num_workers=num_workers, batch_size=num_workers, overwork=True)
+    return pufferlib.vector.make(
+        getattr(module, VARIANTS[name]["creator"]),
+        env_kwargs=_env_kwargs(name, envs_per_worker, difficulty),
+        **kwargs,
+    )
+
+
+def bench_vector(name, module, backend, num_workers, envs_per_worker, seconds, difficulty):
+    vecenv = make_vecenv(name, module, backend, num_workers, envs_per_worker, difficulty)
+    vecenv.async_reset(0)
+    vecenv.recv()
+    bank = _action_bank(vecenv.num_agents)
+
+    def step(i):
+        vecenv.send(bank[i % 64])
+        vecenv.recv()
+
+    sps = _timed(step, vecenv.num_agents, seconds)
+    vecenv.close()
+    return sps
+
+
+def bench_evaluate(name, module, backend, num_workers, envs_per_worker, difficulty, bptt_horizon=64):
+    """One PuffeRL.evaluate() (num_agents * bptt_horizon steps) with the LSTM policy."""
+    import pufferlib.models
+    import torch
+    from pufferlib import pufferl
+
+    vecenv = make_vecenv(name, module, backend, num_workers, envs_per_worker, difficulty)
+    argv, sys.argv = sys.argv, sys.argv[:1]
+    try:
+        config = pufferl.load_config("default")["train"]
+    finally:
+        sys.argv = argv
+    num_agents = vecenv.num_agents
+    config.update(
+        env=f"{name}_bench",
+        device="cuda" if torch.cuda.is_available() else "cpu",
+        use_rnn=True,
+        bptt_horizon=bptt_horizon,
+        batch_size=num_agents * bptt_horizon,
+        minibatch_size=num_agents * bptt_horizon,
+        max_minibatch_size=num_agents * bptt_horizon,
+        total_timesteps=10 * num_agents * bptt_horizon,
+        optimizer="adam",
+        compile=False,
+        data_dir=tempfile.mkdtemp(prefix="flappy_bench_"),
+    )
+    base = pufferlib.models.Default(vecenv.driver_env, hidden_size=128)
+    policy = pufferlib.models.LSTMWrapper(vecenv.driver_env, base, input_size=128, hidden_size=128)
+    trainer = pufferl.PuffeRL(config, vecenv, policy.to(config["device"]))
+    start = time.perf_counter()
+    trainer.evaluate()
+    elapsed = time.perf_counter() - start
+    steps = trainer.global_step
+    trainer.utilization.stop()
+    vecenv.close()
+    return steps / elapsed
+
+
+def worker_counts(max_workers):
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Layered SPS benchmark for all Flappy variants")
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument("--layers", nargs="+", choices=LAYERS, default=list(LAYERS))
+    parser.add_argument("--num-envs", type=int, nargs="+", default=[1, 64, 1024, 16384], help="C env counts for raw/wrapper")
+    parser.add_argument("--envs-per-worker", type=int, default=256, help="C envs per env object for vector/evaluate")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=None,
+        help="Worker counts for vector/evaluate (default: powers of two up to the CPU count)",
+    )
+    parser.add_argument("--backends", nargs="+", choices=("Serial", "Multiprocessing"), default=["Serial", "Multiprocessing"])
+    parser.add_argument("--seconds", type=float, default=2.0, help="Timed duration per setting")
+    parser.add_argument("--difficulty", type=float, default=1.0)
+    parser.add_argument("--out", type=str, default=None, help="JSON output path (default: benchmarks/results/sps-<host>-<time>.json)")
+    args = parser.parse_args()
+
+    workers = args.workers or worker_counts(os.cpu_count() or 1)
+    host = host_info()
+    results = []
+
+    def record(variant, layer, sps=None, skipped=None, **setting):
+        row = {"variant": variant, "layer": layer, **setting, "sps": sps}
+        if skipped:
+            row["skipped"] = skipped
+        results.append(row)
+        desc = " ".join(f"{k}={v}" for k, v in setting.items())
+        value = f"{sps / 1e6:10.3f} M steps/s" if sps is not None else f"skipped ({skipped})"
+        print(f"  {variant:10s} {layer:9s} {desc:48s} {value}", flush=True)
+
+    print(f"host: {host['hostname']} | {host['platform']} | cpus {host['cpu_count_logical']}")
+    for name in args.variants:
+        module, reason = load_variant(name)
+        if module is None:
+            record(name, "all", skipped=reason)
+            continue
+        if "raw" in args.layers:
+            for n in args.num_envs:
+                record(name, "raw", bench_raw(name, module, n, args.seconds, args.difficulty), num_envs=n)
+        if "wrapper" in args.layers:
+            for n in args.num_envs:
+                record(name, "wrapper", bench_wrapper(name, module, n, args.seconds, args.difficulty), num_envs=n)
+        for layer in ("vector", "evaluate"):
+            if layer not in args.layers:
+                continue
+            for backend in args.backends:
+                for w in workers:
+                    setting = {"backend": backend, "num_workers": w, "envs_per_worker": args.envs_per_worker}
+                    try:
+                        if layer == "vector":
+                            sps = bench_vector(name, module, backend, w, args.envs_per_worker, args.seconds, args.difficulty)
+                        else:
+                            sps = bench_evaluate(name, module, backend, w, args.envs_per_worker, args.difficulty)
+                    except ImportError as e:
+                        record(name, layer, skipped=f"import failed: {e}", **setting)
+                        continue
+                    record(name, layer, sps, **setting)
+
+    out = args.out
+    if out is None:
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        out = os.path.join(os.path.dirname(__file__), "results", f"sps-{host['hostname']}-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"host": host, "args": vars(args), "results": results}, f, indent=2)
+    print(f"wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,12 @@
 """
 Run numerical eval (50 episodes, no render) on the main Flappy checkpoints.
 Run from repo root:  uv run python scripts/eval_all_checkpoints.py
+
+Uses the default fixed seed so results come from the eval cache
+(experiments/eval_cache.sqlite) after the first run; pass --random-seed for
+fresh, uncached seeds every time.
 """
+import argparse
 import subprocess
 import sys
 
@@ -14,6 +19,10 @@ CHECKPOINTS = [
 ]
 
 def main():
+    parser = argparse.ArgumentParser(description="Eval the main Flappy checkpoints")
+    parser.add_argument("--random-seed", action="store_true", help="Random seeds each run (bypasses the cache)")
+    args = parser.parse_args()
+    seed_args = ["--random-seed", "--no-cache"] if args.random_seed else []
     for path_suffix, label in CHECKPOINTS:
         path = f"experiments/{path_suffix}"
         print(f"\n{'='*60}")
@@ -21,7 +30,7 @@ def main():
         print(f"  {path}")
         print("="*60)
         r = subprocess.run(
-            [sys.executable, "-m", "flappy_rl.run_eval_flappy", "--model", path, "--episodes", "50", "--no-render", "--random-seed"],
+            [sys.executable, "-m", "flappy_rl.run_eval_flappy", "--model", path, "--episodes", "50", "--no-render", *seed_args],
             cwd=".",
             capture_output=False,
         )
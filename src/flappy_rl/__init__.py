@@ -6,15 +6,19 @@ import warnings
 warnings.filterwarnings("ignore", message=".*Gym has been unmaintained.*")
 
 from flappy_rl.env import (
+    FlappyGridBatchEnv,
     FlappyGridEnv,
     SamplePufferEnv,
+    flappy_grid_batch_env_creator,
     flappy_grid_env_creator,
     make_gymnasium_env,
 )
 
 __all__ = [
+    "FlappyGridBatchEnv",
     "FlappyGridEnv",
     "SamplePufferEnv",
+    "flappy_grid_batch_env_creator",
     "flappy_grid_env_creator",
     "make_gymnasium_env",
 ]
@@ -0,0 +1,192 @@
+"""
+Host-aware vec/batch geometry autotuner for the train scripts (--vec.autotune).
+
+A geometry is num_workers x agents_per_worker agents, split into async_batches
+vec batches, with torch_threads intra-op threads. Each train script supplies a
+build_vecenv(geometry) callback (it knows how its envs are packed) and its
+policy factory; the tuner times short PuffeRL epochs (evaluate + train) and
+walks one axis at a time, keeping the best end-to-end SPS among geometries
+whose batch (num_agents * bptt_horizon) still covers minibatch_size.
+
+Winners are cached per host fingerprint + tuning key in
+~/.cache/flappy_rl/autotune.json (override: FLAPPY_AUTOTUNE_CACHE), so later
+runs on the same machine start with the tuned geometry at once.
+"""
+
+import copy
+import hashlib
+import json
+import math
+import os
+import platform
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+
+import torch
+
+CACHE_ENV_VAR = "FLAPPY_AUTOTUNE_CACHE"
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "flappy_rl", "autotune.json")
+
+
+@dataclass(frozen=True)
+class Geometry:
+    num_workers: int
+    agents_per_worker: int
+    async_batches: int = 1
+    torch_threads: int = 1
+
+    @property
+    def num_agents(self):
+        return self.num_workers * self.agents_per_worker
+
+
+def physical_cores():
+    try:
+        import psutil
+
+        return psutil.cpu_count(logical=False) or os.cpu_count() or 1
+    except ImportError:
+        return os.cpu_count() or 1
+
+
+def host_fingerprint():
+    """Short stable id for this machine + software stack."""
+    parts = [
+        platform.node(),
+        platform.machine(),
+        platform.processor(),
+        str(os.cpu_count()),
+        str(physical_cores()),
+        torch.__version__,
+        torch.cuda.get_device_name(0) if torch.cuda.is_available() else "cpu",
+    ]
+    try:
+        import pufferlib
+
+        parts.append(str(pufferlib.__version__))
+    except (ImportError, AttributeError):
+        pass
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+
+def _cache_path(path=None):
+    return path or os.environ.get(CACHE_ENV_VAR) or DEFAULT_CACHE_PATH
+
+
+def load_cached(key, path=None):
+    """Cached Geometry for (this host, key), or None."""
+    path = _cache_path(path)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        entry = json.load(f).get(f"{host_fingerprint()}:{key}")
+    return Geometry(**entry["geometry"]) if entry else None
+
+
+def save_cached(key, geometry, sps, path=None):
+    path = _cache_path(path)
+    cache = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            cache = json.load(f)
+    cache[f"{host_fingerprint()}:{key}"] = {
+        "geometry": asdict(geometry),
+        "sps": sps,
+        "host": platform.node(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(cache, f, indent=2)
+
+
+def min_agents(train_config):
+    """Fewest agents whose batch (agents * bptt_horizon) covers minibatch_size."""
+    bptt = int(train_config.get("bptt_horizon", 64))
+    return max(1, math.ceil(int(train_config["minibatch_size"]) / bptt))
+
+
+def _powers_of_two(limit):
+    out = [1]
+    while out[-1] * 2 <= limit:
+        out.append(out[-1] * 2)
+    return out
+
+
+def probe(build_vecenv, make_policy, train_config, geometry, seconds):
+    """End-to-end SPS of one geometry: one warmup epoch, then epochs for ~seconds."""
+    from pufferlib import pufferl
+
+    torch.set_num_threads(geometry.torch_threads)
+    vecenv = build_vecenv(geometry)
+    config = copy.deepcopy(train_config)
+    config["batch_size"] = "auto"
+    config["total_timesteps"] = 10**12
+    config["checkpoint_interval"] = 10**9
+    config["data_dir"] = tempfile.mkdtemp(prefix="flappy_autotune_")
+    trainer = pufferl.PuffeRL(config, vecenv, make_policy(vecenv.driver_env).to(config["device"]))
+    try:
+        trainer.evaluate()
+        trainer.train()
+        start_step = trainer.global_step
+        start = time.perf_counter()
+        while True:
+            trainer.evaluate()
+            trainer.train()
+            elapsed = time.perf_counter() - start
+            if elapsed >= seconds:
+                return (trainer.global_step - start_step) / elapsed
+    finally:
+        trainer.utilization.stop()
+        vecenv.close()
+
+
+def autotune(build_vecenv, make_policy, train_config, key, probe_seconds=5.0, refresh=False, cache_path=None, log=print):
+    """Return the best Geometry for this host, probing (and caching) if needed.
+
+    key names what is being tuned (script, policy, batch constraints); a
+    cached result is reused only for the same host fingerprint and key.
+    """
+    if not refresh:
+        cached = load_cached(key, cache_path)
+        if cached is not None:
+            log(f"[autotune] cached geometry for this host: {cached}")
+            return cached
+
+    cores = physical_cores()
+    needed = min_agents(train_config)
+    results = {}
+
+    def measure(g):
+        if g.num_agents < needed or g.num_workers % g.async_batches:
+            return 0.0
+        if g not in results:
+            try:
+                results[g] = probe(build_vecenv, make_policy, train_config, g, probe_seconds)
+            except Exception as e:  # a geometry the backend rejects just loses
+                log(f"[autotune] {g}: failed ({type(e).__name__}: {e})")
+                results[g] = 0.0
+            else:
+                log(f"[autotune] {g}: {results[g]:,.0f} SPS")
+        return results[g]
+
+    def per_worker(workers, scale=1):
+        return math.ceil(needed / workers) * scale
+
+    best = Geometry(num_workers=1, agents_per_worker=per_worker(1))
+    axes = [
+        lambda b: [Geometry(w, per_worker(w), 1, b.torch_threads) for w in _powers_of_two(cores)],
+        lambda b: [Geometry(b.num_workers, per_worker(b.num_workers, s), b.async_batches, b.torch_threads) for s in (1, 2, 4)],
+        lambda b: [Geometry(b.num_workers, b.agents_per_worker, a, b.torch_threads) for a in (1, 2)],
+        lambda b: [Geometry(b.num_workers, b.agents_per_worker, b.async_batches, t) for t in _powers_of_two(cores)],
+    ]
+    for axis in axes:
+        best = max(axis(best) + [best], key=measure)
+
+    sps = measure(best)
+    if sps <= 0.0:
+        raise RuntimeError("autotune: no geometry ran successfully")
+    log(f"[autotune] best: {best} at {sps:,.0f} SPS (cached for this host)")
+    save_cached(key, best, sps, cache_path)
+    return best
@@ -3,6 +3,7 @@ First RL env for PufferLib.
 
 Envs:
 - FlappyGridEnv: 2-row grid (floor/ceiling), up/down actions, wall obs, -1 reward for hitting ceiling.
+- FlappyGridBatchEnv: the same game for num_envs agents in one env, stepped with NumPy array ops.
 - SampleGymnasiumEnv / SamplePufferEnv: minimal mock envs for API demo.
 """
 
@@ -108,6 +109,117 @@ def flappy_grid_env_creator(buf=None, seed=0):
     return FlappyGridEnv(buf=buf, seed=seed)
 
 
+class FlappyGridBatchEnv(pufferlib.PufferEnv):
+    """
+    FlappyGridEnv for num_envs agents at once (num_agents = num_envs).
+    - Same observations, actions and rewards per agent.
+    - step() updates every agent with in-place NumPy ops on preallocated
+      arrays and writes straight into the PufferLib buffers.
+    - Agents that die or reach MAX_STEPS auto-reset on the same step (new
+      random row and walls); their observation is the new episode's first.
+    - Every log_interval steps, returns the mean return/length of the
+      episodes finished since the last log, as the C envs do.
+    """
+
+    MAX_STEPS = FlappyGridEnv.MAX_STEPS
+
+    def __init__(self, num_envs=1, buf=None, seed=0, log_interval=128):
+        self.single_observation_space = gymnasium.spaces.Box(
+            low=-1.0, high=1.0, shape=(3,), dtype=np.float32
+        )
+        self.single_action_space = gymnasium.spaces.Discrete(2)
+        self.num_agents = num_envs
+        self.log_interval = log_interval
+        super().__init__(buf)
+        self._rng = np.random.default_rng(seed)
+        n = num_envs
+        self._y = np.zeros(n, dtype=bool)  # False = floor, True = ceiling
+        self._wall_roof = np.zeros(n, dtype=bool)
+        self._step_count = np.zeros(n, dtype=np.int64)
+        self._episode_return = np.zeros(n, dtype=np.float32)
+        # Scratch: two uniforms per agent per step (walls, reset row) and masks
+        self._u = np.empty((2, n))
+        self._up = np.empty(n, dtype=bool)
+        self._alive = np.empty(n, dtype=bool)
+        self._done = np.empty(n, dtype=bool)
+        self._tick = 0
+        self._log_return = 0.0
+        self._log_length = 0.0
+        self._log_n = 0
+
+    def _write_obs(self):
+        # (position, wall_roof, wall_floor) scaled 0/1 -> -1/1, as FlappyGridEnv
+        obs = self.observations
+        np.multiply(self._y, 2.0, out=obs[:, 0])
+        obs[:, 0] -= 1.0
+        np.multiply(self._wall_roof, 2.0, out=obs[:, 1])
+        obs[:, 1] -= 1.0
+        np.negative(obs[:, 1], out=obs[:, 2])
+
+    def reset(self, seed=0):
+        if seed is not None:
+            self._rng = np.random.default_rng(seed)
+        self._rng.random(out=self._u)
+        np.less(self._u[1], 0.5, out=self._y)
+        np.less(self._u[0], 0.5, out=self._wall_roof)
+        self._step_count[:] = 0
+        self._episode_return[:] = 0.0
+        self.rewards[:] = 0
+        self.terminals[:] = False
+        self.truncations[:] = False
+        self._write_obs()
+        return self.observations, []
+
+    def step(self, actions):
+        self.actions[:] = actions
+        np.equal(self.actions, 1, out=self._up)
+        # Moving up from the ceiling or down from the floor ends the episode
+        np.equal(self._up, self._y, out=self.terminals)
+        np.logical_not(self.terminals, out=self._alive)
+        np.copyto(self._y, self._up, where=self._alive)
+        self._step_count += self._alive
+        # Small reward per step survived, -1 for a hit (as FlappyGridEnv)
+        np.copyto(self.rewards, np.float32(0.01))
+        np.copyto(self.rewards, np.float32(-1.0), where=self.terminals)
+        np.greater_equal(self._step_count, self.MAX_STEPS, out=self.truncations)
+        self._episode_return += self.rewards
+
+        # Per-agent auto-reset; walls are redrawn for everyone
+        np.logical_or(self.terminals, self.truncations, out=self._done)
+        self._rng.random(out=self._u)
+        if self._done.any():
+            done = self._done
+            self._log_return += float(self._episode_return.sum(where=done))
+            self._log_length += float(self._step_count.sum(where=done))
+            self._log_n += int(np.count_nonzero(done))
+            np.less(self._u[1], 0.5, out=self._up)
+            np.copyto(self._y, self._up, where=done)
+            np.copyto(self._step_count, 0, where=done)
+            np.copyto(self._episode_return, np.float32(0.0), where=done)
+        np.less(self._u[0], 0.5, out=self._wall_roof)
+        self._write_obs()
+
+        self._tick += 1
+        info = []
+        if self._tick % self.log_interval == 0 and self._log_n:
+            info.append({
+                "episode_return": self._log_return / self._log_n,
+                "episode_length": self._log_length / self._log_n,
+                "n": self._log_n,
+            })
+            self._log_return = self._log_length = 0.0
+            self._log_n = 0
+        return self.observations, self.rewards, self.terminals, self.truncations, info
+
+    def close(self):
+        pass
+
+
+def flappy_grid_batch_env_creator(buf=None, seed=0, num_envs=1):
+    """Env creator for pufferlib.vector.make: num_envs grid agents in one env object."""
+    return FlappyGridBatchEnv(num_envs=num_envs, buf=buf, seed=seed)
+
+
 # ---------------------------------------------------------------------------
 # Option 1: Gymnasium env — write a normal Gymnasium env, then wrap it
 # ---------------------------------------------------------------------------
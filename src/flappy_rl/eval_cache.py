@@ -0,0 +1,106 @@
+"""
+On-disk cache of per-episode eval results (SQLite).
+
+One row per (checkpoint content hash, env variant, eval config, episode seed)
+holding pipes passed and episode length. Eval scripts look up the seeds they
+need, run only the missing episodes and store them, so re-ranking a run after
+new checkpoints appear only evaluates the new ones, and a larger --episodes
+only plays the extra seeds.
+
+The checkpoint is keyed by a SHA-256 of its bytes, not its path: moving or
+copying a checkpoint keeps its results, overwriting it invalidates them.
+config is a free-form string naming everything else that changes results
+(difficulty, max_steps, greedy vs sampled, engine, ...); build it with
+eval_config(). Include a dynamics version the env owner bumps whenever a
+seeded episode plays differently, or old rows are silently reused.
+"""
+
+import hashlib
+import os
+import sqlite3
+
+import numpy as np
+
+_hash_memo = {}
+
+
+def checkpoint_hash(path):
+    """SHA-256 of a checkpoint file (memoized per path, size and mtime)."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if memo_key not in _hash_memo:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        _hash_memo[memo_key] = h.hexdigest()
+    return _hash_memo[memo_key]
+
+
+def eval_config(**settings):
+    """Canonical config string, e.g. eval_config(difficulty=1.0, policy="greedy")."""
+    return ",".join(f"{k}={settings[k]}" for k in sorted(settings))
+
+
+class EvalCache:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS episodes ("
+            " checkpoint TEXT NOT NULL, variant TEXT NOT NULL, config TEXT NOT NULL,"
+            " seed INTEGER NOT NULL, pipes INTEGER NOT NULL, length INTEGER NOT NULL,"
+            " PRIMARY KEY (checkpoint, variant, config, seed))"
+        )
+        self.db.commit()
+
+    def lookup(self, checkpoint, variant, config, seeds):
+        """{seed: (pipes, length)} for the seeds already stored."""
+        seeds = [int(s) for s in seeds]
+        found = {}
+        for i in range(0, len(seeds), 500):  # stay under SQLite's bound-parameter limit
+            chunk = seeds[i : i + 500]
+            rows = self.db.execute(
+                "SELECT seed, pipes, length FROM episodes WHERE checkpoint = ? AND variant = ? AND config = ?"
+                f" AND seed IN ({','.join('?' * len(chunk))})",
+                (checkpoint, variant, config, *chunk),
+            )
+            found.update((seed, (pipes, length)) for seed, pipes, length in rows)
+        return found
+
+    def store(self, checkpoint, variant, config, seeds, pipes, lengths):
+        self.db.executemany(
+            "INSERT OR REPLACE INTO episodes VALUES (?, ?, ?, ?, ?, ?)",
+            [(checkpoint, variant, config, int(s), int(p), int(l)) for s, p, l in zip(seeds, pipes, lengths)],
+        )
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+def missing_seeds(cache, model_path, variant, config, seeds):
+    """(cached {seed: (pipes, length)}, seeds not in the cache). cache may be None."""
+    if cache is None:
+        return {}, np.asarray(seeds)
+    found = cache.lookup(checkpoint_hash(model_path), variant, config, seeds)
+    return found, np.array([s for s in seeds if int(s) not in found], dtype=np.int64)
+
+
+def merge(cache, model_path, variant, config, seeds, found, new_seeds, new_pipes, new_lengths):
+    """Store freshly evaluated episodes and return (pipes, lengths) for all seeds, in order."""
+    if cache is not None and len(new_seeds):
+        cache.store(checkpoint_hash(model_path), variant, config, new_seeds, new_pipes, new_lengths)
+    found = dict(found)
+    found.update((int(s), (int(p), int(l))) for s, p, l in zip(new_seeds, new_pipes, new_lengths))
+    pipes = np.array([found[int(s)][0] for s in seeds], dtype=np.int64)
+    lengths = np.array([found[int(s)][1] for s in seeds], dtype=np.int64)
+    return pipes, lengths
+
+
+def cached_episodes(cache, model_path, variant, config, seeds, evaluate):
+    """(pipes, lengths) for seeds, calling evaluate(missing_seeds) only for uncached ones."""
+    found, missing = missing_seeds(cache, model_path, variant, config, seeds)
+    new_pipes, new_lengths = evaluate(missing) if len(missing) else ([], [])
+    return merge(cache, model_path, variant, config, seeds, found, missing, new_pipes, new_lengths)
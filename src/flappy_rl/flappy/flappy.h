@@ -1,4 +1,6 @@
-/* Flappy: single-agent Flappy Bird-style env. C + raylib. */
+/* Flappy: single-agent Flappy Bird-style env. C + raylib.
+ * Bump DYNAMICS_VERSION in run_eval_flappy.py when a seeded episode
+ * changes (it keys the eval cache). */
 
 #include <stdlib.h>
 #include <string.h>
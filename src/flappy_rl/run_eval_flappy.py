@@ -10,6 +10,8 @@ Run from repo root so C code finds resources/flappy/:
 
 By default --seed 42 is used, so the same command gives identical stats (reproducible).
 Use --random-seed to pick a different seed each run and verify stats vary.
+Headless episode results are cached per checkpoint and seed in
+src/flappy_rl/experiments/eval_cache.sqlite (flappy_rl.eval_cache); --no-cache bypasses it.
 
 Actions are always argmax (greedy). Press ESC in the game window to exit when rendering.
 """
@@ -23,10 +25,15 @@ import torch
 import pufferlib.vector
 import pufferlib.pytorch
 
+from flappy_rl.eval_cache import EvalCache, cached_episodes, eval_config
 from flappy_rl.flappy import flappy_env_creator
 from flappy_rl.train import FlappyGridPolicy
 
 FPS = 60
+CACHE_PATH = os.path.join(os.path.dirname(__file__), "experiments", "eval_cache.sqlite")
+# Part of the cache key: bump with any change to what a seeded episode plays
+# (flappy/flappy.h) so stale rows are not reused.
+DYNAMICS_VERSION = 1
 
 
 def find_latest_checkpoint():
@@ -83,6 +90,8 @@ def main():
         action="store_true",
         help="Run headless (use with --episodes for numerical eval)",
     )
+    parser.add_argument("--no-cache", action="store_true", help="Ignore and do not update the eval cache")
+    parser.add_argument("--cache", type=str, default=CACHE_PATH, help="Eval cache file (SQLite)")
     args = parser.parse_args()
 
     if args.random_seed:
@@ -110,17 +119,19 @@ def main():
 
     if args.episodes > 0:
         # Numerical eval: run N episodes, report pipes passed and length
-        scores = []
-        lengths = []
-        for ep in range(args.episodes):
-            pipes, length = run_episode(vecenv, policy, args.device, seed=args.seed + ep)
-            scores.append(pipes)
-            lengths.append(length)
+        cache = None if args.no_cache else EvalCache(args.cache)
+        config = eval_config(max_steps=5000, policy="greedy", dynamics=DYNAMICS_VERSION)
+
+        def evaluate(seeds):
+            results = [run_episode(vecenv, policy, args.device, seed=int(seed)) for seed in seeds]
+            return [r[0] for r in results], [r[1] for r in results]
+
+        scores, lengths = cached_episodes(cache, model_path, "flappy_rl", config, args.seed + np.arange(args.episodes), evaluate)
         vecenv.close()
-        scores = np.array(scores)
-        lengths = np.array(lengths)
         print(f"Checkpoint: {model_path}")
         print(f"Episodes:   {args.episodes}")
+        if cache is not None:
+            cache.close()
         print(f"Pipes passed — mean: {scores.mean():.2f}, std: {scores.std():.2f}, min: {scores.min()}, max: {scores.max()}")
         print(f"Length      — mean: {lengths.mean():.1f}, std: {lengths.std():.1f}, min: {lengths.min()}, max: {lengths.max()}")
         return
@@ -17,8 +17,8 @@ import pufferlib
 import pufferlib.vector
 from pufferlib import pufferl
 
-from flappy_rl.env import flappy_grid_env_creator
-from flappy_rl.train import FlappyGridPolicy
+from flappy_rl.env import flappy_grid_batch_env_creator
+from flappy_rl.train import FlappyGridPolicy, grid_vec_kwargs
 
 
 # Grid: at which (lr, clip_coef) does entropy go to ~0?
@@ -42,7 +42,7 @@ def run_one(args, learning_rate, clip_coef):
     if vec_kwargs.get("num_envs") in (None, "auto") or vec_kwargs.get("num_envs", 0) < 128:
         vec_kwargs["num_envs"] = 128
 
-    vecenv = pufferlib.vector.make(flappy_grid_env_creator, **vec_kwargs)
+    vecenv = pufferlib.vector.make(flappy_grid_batch_env_creator, **grid_vec_kwargs(vec_kwargs))
     policy = FlappyGridPolicy(vecenv.driver_env).to(args["train"]["device"])
     trainer = pufferl.PuffeRL(args["train"], vecenv, policy)
 
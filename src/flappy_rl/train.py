@@ -8,13 +8,15 @@ Usage:
 """
 
 import argparse
+import math
 import multiprocessing
 import torch
 import pufferlib
 import pufferlib.vector
 from pufferlib import pufferl
 
-from flappy_rl.env import flappy_grid_env_creator
+from flappy_rl.autotune import autotune
+from flappy_rl.env import flappy_grid_batch_env_creator
 
 
 class FlappyGridPolicy(torch.nn.Module):
@@ -47,6 +49,21 @@ class FlappyGridPolicy(torch.nn.Module):
         return logits, values
 
 
+def grid_vec_kwargs(vec_kwargs):
+    """Vec kwargs counting agents -> one FlappyGridBatchEnv per worker.
+
+    vec.num_envs agents are split over num_workers env objects, so each
+    worker steps all its agents with a few NumPy ops; an integer batch_size
+    (agents) becomes the matching number of env objects.
+    """
+    num_workers = int(vec_kwargs.get("num_workers") or 1)
+    per_worker = math.ceil(vec_kwargs["num_envs"] / num_workers)
+    batch_size = vec_kwargs.get("batch_size")
+    if isinstance(batch_size, int):
+        batch_size = max(1, batch_size // per_worker)
+    return dict(vec_kwargs, num_envs=num_workers, batch_size=batch_size, env_kwargs={"num_envs": per_worker})
+
+
 def main():
     # Parse --train.env and --train.total-timesteps before load_config; strip from argv so PufferLib's parser doesn't reject
     import sys
@@ -55,6 +72,9 @@ def main():
     parser.add_argument("--train.total-timesteps", type=int, default=None, dest="train_total_timesteps")
     parser.add_argument("--train.load-checkpoint", type=str, default=None, dest="train_load_checkpoint")
     parser.add_argument("--train.learning-rate", type=float, default=None, dest="train_learning_rate")
+    parser.add_argument("--vec.autotune", action="store_true", dest="vec_autotune")
+    parser.add_argument("--vec.autotune-refresh", action="store_true", dest="vec_autotune_refresh")
+    parser.add_argument("--vec.autotune-seconds", type=float, default=5.0, dest="vec_autotune_seconds")
     known, _ = parser.parse_known_args()
     env_name = known.train_env
     total_timesteps_override = known.train_total_timesteps
@@ -78,6 +98,14 @@ def main():
         del sys.argv[i]
         if i < len(sys.argv):
             del sys.argv[i]  # value
+    for flag in ("--vec.autotune", "--vec.autotune-refresh"):
+        while flag in sys.argv:
+            sys.argv.remove(flag)
+    if "--vec.autotune-seconds" in sys.argv:
+        i = sys.argv.index("--vec.autotune-seconds")
+        del sys.argv[i]
+        if i < len(sys.argv):
+            del sys.argv[i]  # value
     # Load default PufferLib config (train + vec sections)
     args = pufferl.load_config("default")
     args["train"]["env"] = env_name
@@ -96,34 +124,63 @@ def main():
     if vec_kwargs.get("num_envs") in (None, "auto") or vec_kwargs.get("num_envs", 0) < 128:
         vec_kwargs["num_envs"] = 128
 
-    if env_name == "flappy":
-        from flappy_rl.flappy import flappy_env_creator
-
-        vecenv = pufferlib.vector.make(
-            flappy_env_creator,
-            env_kwargs={"num_envs": 1, "width": 400, "height": 600},
-            **vec_kwargs,
-        )
-    elif env_name == "flappy_curriculum":
-        from variations.flappy import curriculum_env_creator
+    if env_name == "flappy_curriculum":
         from variations.flappy.curriculum import compute_difficulty
 
         curriculum_difficulty_value = multiprocessing.Value("f", 0.0)
-        vecenv = pufferlib.vector.make(
-            curriculum_env_creator,
-            env_kwargs={
-                "num_envs": 1,
-                "width": 400,
-                "height": 600,
-                "curriculum_difficulty_value": curriculum_difficulty_value,
-            },
-            **vec_kwargs,
-        )
-    else:
-        vecenv = pufferlib.vector.make(
-            flappy_grid_env_creator,
-            **vec_kwargs,
+
+    def make_vecenv(vec_kwargs):
+        if env_name == "flappy":
+            from flappy_rl.flappy import flappy_env_creator
+
+            return pufferlib.vector.make(
+                flappy_env_creator,
+                env_kwargs={"num_envs": 1, "width": 400, "height": 600},
+                **vec_kwargs,
+            )
+        elif env_name == "flappy_curriculum":
+            from variations.flappy import curriculum_env_creator
+
+            return pufferlib.vector.make(
+                curriculum_env_creator,
+                env_kwargs={
+                    "num_envs": 1,
+                    "width": 400,
+                    "height": 600,
+                    "curriculum_difficulty_value": curriculum_difficulty_value,
+                },
+                **vec_kwargs,
+            )
+        else:
+            return pufferlib.vector.make(
+                flappy_grid_batch_env_creator,
+                **grid_vec_kwargs(vec_kwargs),
+            )
+
+    if known.vec_autotune:
+        # Geometries count agents (vec.num_envs, batch_size); make_vecenv turns
+        # them into env objects (grid_vec_kwargs: one batch env per worker).
+        def geometry_kwargs(geometry):
+            return dict(
+                vec_kwargs,
+                num_envs=geometry.num_agents,
+                num_workers=geometry.num_workers,
+                batch_size=geometry.num_agents // geometry.async_batches,
+            )
+
+        key = f"flappy_rl:{env_name}:{vec_kwargs.get('backend')}:{args['train']['device']}:{args['train']['minibatch_size']}:{args['train']['bptt_horizon']}"
+        geometry = autotune(
+            lambda g: make_vecenv(geometry_kwargs(g)),
+            FlappyGridPolicy,
+            args["train"],
+            key,
+            probe_seconds=known.vec_autotune_seconds,
+            refresh=known.vec_autotune_refresh,
         )
+        torch.set_num_threads(geometry.torch_threads)
+        vec_kwargs = geometry_kwargs(geometry)
+
+    vecenv = make_vecenv(vec_kwargs)
     policy = FlappyGridPolicy(vecenv.driver_env).to(args["train"]["device"])
 
     load_checkpoint = getattr(known, "train_load_checkpoint", None)
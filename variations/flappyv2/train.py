@@ -21,6 +21,7 @@ import pufferlib.models
 import pufferlib.vector
 from pufferlib import pufferl
 
+from flappy_rl.autotune import autotune
 from variations.flappyv2 import compute_difficulty, curriculum_env_creator
 
 
@@ -37,6 +38,11 @@ def make_flappyv2_lstm_policy(env, hidden_size=128, lstm_hidden_size=128):
     )
 
 
+def _strip_flag(flag):
+    while flag in sys.argv:
+        sys.argv.remove(flag)
+
+
 def _strip_arg(flag):
     if flag in sys.argv:
         i = sys.argv.index(flag)
@@ -51,12 +57,23 @@ def main():
     parser.add_argument("--train.load-checkpoint", type=str, default=None, dest="train_load_checkpoint")
     parser.add_argument("--train.learning-rate", type=float, default=None, dest="train_learning_rate")
     parser.add_argument("--train.output-dir", type=str, default=None, dest="train_output_dir")
+    parser.add_argument(
+        "--vec.autotune",
+        action="store_true",
+        dest="vec_autotune",
+        help="Probe num_workers / agents per worker / batching / torch threads; cached per host",
+    )
+    parser.add_argument("--vec.autotune-refresh", action="store_true", dest="vec_autotune_refresh")
+    parser.add_argument("--vec.autotune-seconds", type=float, default=5.0, dest="vec_autotune_seconds")
     known, _ = parser.parse_known_args()
 
     _strip_arg("--train.total-timesteps")
     _strip_arg("--train.load-checkpoint")
     _strip_arg("--train.learning-rate")
     _strip_arg("--train.output-dir")
+    _strip_flag("--vec.autotune")
+    _strip_flag("--vec.autotune-refresh")
+    _strip_arg("--vec.autotune-seconds")
 
     args = pufferl.load_config("default")
     args["train"]["env"] = "flappyv2_curriculum"
@@ -80,16 +97,42 @@ def main():
         vec_kwargs["num_envs"] = 128
 
     curriculum_difficulty_value = multiprocessing.Value("f", 0.0)
-    vecenv = pufferlib.vector.make(
-        curriculum_env_creator,
-        env_kwargs={
-            "num_envs": 1,
-            "width": 400,
-            "height": 600,
-            "curriculum_difficulty_value": curriculum_difficulty_value,
-        },
-        **vec_kwargs,
-    )
+
+    def make_vecenv(vec_kwargs):
+        return pufferlib.vector.make(
+            curriculum_env_creator,
+            env_kwargs={
+                "num_envs": 1,
+                "width": 400,
+                "height": 600,
+                "curriculum_difficulty_value": curriculum_difficulty_value,
+            },
+            **vec_kwargs,
+        )
+
+    if known.vec_autotune:
+        # One agent per env object: vec.num_envs is the agent count.
+        def geometry_kwargs(geometry):
+            return dict(
+                vec_kwargs,
+                num_envs=geometry.num_agents,
+                num_workers=geometry.num_workers,
+                batch_size=geometry.num_agents // geometry.async_batches,
+            )
+
+        key = f"flappyv2:{vec_kwargs.get('backend')}:{args['train']['device']}:{args['train']['minibatch_size']}:{args['train']['bptt_horizon']}"
+        geometry = autotune(
+            lambda g: make_vecenv(geometry_kwargs(g)),
+            make_flappyv2_lstm_policy,
+            args["train"],
+            key,
+            probe_seconds=known.vec_autotune_seconds,
+            refresh=known.vec_autotune_refresh,
+        )
+        torch.set_num_threads(geometry.torch_threads)
+        vec_kwargs = geometry_kwargs(geometry)
+
+    vecenv = make_vecenv(vec_kwargs)
 
     policy = make_flappyv2_lstm_policy(vecenv.driver_env).to(args["train"]["device"])
 
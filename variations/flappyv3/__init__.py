@@ -5,6 +5,7 @@ try:
 except ImportError:
     binding = None
 
+from .course_bank import course_length, make_courses
 from .curriculum import FlappyCurriculum, compute_difficulty, curriculum_env_creator
 
-__all__ = ["binding", "compute_difficulty", "FlappyCurriculum", "curriculum_env_creator"]
+__all__ = ["binding", "compute_difficulty", "course_length", "FlappyCurriculum", "curriculum_env_creator", "make_courses"]
@@ -0,0 +1,87 @@
+"""
+Benchmark threaded vec_step: raw C steps/sec at 1..N threads in one process.
+
+Needs the binding built with OpenMP for num_threads > 1:
+  cd variations/flappyv3 && make clean && make OPENMP=1
+
+Run from repo root:
+  uv run python -m variations.flappyv3.bench_threads
+  uv run python -m variations.flappyv3.bench_threads --num-envs 8192 --threads 1 2 4 8
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from variations.flappyv3 import binding
+from variations.flappyv3.flappy import OBS_DIM
+
+
+def bench(num_envs: int, num_threads: int, seconds: float, difficulty: float, seed: int = 0) -> float:
+    """Step num_envs C envs with random actions for ~seconds; return env steps/sec."""
+    observations = np.zeros((num_envs, OBS_DIM), dtype=np.float32)
+    actions = np.zeros(num_envs, dtype=np.int32)
+    rewards = np.zeros(num_envs, dtype=np.float32)
+    terminals = np.zeros(num_envs, dtype=np.bool_)
+    truncations = np.zeros(num_envs, dtype=np.bool_)
+    c_envs = binding.vec_init(
+        observations, actions, rewards, terminals, truncations, num_envs, seed,
+        width=400, height=600, max_steps=5000, num_threads=num_threads,
+    )
+    binding.vec_reset(c_envs, seed, difficulty)
+    # Pre-generated action bank so the timed loop is vec_step only
+    bank = np.random.default_rng(seed).integers(0, 2, size=(64, num_envs), dtype=np.int32)
+
+    for i in range(16):
+        actions[:] = bank[i % 64]
+        binding.vec_step(c_envs, difficulty)
+
+    steps = 0
+    start = time.perf_counter()
+    while True:
+        for i in range(64):
+            actions[:] = bank[i]
+            binding.vec_step(c_envs, difficulty)
+        steps += 64
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            break
+    binding.vec_close(c_envs)
+    return steps * num_envs / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Threaded vec_step scaling benchmark (Flappy v3)")
+    parser.add_argument("--num-envs", type=int, default=4096)
+    parser.add_argument(
+        "--threads",
+        type=int,
+        nargs="+",
+        default=None,
+        help="Thread counts to test (default: powers of two up to os.cpu_count())",
+    )
+    parser.add_argument("--seconds", type=float, default=2.0, help="Timed duration per setting")
+    parser.add_argument("--difficulty", type=float, default=1.0)
+    args = parser.parse_args()
+
+    threads = args.threads
+    if threads is None:
+        cpus = os.cpu_count() or 1
+        threads = [1]
+        while threads[-1] * 2 <= cpus:
+            threads.append(threads[-1] * 2)
+        if threads[-1] != cpus:
+            threads.append(cpus)
+
+    print(f"num_envs: {args.num_envs}, cpus: {os.cpu_count()}")
+    base = None
+    for t in threads:
+        sps = bench(args.num_envs, t, args.seconds, args.difficulty)
+        base = base or sps
+        print(f"  threads {t:>3} | {sps / 1e6:8.2f} M steps/s | x{sps / base:.2f}")
+
+
+if __name__ == "__main__":
+    main()
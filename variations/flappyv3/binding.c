@@ -1,16 +1,314 @@
 #include "flappy.h"
+#include "flappy_batch.h"
 
 #define NPY_NO_DEPRECATED_API NPY_1_7_API_VERSION
 #define Env Flappy
+
+#include <Python.h>
+static PyObject* batch_init(PyObject* self, PyObject* args, PyObject* kwargs);
+static PyObject* batch_reset(PyObject* self, PyObject* args);
+static PyObject* batch_step(PyObject* self, PyObject* args);
+static PyObject* batch_log(PyObject* self, PyObject* args);
+static PyObject* batch_close(PyObject* self, PyObject* args);
+static PyObject* vec_reset_envs(PyObject* self, PyObject* args);
+static PyObject* batch_reset_envs(PyObject* self, PyObject* args);
+static PyObject* vec_set_courses(PyObject* self, PyObject* args);
+static PyObject* vec_queue_courses(PyObject* self, PyObject* args);
+static PyObject* sample_course(PyObject* self, PyObject* args);
+static PyObject* state_size(PyObject* self, PyObject* args);
+static PyObject* constants(PyObject* self, PyObject* args);
+static PyObject* vec_get_state(PyObject* self, PyObject* args);
+static PyObject* vec_set_state(PyObject* self, PyObject* args);
+static PyObject* batch_get_state(PyObject* self, PyObject* args);
+static PyObject* batch_set_state(PyObject* self, PyObject* args);
+static PyObject* vec_simulate(PyObject* self, PyObject* args);
+#define MY_METHODS \
+    {"vec_reset_envs", vec_reset_envs, METH_VARARGS, "Reseed and reset selected environments"}, \
+    {"batch_reset_envs", batch_reset_envs, METH_VARARGS, "Reseed and reset selected environments of a batch"}, \
+    {"vec_set_courses", vec_set_courses, METH_VARARGS, "Attach a bank of pre-generated pipe courses"}, \
+    {"vec_queue_courses", vec_queue_courses, METH_VARARGS, "Play given courses on the next reset of selected environments"}, \
+    {"sample_course", sample_course, METH_VARARGS, "Gap centers a seeded environment would spawn"}, \
+    {"state_size", state_size, METH_NOARGS, "Bytes per environment state snapshot"}, \
+    {"constants", constants, METH_NOARGS, "flappy.h #defines that Python code sizes things from"}, \
+    {"vec_get_state", vec_get_state, METH_VARARGS, "Snapshot selected environments into a uint8 array"}, \
+    {"vec_set_state", vec_set_state, METH_VARARGS, "Restore selected environments from snapshots"}, \
+    {"batch_get_state", batch_get_state, METH_VARARGS, "Snapshot selected environments of a batch"}, \
+    {"batch_set_state", batch_set_state, METH_VARARGS, "Restore selected environments of a batch"}, \
+    {"vec_simulate", vec_simulate, METH_VARARGS, "Play action sequences from states without touching the environments"}, \
+    {"batch_init", (PyCFunction)batch_init, METH_VARARGS | METH_KEYWORDS, "Initialize a structure-of-arrays batch of environments"}, \
+    {"batch_reset", batch_reset, METH_VARARGS, "Reset the batch of environments"}, \
+    {"batch_step", batch_step, METH_VARARGS, "Step the batch of environments"}, \
+    {"batch_log", batch_log, METH_VARARGS, "Log the batch of environments"}, \
+    {"batch_close", batch_close, METH_VARARGS, "Close the batch of environments"}
+
 #include "env_binding.h"
 
+/* Optional episode ring buffer kwargs: episodes (1D array of
+ * EpisodeRecord, e.g. np.zeros(n, EPISODE_DTYPE)) and episode_count
+ * (int64 array of two counters: records written, slots reserved; see
+ * reserve_episode_record). The caller keeps both alive
+ * for the lifetime of the envs, as with the observation buffers. */
+static int unpack_episode_buffer(PyObject* kwargs, EpisodeRecord** episodes, int64_t** count, int* capacity) {
+    *episodes = NULL;
+    *count = NULL;
+    *capacity = 0;
+    PyObject* ep = kwargs ? PyDict_GetItemString(kwargs, "episodes") : NULL;
+    PyObject* cnt = kwargs ? PyDict_GetItemString(kwargs, "episode_count") : NULL;
+    if (ep == NULL || ep == Py_None) {
+        return 0;
+    }
+    if (!PyObject_TypeCheck(ep, &PyArray_Type) || cnt == NULL || !PyObject_TypeCheck(cnt, &PyArray_Type)) {
+        PyErr_SetString(PyExc_TypeError, "episodes and episode_count must both be NumPy arrays");
+        return -1;
+    }
+    PyArrayObject* ep_arr = (PyArrayObject*)ep;
+    PyArrayObject* cnt_arr = (PyArrayObject*)cnt;
+    if (!PyArray_ISCONTIGUOUS(ep_arr) || PyArray_NDIM(ep_arr) != 1
+            || PyArray_ITEMSIZE(ep_arr) != sizeof(EpisodeRecord) || PyArray_SIZE(ep_arr) == 0) {
+        PyErr_SetString(PyExc_ValueError, "episodes must be a non-empty contiguous 1D array of EPISODE_DTYPE");
+        return -1;
+    }
+    if (!PyArray_ISCONTIGUOUS(cnt_arr) || PyArray_ITEMSIZE(cnt_arr) != sizeof(int64_t) || PyArray_SIZE(cnt_arr) < 2) {
+        PyErr_SetString(PyExc_ValueError, "episode_count must be a contiguous int64 array of 2 counters");
+        return -1;
+    }
+    *episodes = (EpisodeRecord*)PyArray_DATA(ep_arr);
+    *count = (int64_t*)PyArray_DATA(cnt_arr);
+    *capacity = (int)PyArray_SIZE(ep_arr);
+    return 0;
+}
+
+/* Optional difficulty kwarg: contiguous float32 array with one entry per
+ * env (e.g. a slice of a multiprocessing.RawArray("f")). The envs read it
+ * at every reset in place of the difficulty arguments, so a trainer can
+ * write it directly; a new value applies from each env's next episode.
+ * Sets *size to 0 when absent. */
+static float* unpack_difficulty_array(PyObject* kwargs, npy_intp* size) {
+    *size = 0;
+    PyObject* obj = kwargs ? PyDict_GetItemString(kwargs, "difficulty") : NULL;
+    if (obj == NULL || obj == Py_None) {
+        return NULL;
+    }
+    if (!PyObject_TypeCheck(obj, &PyArray_Type)) {
+        PyErr_SetString(PyExc_TypeError, "difficulty must be a NumPy array");
+        return NULL;
+    }
+    PyArrayObject* arr = (PyArrayObject*)obj;
+    if (!PyArray_ISCONTIGUOUS(arr) || PyArray_TYPE(arr) != NPY_FLOAT32) {
+        PyErr_SetString(PyExc_ValueError, "difficulty must be a contiguous float32 array");
+        return NULL;
+    }
+    *size = PyArray_SIZE(arr);
+    return (float*)PyArray_DATA(arr);
+}
+
+/* Optional course_bank kwarg: C-contiguous float32 (buckets, courses, len)
+ * array, e.g. a read-only np.load(path, mmap_mode="r"). Only read, never
+ * written; the caller keeps it alive. Leaves bank->gaps NULL when absent. */
+static int unpack_course_bank(PyObject* kwargs, CourseBank* bank) {
+    PyObject* obj = kwargs ? PyDict_GetItemString(kwargs, "course_bank") : NULL;
+    if (obj == NULL || obj == Py_None) {
+        return 0;
+    }
+    if (!PyObject_TypeCheck(obj, &PyArray_Type)) {
+        PyErr_SetString(PyExc_TypeError, "course_bank must be a NumPy array");
+        return -1;
+    }
+    PyArrayObject* arr = (PyArrayObject*)obj;
+    if (PyArray_NDIM(arr) != 3 || PyArray_TYPE(arr) != NPY_FLOAT32 || !PyArray_IS_C_CONTIGUOUS(arr)) {
+        PyErr_SetString(PyExc_ValueError, "course_bank must be a C-contiguous 3D float32 array");
+        return -1;
+    }
+    if (PyArray_DIM(arr, 0) < 1 || PyArray_DIM(arr, 1) < 1) {
+        PyErr_SetString(PyExc_ValueError, "course_bank needs at least one bucket and one course");
+        return -1;
+    }
+    bank->gaps = (const float*)PyArray_DATA(arr);
+    bank->buckets = (int)PyArray_DIM(arr, 0);
+    bank->courses = (int)PyArray_DIM(arr, 1);
+    bank->len = (int)PyArray_DIM(arr, 2);
+    return 0;
+}
+
+/* Optional gap_values / gap_prob / gap_alias kwargs (gap_table.py): equal
+ * (buckets, size) C-contiguous arrays, float32 / float32 / int32. All three
+ * or none; the caller keeps them alive. */
+static int unpack_gap_table(PyObject* kwargs, GapTable* table) {
+    static const char* names[3] = {"gap_values", "gap_prob", "gap_alias"};
+    PyArrayObject* arrs[3];
+    int present = 0;
+    for (int k = 0; k < 3; k++) {
+        PyObject* obj = kwargs ? PyDict_GetItemString(kwargs, names[k]) : NULL;
+        arrs[k] = NULL;
+        if (obj == NULL || obj == Py_None) continue;
+        if (!PyObject_TypeCheck(obj, &PyArray_Type)) {
+            PyErr_Format(PyExc_TypeError, "%s must be a NumPy array", names[k]);
+            return -1;
+        }
+        arrs[k] = (PyArrayObject*)obj;
+        present++;
+    }
+    if (present == 0) {
+        return 0;
+    }
+    if (present != 3) {
+        PyErr_SetString(PyExc_ValueError, "gap_values, gap_prob and gap_alias must be given together");
+        return -1;
+    }
+    for (int k = 0; k < 3; k++) {
+        int type = k == 2 ? NPY_INT32 : NPY_FLOAT32;
+        if (PyArray_NDIM(arrs[k]) != 2 || PyArray_TYPE(arrs[k]) != type || !PyArray_IS_C_CONTIGUOUS(arrs[k])) {
+            PyErr_Format(PyExc_ValueError, "%s must be a C-contiguous 2D %s array", names[k], k == 2 ? "int32" : "float32");
+            return -1;
+        }
+        if (PyArray_DIM(arrs[k], 0) != PyArray_DIM(arrs[0], 0) || PyArray_DIM(arrs[k], 1) != PyArray_DIM(arrs[0], 1)) {
+            PyErr_SetString(PyExc_ValueError, "gap_values, gap_prob and gap_alias must have the same shape");
+            return -1;
+        }
+    }
+    int buckets = (int)PyArray_DIM(arrs[0], 0);
+    int size = (int)PyArray_DIM(arrs[0], 1);
+    if (buckets < 1 || size < 1) {
+        PyErr_SetString(PyExc_ValueError, "gap table needs at least one bucket and one entry");
+        return -1;
+    }
+    const int32_t* alias = (const int32_t*)PyArray_DATA(arrs[2]);
+    for (npy_intp k = 0; k < (npy_intp)buckets * size; k++) {
+        if (alias[k] < 0 || alias[k] >= size) {
+            PyErr_SetString(PyExc_ValueError, "gap_alias entries must index a column of the table");
+            return -1;
+        }
+    }
+    table->values = (const float*)PyArray_DATA(arrs[0]);
+    table->prob = (const float*)PyArray_DATA(arrs[1]);
+    table->alias = alias;
+    table->buckets = buckets;
+    table->size = size;
+    return 0;
+}
+
+/* Optional physics kwargs, each a number or (struct engine only) a 1D
+ * float32 array with one entry per env for domain randomization. Absent
+ * or None keeps the #define default already in *dest. */
+static const char* PHYSICS_KEYS[6] = {
+    "gravity", "flap_velocity", "pipe_speed_ratio", "pipe_spacing_ratio", "gap_height_ratio", "bird_radius_ratio",
+};
+
+static int unpack_physics(PyObject* kwargs, int env_id, int allow_arrays, float* dest[6]) {
+    for (int k = 0; k < 6; k++) {
+        PyObject* obj = kwargs ? PyDict_GetItemString(kwargs, PHYSICS_KEYS[k]) : NULL;
+        if (obj == NULL || obj == Py_None) continue;
+        if (PyFloat_Check(obj) || PyLong_Check(obj)) {
+            *dest[k] = (float)PyFloat_AsDouble(obj);
+            continue;
+        }
+        if (!PyObject_TypeCheck(obj, &PyArray_Type)) {
+            PyErr_Format(PyExc_TypeError, "%s must be a number or a NumPy array", PHYSICS_KEYS[k]);
+            return -1;
+        }
+        if (!allow_arrays) {
+            PyErr_Format(PyExc_ValueError, "per-env %s arrays are only supported by the struct engine", PHYSICS_KEYS[k]);
+            return -1;
+        }
+        PyArrayObject* arr = (PyArrayObject*)obj;
+        if (PyArray_NDIM(arr) != 1 || PyArray_TYPE(arr) != NPY_FLOAT32 || !PyArray_ISCONTIGUOUS(arr)) {
+            PyErr_Format(PyExc_ValueError, "%s must be a contiguous 1D float32 array", PHYSICS_KEYS[k]);
+            return -1;
+        }
+        if (env_id >= PyArray_SIZE(arr)) {
+            PyErr_Format(PyExc_ValueError, "%s array is too small for num_envs", PHYSICS_KEYS[k]);
+            return -1;
+        }
+        *dest[k] = ((float*)PyArray_DATA(arr))[env_id];
+    }
+    if (*dest[2] <= 0.0f || *dest[4] <= 0.0f || *dest[5] < 0.0f) {
+        PyErr_SetString(PyExc_ValueError, "pipe_speed_ratio and gap_height_ratio must be > 0, bird_radius_ratio >= 0");
+        return -1;
+    }
+    /* Tighter spacing needs more than MAX_PIPES pipes to fill the screen */
+    if (*dest[3] < MIN_PIPE_SPACING_RATIO) {
+        char msg[96];  /* PyErr_Format has no float conversions */
+        snprintf(msg, sizeof(msg), "pipe_spacing_ratio must be >= %g (MAX_PIPES pipes must span the screen)",
+            (double)MIN_PIPE_SPACING_RATIO);
+        PyErr_SetString(PyExc_ValueError, msg);
+        return -1;
+    }
+    return 0;
+}
+
 static int my_init(Env* env, PyObject* args, PyObject* kwargs) {
     env->width = (int)unpack(kwargs, "width");
     env->height = (int)unpack(kwargs, "height");
     env->max_steps = 5000;
     PyObject* ms = PyDict_GetItemString(kwargs, "max_steps");
     if (ms != NULL && PyLong_Check(ms)) env->max_steps = (int)PyLong_AsLong(ms);
+    PyObject* fs = PyDict_GetItemString(kwargs, "frame_skip");
+    if (fs != NULL && PyLong_Check(fs)) {
+        env->frame_skip = (int)PyLong_AsLong(fs);
+        if (env->frame_skip < 1) {
+            PyErr_SetString(PyExc_ValueError, "frame_skip must be >= 1");
+            return -1;
+        }
+    }
+    PyObject* stack = PyDict_GetItemString(kwargs, "obs_stack");
+    if (stack != NULL && PyLong_Check(stack)) {
+        env->obs_stack = (int)PyLong_AsLong(stack);
+        if (env->obs_stack < 1 || env->obs_stack > MAX_OBS_STACK) {
+            PyErr_Format(PyExc_ValueError, "obs_stack must be in [1, %d]", MAX_OBS_STACK);
+            return -1;
+        }
+    }
+    PyObject* env_id = PyDict_GetItemString(kwargs, "env_id");
+    if (env_id != NULL && PyLong_Check(env_id)) env->env_id = (int)PyLong_AsLong(env_id);
+    if (unpack_episode_buffer(kwargs, &env->episodes, &env->episode_count, &env->episode_capacity) < 0) {
+        return -1;
+    }
+    npy_intp difficulty_size;
+    float* difficulty = unpack_difficulty_array(kwargs, &difficulty_size);
+    if (PyErr_Occurred()) {
+        return -1;
+    }
+    if (difficulty) {
+        if (env->env_id >= difficulty_size) {
+            PyErr_SetString(PyExc_ValueError, "difficulty array is too small for num_envs");
+            return -1;
+        }
+        env->difficulty_src = &difficulty[env->env_id];
+    }
+    if (unpack_course_bank(kwargs, &env->bank) < 0 || unpack_gap_table(kwargs, &env->gap_table) < 0) {
+        return -1;
+    }
     init(env);
+    float* physics[6] = {
+        &env->gravity, &env->flap_velocity, &env->pipe_speed_ratio,
+        &env->pipe_spacing, &env->gap_height, &env->bird_radius_ratio,
+    };
+    if (unpack_physics(kwargs, env->env_id, 1, physics) < 0) {
+        return -1;
+    }
+    configure(env);
+    PyObject* rp = PyDict_GetItemString(kwargs, "restart_prob");
+    if (rp != NULL && rp != Py_None) {
+        env->restart_prob = (float)PyFloat_AsDouble(rp);
+        if (PyErr_Occurred() || env->restart_prob < 0.0f || env->restart_prob > 1.0f) {
+            PyErr_Clear();
+            PyErr_SetString(PyExc_ValueError, "restart_prob must be a number in [0, 1]");
+            return -1;
+        }
+    }
+    if (env->restart_prob > 0.0f) {
+        env->restart_lag = 30;
+        PyObject* lag = PyDict_GetItemString(kwargs, "restart_lag");
+        if (lag != NULL && PyLong_Check(lag)) env->restart_lag = (int)PyLong_AsLong(lag);
+        if (env->restart_lag < 1 || env->restart_lag > MAX_RESTART_LAG) {
+            PyErr_Format(PyExc_ValueError, "restart_lag must be in [1, %d]", MAX_RESTART_LAG);
+            return -1;
+        }
+        if (restart_alloc(env) < 0) {
+            PyErr_SetString(PyExc_MemoryError, "Failed to allocate restart states");
+            return -1;
+        }
+    }
     return 0;
 }
 
@@ -20,5 +318,725 @@ static int my_log(PyObject* dict, Log* log) {
     assign_to_dict(dict, "episode_return", log->episode_return);
     assign_to_dict(dict, "episode_length", log->episode_length);
     assign_to_dict(dict, "difficulty", log->difficulty);
+    assign_to_dict(dict, "agent_steps", log->agent_steps);
+    return 0;
+}
+
+/* Structure-of-arrays engine (flappy_batch.h). Same buffer and seed
+ * arguments as vec_init; the handle is a FlappyBatch*. */
+
+static FlappyBatch* unpack_batch(PyObject* args) {
+    PyObject* handle_obj = PyTuple_GetItem(args, 0);
+    if (!PyObject_TypeCheck(handle_obj, &PyLong_Type)) {
+        PyErr_SetString(PyExc_TypeError, "batch handle must be an integer");
+        return NULL;
+    }
+    FlappyBatch* b = (FlappyBatch*)PyLong_AsVoidPtr(handle_obj);
+    if (!b || b->num_envs <= 0) {
+        PyErr_SetString(PyExc_ValueError, "Missing or invalid batch handle");
+        return NULL;
+    }
+    return b;
+}
+
+static void* batch_buffer(PyObject* args, int idx, const char* name, npy_intp min_size) {
+    PyObject* obj = PyTuple_GetItem(args, idx);
+    if (!PyObject_TypeCheck(obj, &PyArray_Type)) {
+        PyErr_Format(PyExc_TypeError, "%s must be a NumPy array", name);
+        return NULL;
+    }
+    PyArrayObject* arr = (PyArrayObject*)obj;
+    if (!PyArray_ISCONTIGUOUS(arr)) {
+        PyErr_Format(PyExc_ValueError, "%s must be contiguous", name);
+        return NULL;
+    }
+    if (PyArray_SIZE(arr) < min_size) {
+        PyErr_Format(PyExc_ValueError, "%s is too small for num_envs", name);
+        return NULL;
+    }
+    return PyArray_DATA(arr);
+}
+
+static int unpack_difficulty(PyObject* args, int idx, float* difficulty) {
+    if (PyTuple_Size(args) <= idx) return 0;
+    PyObject* diff_arg = PyTuple_GetItem(args, idx);
+    if (PyFloat_Check(diff_arg))
+        *difficulty = (float)PyFloat_AsDouble(diff_arg);
+    else if (PyLong_Check(diff_arg))
+        *difficulty = (float)PyLong_AsLong(diff_arg);
+    else {
+        PyErr_SetString(PyExc_TypeError, "difficulty must be a number");
+        return -1;
+    }
+    return 1;
+}
+
+static PyObject* batch_init(PyObject* self, PyObject* args, PyObject* kwargs) {
+    if (PyTuple_Size(args) != 7) {
+        PyErr_SetString(PyExc_TypeError, "batch_init requires 7 arguments");
+        return NULL;
+    }
+    PyObject* num_envs_arg = PyTuple_GetItem(args, 5);
+    PyObject* seed_arg = PyTuple_GetItem(args, 6);
+    if (!PyLong_Check(num_envs_arg) || !PyLong_Check(seed_arg)) {
+        PyErr_SetString(PyExc_TypeError, "num_envs and seed must be integers");
+        return NULL;
+    }
+    int num_envs = (int)PyLong_AsLong(num_envs_arg);
+    int seed = (int)PyLong_AsLong(seed_arg);
+    if (num_envs <= 0) {
+        PyErr_SetString(PyExc_ValueError, "num_envs must be greater than 0");
+        return NULL;
+    }
+    if (kwargs == NULL) {
+        PyErr_SetString(PyExc_TypeError, "batch_init requires width and height kwargs");
+        return NULL;
+    }
+
+    float* observations = batch_buffer(args, 0, "Observations", (npy_intp)num_envs * OBS_DIM);
+    int* actions = batch_buffer(args, 1, "Actions", num_envs);
+    float* rewards = batch_buffer(args, 2, "Rewards", num_envs);
+    unsigned char* terminals = batch_buffer(args, 3, "Terminals", num_envs);
+    if (!observations || !actions || !rewards || !terminals) {
+        return NULL;
+    }
+    if (PyArray_ITEMSIZE((PyArrayObject*)PyTuple_GetItem(args, 1)) != sizeof(int)) {
+        PyErr_SetString(PyExc_ValueError, "Actions must be int32");
+        return NULL;
+    }
+
+    int width = (int)unpack(kwargs, "width");
+    int height = (int)unpack(kwargs, "height");
+    if (PyErr_Occurred()) {
+        return NULL;
+    }
+
+    FlappyBatch* b = batch_alloc(num_envs);
+    if (!b) {
+        PyErr_SetString(PyExc_MemoryError, "Failed to allocate batch env");
+        return NULL;
+    }
+    b->observations = observations;
+    b->actions = actions;
+    b->rewards = rewards;
+    b->terminals = terminals;
+    b->width = width;
+    b->height = height;
+    b->max_steps = 5000;
+    PyObject* ms = PyDict_GetItemString(kwargs, "max_steps");
+    if (ms != NULL && PyLong_Check(ms)) b->max_steps = (int)PyLong_AsLong(ms);
+    PyObject* fs = PyDict_GetItemString(kwargs, "frame_skip");
+    if (fs != NULL && PyLong_Check(fs) && PyLong_AsLong(fs) != 1) {
+        PyErr_SetString(PyExc_ValueError, "frame_skip is only supported by the struct engine");
+        batch_free(b);
+        return NULL;
+    }
+    PyObject* stack = PyDict_GetItemString(kwargs, "obs_stack");
+    if (stack != NULL && PyLong_Check(stack) && PyLong_AsLong(stack) != 1) {
+        PyErr_SetString(PyExc_ValueError, "obs_stack is only supported by the struct engine");
+        batch_free(b);
+        return NULL;
+    }
+    PyObject* rp = PyDict_GetItemString(kwargs, "restart_prob");
+    if (rp != NULL && rp != Py_None && PyObject_IsTrue(rp)) {
+        PyErr_SetString(PyExc_ValueError, "restart_prob is only supported by the struct engine");
+        batch_free(b);
+        return NULL;
+    }
+    batch_defaults(b);
+    float* physics[6] = {
+        &b->gravity, &b->flap_velocity, &b->pipe_speed_ratio,
+        &b->pipe_spacing, &b->gap_height, &b->bird_radius_ratio,
+    };
+    if (unpack_physics(kwargs, 0, 0, physics) < 0) {
+        batch_free(b);
+        return NULL;
+    }
+    batch_configure(b);
+    if (unpack_episode_buffer(kwargs, &b->episodes, &b->episode_count, &b->episode_capacity) < 0) {
+        batch_free(b);
+        return NULL;
+    }
+    npy_intp difficulty_size;
+    float* difficulty = unpack_difficulty_array(kwargs, &difficulty_size);
+    if (PyErr_Occurred()) {
+        batch_free(b);
+        return NULL;
+    }
+    if (difficulty) {
+        if (difficulty_size < num_envs) {
+            PyErr_SetString(PyExc_ValueError, "difficulty array is too small for num_envs");
+            batch_free(b);
+            return NULL;
+        }
+        b->difficulty_src = difficulty;
+    }
+    if (unpack_course_bank(kwargs, &b->bank) < 0 || unpack_gap_table(kwargs, &b->gap_table) < 0) {
+        batch_free(b);
+        return NULL;
+    }
+
+    // Same per-env seeds as vec_init so both engines produce the same trajectories
+    for (int i = 0; i < num_envs; i++) {
+        batch_seed(b, i, (uint32_t)(i + seed*num_envs));
+    }
+    return PyLong_FromVoidPtr(b);
+}
+
+static PyObject* batch_reset(PyObject* self, PyObject* args) {
+    if (PyTuple_Size(args) != 2 && PyTuple_Size(args) != 3) {
+        PyErr_SetString(PyExc_TypeError, "batch_reset requires 2 (batch, seed) or 3 (batch, seed, difficulty) arguments");
+        return NULL;
+    }
+    FlappyBatch* b = unpack_batch(args);
+    if (!b) {
+        return NULL;
+    }
+    PyObject* seed_arg = PyTuple_GetItem(args, 1);
+    if (!PyLong_Check(seed_arg)) {
+        PyErr_SetString(PyExc_TypeError, "seed must be an integer");
+        return NULL;
+    }
+    int seed = (int)PyLong_AsLong(seed_arg);
+    float difficulty = 0.0f;
+    if (unpack_difficulty(args, 2, &difficulty) < 0) {
+        return NULL;
+    }
+    for (int i = 0; i < b->num_envs; i++) {
+        batch_seed(b, i, (uint32_t)(i + seed*b->num_envs));
+    }
+    c_reset_batch(b, difficulty);
+    Py_RETURN_NONE;
+}
+
+static PyObject* batch_step(PyObject* self, PyObject* args) {
+    if (PyTuple_Size(args) != 1 && PyTuple_Size(args) != 2) {
+        PyErr_SetString(PyExc_TypeError, "batch_step requires 1 or 2 (batch, difficulty) arguments");
+        return NULL;
+    }
+    FlappyBatch* b = unpack_batch(args);
+    if (!b) {
+        return NULL;
+    }
+    float difficulty;
+    int has_difficulty = unpack_difficulty(args, 1, &difficulty);
+    if (has_difficulty < 0) {
+        return NULL;
+    }
+    // Same semantics as vec_step: auto-resets use the pushed difficulty
+    // (ignored when the envs read a shared difficulty array)
+    if (has_difficulty && !b->difficulty_src) {
+        for (int i = 0; i < b->num_envs; i++) {
+            b->next_difficulty[i] = difficulty;
+        }
+    }
+    c_step_batch(b);
+    Py_RETURN_NONE;
+}
+
+static PyObject* batch_log(PyObject* self, PyObject* args) {
+    FlappyBatch* b = unpack_batch(args);
+    if (!b) {
+        return NULL;
+    }
+    // Same aggregation as vec_log (Log is all floats)
+    Log aggregate = {0};
+    int num_keys = sizeof(Log) / sizeof(float);
+    for (int i = 0; i < b->num_envs; i++) {
+        b->logs[i].episode_return = b->log_return[i];
+        b->log_return[i] = 0.0f;
+        for (int j = 0; j < num_keys; j++) {
+            ((float*)&aggregate)[j] += ((float*)&b->logs[i])[j];
+            ((float*)&b->logs[i])[j] = 0.0f;
+        }
+    }
+    PyObject* dict = PyDict_New();
+    if (aggregate.n == 0.0f) {
+        return dict;
+    }
+    float n = aggregate.n;
+    for (int i = 0; i < num_keys; i++) {
+        ((float*)&aggregate)[i] /= n;
+    }
+    my_log(dict, &aggregate);
+    assign_to_dict(dict, "n", n);
+    return dict;
+}
+
+static PyObject* batch_close(PyObject* self, PyObject* args) {
+    FlappyBatch* b = unpack_batch(args);
+    if (!b) {
+        return NULL;
+    }
+    batch_free(b);
+    Py_RETURN_NONE;
+}
+
+/* Selective reset: (handle, env_ids, seeds[, difficulty]). env_ids and
+ * seeds are equal-length integer arrays; env env_ids[k] is seeded with
+ * seeds[k] exactly as env_reset does, so an env can start any episode of a
+ * seed+episode schedule while the others keep running. */
+static int unpack_reset_envs(PyObject* args, int num_envs, PyArrayObject** ids, PyArrayObject** seeds, float* difficulty) {
+    if (PyTuple_Size(args) != 3 && PyTuple_Size(args) != 4) {
+        PyErr_SetString(PyExc_TypeError, "reset_envs requires 3 (handle, env_ids, seeds) or 4 (handle, env_ids, seeds, difficulty) arguments");
+        return -1;
+    }
+    if (unpack_difficulty(args, 3, difficulty) < 0) {
+        return -1;
+    }
+    *ids = (PyArrayObject*)PyArray_FROM_OTF(PyTuple_GetItem(args, 1), NPY_INT32, NPY_ARRAY_IN_ARRAY);
+    if (!*ids) {
+        return -1;
+    }
+    *seeds = (PyArrayObject*)PyArray_FROM_OTF(PyTuple_GetItem(args, 2), NPY_INT64, NPY_ARRAY_IN_ARRAY);
+    if (!*seeds) {
+        Py_DECREF(*ids);
+        return -1;
+    }
+    if (PyArray_SIZE(*ids) != PyArray_SIZE(*seeds)) {
+        PyErr_SetString(PyExc_ValueError, "env_ids and seeds must have the same length");
+        goto fail;
+    }
+    int32_t* id = (int32_t*)PyArray_DATA(*ids);
+    for (npy_intp k = 0; k < PyArray_SIZE(*ids); k++) {
+        if (id[k] < 0 || id[k] >= num_envs) {
+            PyErr_Format(PyExc_IndexError, "env id %d out of range for %d envs", id[k], num_envs);
+            goto fail;
+        }
+    }
     return 0;
+fail:
+    Py_DECREF(*ids);
+    Py_DECREF(*seeds);
+    return -1;
+}
+
+static PyObject* vec_reset_envs(PyObject* self, PyObject* args) {
+    VecEnv* vec = unpack_vecenv(args);
+    if (!vec) {
+        return NULL;
+    }
+    PyArrayObject* ids;
+    PyArrayObject* seeds;
+    float difficulty = 0.0f;
+    if (unpack_reset_envs(args, vec->num_envs, &ids, &seeds, &difficulty) < 0) {
+        return NULL;
+    }
+    int32_t* id = (int32_t*)PyArray_DATA(ids);
+    int64_t* seed = (int64_t*)PyArray_DATA(seeds);
+    for (npy_intp k = 0; k < PyArray_SIZE(ids); k++) {
+        c_seed(vec->envs[id[k]], (uint32_t)seed[k]);
+        c_reset(vec->envs[id[k]], difficulty);
+    }
+    Py_DECREF(ids);
+    Py_DECREF(seeds);
+    Py_RETURN_NONE;
+}
+
+static PyObject* batch_reset_envs(PyObject* self, PyObject* args) {
+    FlappyBatch* b = unpack_batch(args);
+    if (!b) {
+        return NULL;
+    }
+    PyArrayObject* ids;
+    PyArrayObject* seeds;
+    float difficulty = 0.0f;
+    if (unpack_reset_envs(args, b->num_envs, &ids, &seeds, &difficulty) < 0) {
+        return NULL;
+    }
+    int32_t* id = (int32_t*)PyArray_DATA(ids);
+    int64_t* seed = (int64_t*)PyArray_DATA(seeds);
+    for (npy_intp k = 0; k < PyArray_SIZE(ids); k++) {
+        batch_seed(b, id[k], (uint32_t)seed[k]);
+        batch_reset_env(b, id[k], difficulty);
+    }
+    batch_observations(b);
+    Py_DECREF(ids);
+    Py_DECREF(seeds);
+    Py_RETURN_NONE;
+}
+
+/* Pipe courses (paired eval). vec_set_courses(handle, courses) attaches a
+ * C-contiguous float32 (num_courses, course_len) array of gap centers to
+ * every env, or detaches with None. The caller keeps the array alive
+ * while attached. */
+static PyObject* vec_set_courses(PyObject* self, PyObject* args) {
+    if (PyTuple_Size(args) != 2) {
+        PyErr_SetString(PyExc_TypeError, "vec_set_courses requires 2 (handle, courses) arguments");
+        return NULL;
+    }
+    VecEnv* vec = unpack_vecenv(args);
+    if (!vec) {
+        return NULL;
+    }
+    PyObject* obj = PyTuple_GetItem(args, 1);
+    const float* courses = NULL;
+    int num_courses = 0;
+    int course_len = 0;
+    if (obj != Py_None) {
+        if (!PyObject_TypeCheck(obj, &PyArray_Type)) {
+            PyErr_SetString(PyExc_TypeError, "courses must be a NumPy array or None");
+            return NULL;
+        }
+        PyArrayObject* arr = (PyArrayObject*)obj;
+        if (PyArray_NDIM(arr) != 2 || PyArray_TYPE(arr) != NPY_FLOAT32 || !PyArray_IS_C_CONTIGUOUS(arr)) {
+            PyErr_SetString(PyExc_ValueError, "courses must be a C-contiguous 2D float32 array");
+            return NULL;
+        }
+        courses = (const float*)PyArray_DATA(arr);
+        num_courses = (int)PyArray_DIM(arr, 0);
+        course_len = (int)PyArray_DIM(arr, 1);
+    }
+    for (int i = 0; i < vec->num_envs; i++) {
+        Flappy* env = vec->envs[i];
+        env->courses = courses;
+        env->num_courses = num_courses;
+        env->courses_len = course_len;
+        env->pending_course = -1;
+    }
+    Py_RETURN_NONE;
+}
+
+/* vec_queue_courses(handle, env_ids, course_ids): env env_ids[k] plays row
+ * course_ids[k] (-1 = sample as usual) from its next reset, for one
+ * episode. Call right before vec_reset_envs. */
+static PyObject* vec_queue_courses(PyObject* self, PyObject* args) {
+    if (PyTuple_Size(args) != 3) {
+        PyErr_SetString(PyExc_TypeError, "vec_queue_courses requires 3 (handle, env_ids, course_ids) arguments");
+        return NULL;
+    }
+    VecEnv* vec = unpack_vecenv(args);
+    if (!vec) {
+        return NULL;
+    }
+    PyArrayObject* ids = (PyArrayObject*)PyArray_FROM_OTF(PyTuple_GetItem(args, 1), NPY_INT32, NPY_ARRAY_IN_ARRAY);
+    if (!ids) {
+        return NULL;
+    }
+    PyArrayObject* rows = (PyArrayObject*)PyArray_FROM_OTF(PyTuple_GetItem(args, 2), NPY_INT32, NPY_ARRAY_IN_ARRAY);
+    if (!rows) {
+        Py_DECREF(ids);
+        return NULL;
+    }
+    PyObject* result = NULL;
+    int32_t* id = (int32_t*)PyArray_DATA(ids);
+    int32_t* row = (int32_t*)PyArray_DATA(rows);
+    if (PyArray_SIZE(ids) != PyArray_SIZE(rows)) {
+        PyErr_SetString(PyExc_ValueError, "env_ids and course_ids must have the same length");
+        goto done;
+    }
+    for (npy_intp k = 0; k < PyArray_SIZE(ids); k++) {
+        if (id[k] < 0 || id[k] >= vec->num_envs) {
+            PyErr_Format(PyExc_IndexError, "env id %d out of range for %d envs", id[k], vec->num_envs);
+            goto done;
+        }
+        if (row[k] < -1 || row[k] >= vec->envs[id[k]]->num_courses) {
+            PyErr_Format(PyExc_IndexError, "course id %d out of range for %d courses", row[k], vec->envs[id[k]]->num_courses);
+            goto done;
+        }
+    }
+    for (npy_intp k = 0; k < PyArray_SIZE(ids); k++) {
+        vec->envs[id[k]]->pending_course = row[k];
+    }
+    Py_INCREF(Py_None);
+    result = Py_None;
+done:
+    Py_DECREF(ids);
+    Py_DECREF(rows);
+    return result;
+}
+
+/* sample_course(seed, difficulty, length): the first length gap centers an
+ * env seeded with seed (c_seed) spawns at a fixed difficulty, as float32. */
+static PyObject* sample_course(PyObject* self, PyObject* args) {
+    long long seed;
+    float difficulty;
+    int length;
+    if (!PyArg_ParseTuple(args, "Lfi", &seed, &difficulty, &length)) {
+        return NULL;
+    }
+    if (length < 0) {
+        PyErr_SetString(PyExc_ValueError, "length must be non-negative");
+        return NULL;
+    }
+    npy_intp dims[1] = {length};
+    PyArrayObject* arr = (PyArrayObject*)PyArray_SimpleNew(1, dims, NPY_FLOAT32);
+    if (!arr) {
+        return NULL;
+    }
+    float* out = (float*)PyArray_DATA(arr);
+    uint32_t rng = seed_rng((uint32_t)seed);
+    for (int k = 0; k < length; k++) {
+        out[k] = sample_gap_center(&rng, difficulty);
+    }
+    return (PyObject*)arr;
+}
+
+/* State snapshots (FlappyState in flappy.h) for branching rollouts.
+ * get_state(handle, env_ids) returns a (len(env_ids), state_size()) uint8
+ * array; set_state(handle, env_ids, states) restores rows of such an array
+ * and rewrites the observations of those envs. States only restore into
+ * envs with the same configuration (pipe count, obs_stack, courses). */
+static PyArrayObject* unpack_state_ids(PyObject* obj, int num_envs) {
+    PyArrayObject* ids = (PyArrayObject*)PyArray_FROM_OTF(obj, NPY_INT32, NPY_ARRAY_IN_ARRAY);
+    if (!ids) {
+        return NULL;
+    }
+    int32_t* id = (int32_t*)PyArray_DATA(ids);
+    for (npy_intp k = 0; k < PyArray_SIZE(ids); k++) {
+        if (id[k] < 0 || id[k] >= num_envs) {
+            PyErr_Format(PyExc_IndexError, "env id %d out of range for %d envs", id[k], num_envs);
+            Py_DECREF(ids);
+            return NULL;
+        }
+    }
+    return ids;
+}
+
+static PyArrayObject* new_states(npy_intp n) {
+    npy_intp dims[2] = {n, (npy_intp)sizeof(FlappyState)};
+    return (PyArrayObject*)PyArray_SimpleNew(2, dims, NPY_UINT8);
+}
+
+/* states as a C-contiguous uint8 array of n rows of sizeof(FlappyState) */
+static PyArrayObject* unpack_states(PyObject* obj, npy_intp n) {
+    PyArrayObject* states = (PyArrayObject*)PyArray_FROM_OTF(obj, NPY_UINT8, NPY_ARRAY_IN_ARRAY);
+    if (!states) {
+        return NULL;
+    }
+    if (PyArray_SIZE(states) != n * (npy_intp)sizeof(FlappyState)) {
+        PyErr_Format(PyExc_ValueError, "states must hold %zd rows of %zu bytes", (Py_ssize_t)n, sizeof(FlappyState));
+        Py_DECREF(states);
+        return NULL;
+    }
+    return states;
+}
+
+static PyObject* state_size(PyObject* self, PyObject* args) {
+    return PyLong_FromSize_t(sizeof(FlappyState));
+}
+
+/* {name: value} of the #defines Python derives course lengths and physics
+ * bounds from, so they are never copied by hand */
+static PyObject* constants(PyObject* self, PyObject* args) {
+    return Py_BuildValue("{s:f,s:f,s:f,s:i}", "pipe_speed_ratio", PIPE_SPEED_RATIO,
+        "pipe_spacing_ratio", PIPE_SPACING_RATIO, "min_pipe_spacing_ratio", MIN_PIPE_SPACING_RATIO,
+        "max_pipes", MAX_PIPES);
+}
+
+static PyObject* vec_get_state(PyObject* self, PyObject* args) {
+    VecEnv* vec = unpack_vecenv(args);
+    if (!vec) {
+        return NULL;
+    }
+    if (PyTuple_Size(args) != 2) {
+        PyErr_SetString(PyExc_TypeError, "vec_get_state requires 2 (handle, env_ids) arguments");
+        return NULL;
+    }
+    PyArrayObject* ids = unpack_state_ids(PyTuple_GetItem(args, 1), vec->num_envs);
+    if (!ids) {
+        return NULL;
+    }
+    PyArrayObject* out = new_states(PyArray_SIZE(ids));
+    if (out) {
+        int32_t* id = (int32_t*)PyArray_DATA(ids);
+        FlappyState* st = (FlappyState*)PyArray_DATA(out);
+        for (npy_intp k = 0; k < PyArray_SIZE(ids); k++) {
+            c_get_state(vec->envs[id[k]], &st[k]);
+        }
+    }
+    Py_DECREF(ids);
+    return (PyObject*)out;
+}
+
+static PyObject* vec_set_state(PyObject* self, PyObject* args) {
+    VecEnv* vec = unpack_vecenv(args);
+    if (!vec) {
+        return NULL;
+    }
+    if (PyTuple_Size(args) != 3) {
+        PyErr_SetString(PyExc_TypeError, "vec_set_state requires 3 (handle, env_ids, states) arguments");
+        return NULL;
+    }
+    PyArrayObject* ids = unpack_state_ids(PyTuple_GetItem(args, 1), vec->num_envs);
+    if (!ids) {
+        return NULL;
+    }
+    PyArrayObject* states = unpack_states(PyTuple_GetItem(args, 2), PyArray_SIZE(ids));
+    if (!states) {
+        Py_DECREF(ids);
+        return NULL;
+    }
+    PyObject* result = NULL;
+    int32_t* id = (int32_t*)PyArray_DATA(ids);
+    const FlappyState* st = (const FlappyState*)PyArray_DATA(states);
+    // Check every row before writing any, so a bad row changes nothing
+    for (npy_intp k = 0; k < PyArray_SIZE(ids); k++) {
+        Flappy* env = vec->envs[id[k]];
+        const char* err = check_state(&st[k], env->num_pipes, env->obs_stack, &env->bank, env->num_courses, env->courses_len);
+        if (err) {
+            PyErr_Format(PyExc_ValueError, "env %d: %s", id[k], err);
+            goto done;
+        }
+    }
+    for (npy_intp k = 0; k < PyArray_SIZE(ids); k++) {
+        c_set_state(vec->envs[id[k]], &st[k]);
+    }
+    Py_INCREF(Py_None);
+    result = Py_None;
+done:
+    Py_DECREF(ids);
+    Py_DECREF(states);
+    return result;
+}
+
+static PyObject* batch_get_state(PyObject* self, PyObject* args) {
+    FlappyBatch* b = unpack_batch(args);
+    if (!b) {
+        return NULL;
+    }
+    if (PyTuple_Size(args) != 2) {
+        PyErr_SetString(PyExc_TypeError, "batch_get_state requires 2 (handle, env_ids) arguments");
+        return NULL;
+    }
+    PyArrayObject* ids = unpack_state_ids(PyTuple_GetItem(args, 1), b->num_envs);
+    if (!ids) {
+        return NULL;
+    }
+    PyArrayObject* out = new_states(PyArray_SIZE(ids));
+    if (out) {
+        int32_t* id = (int32_t*)PyArray_DATA(ids);
+        FlappyState* st = (FlappyState*)PyArray_DATA(out);
+        for (npy_intp k = 0; k < PyArray_SIZE(ids); k++) {
+            c_get_state_batch(b, id[k], &st[k]);
+        }
+    }
+    Py_DECREF(ids);
+    return (PyObject*)out;
+}
+
+static PyObject* batch_set_state(PyObject* self, PyObject* args) {
+    FlappyBatch* b = unpack_batch(args);
+    if (!b) {
+        return NULL;
+    }
+    if (PyTuple_Size(args) != 3) {
+        PyErr_SetString(PyExc_TypeError, "batch_set_state requires 3 (handle, env_ids, states) arguments");
+        return NULL;
+    }
+    PyArrayObject* ids = unpack_state_ids(PyTuple_GetItem(args, 1), b->num_envs);
+    if (!ids) {
+        return NULL;
+    }
+    PyArrayObject* states = unpack_states(PyTuple_GetItem(args, 2), PyArray_SIZE(ids));
+    if (!states) {
+        Py_DECREF(ids);
+        return NULL;
+    }
+    PyObject* result = NULL;
+    int32_t* id = (int32_t*)PyArray_DATA(ids);
+    const FlappyState* st = (const FlappyState*)PyArray_DATA(states);
+    for (npy_intp k = 0; k < PyArray_SIZE(ids); k++) {
+        const char* err = check_state(&st[k], b->num_pipes, 1, &b->bank, 0, 0);
+        if (!err && st[k].course_source == 2 && st[k].course_len != b->bank.len)
+            err = "state plays a course this env does not have";
+        if (!err && st[k].agent_steps != st[k].step_count)
+            err = "state was taken with frame_skip > 1";
+        if (err) {
+            PyErr_Format(PyExc_ValueError, "env %d: %s", id[k], err);
+            goto done;
+        }
+    }
+    for (npy_intp k = 0; k < PyArray_SIZE(ids); k++) {
+        c_set_state_batch(b, id[k], &st[k]);
+    }
+    batch_observations(b);
+    Py_INCREF(Py_None);
+    result = Py_None;
+done:
+    Py_DECREF(ids);
+    Py_DECREF(states);
+    return result;
+}
+
+/* vec_simulate(handle, env_ids, states, actions) -> (returns, ends, obs):
+ * for each row n, plays actions[n] (int32 (N, K)) from states[n] on a
+ * private copy of env env_ids[n] (its physics, courses and tables; its
+ * live state is untouched). returns is float32 (N,), ends the step each
+ * episode ended on (int32, -1 = survived all K) and obs the last
+ * observation of each row. Threaded like vec_step when num_threads > 1. */
+static PyObject* vec_simulate(PyObject* self, PyObject* args) {
+    if (PyTuple_Size(args) != 4) {
+        PyErr_SetString(PyExc_TypeError, "vec_simulate requires 4 (handle, env_ids, states, actions) arguments");
+        return NULL;
+    }
+    VecEnv* vec = unpack_vecenv(args);
+    if (!vec) {
+        return NULL;
+    }
+    PyArrayObject* ids = unpack_state_ids(PyTuple_GetItem(args, 1), vec->num_envs);
+    if (!ids) {
+        return NULL;
+    }
+    PyArrayObject* states = unpack_states(PyTuple_GetItem(args, 2), PyArray_SIZE(ids));
+    if (!states) {
+        Py_DECREF(ids);
+        return NULL;
+    }
+    PyObject* result = NULL;
+    PyArrayObject* returns = NULL;
+    PyArrayObject* ends = NULL;
+    PyArrayObject* obs = NULL;
+    npy_intp n = PyArray_SIZE(ids);
+    PyArrayObject* actions = (PyArrayObject*)PyArray_FROM_OTF(PyTuple_GetItem(args, 3), NPY_INT32, NPY_ARRAY_IN_ARRAY);
+    if (!actions) {
+        goto done;
+    }
+    if (PyArray_NDIM(actions) != 2 || PyArray_DIM(actions, 0) != n) {
+        PyErr_Format(PyExc_ValueError, "actions must be an (%zd, K) array", (Py_ssize_t)n);
+        goto done;
+    }
+    int32_t* id = (int32_t*)PyArray_DATA(ids);
+    const FlappyState* st = (const FlappyState*)PyArray_DATA(states);
+    int obs_size = n > 0 ? vec->envs[id[0]]->obs_stack * OBS_DIM : OBS_DIM;
+    for (npy_intp k = 0; k < n; k++) {
+        Flappy* env = vec->envs[id[k]];
+        const char* err = check_state(&st[k], env->num_pipes, env->obs_stack, &env->bank, env->num_courses, env->courses_len);
+        if (err) {
+            PyErr_Format(PyExc_ValueError, "env %d: %s", id[k], err);
+            goto done;
+        }
+    }
+    npy_intp dims[2] = {n, obs_size};
+    returns = (PyArrayObject*)PyArray_SimpleNew(1, dims, NPY_FLOAT32);
+    ends = (PyArrayObject*)PyArray_SimpleNew(1, dims, NPY_INT32);
+    obs = (PyArrayObject*)PyArray_SimpleNew(2, dims, NPY_FLOAT32);
+    if (!returns || !ends || !obs) {
+        goto done;
+    }
+    Env** envs = vec->envs;
+    const int* act = (const int*)PyArray_DATA(actions);
+    int horizon = (int)PyArray_DIM(actions, 1);
+    float* ret = (float*)PyArray_DATA(returns);
+    int* end = (int*)PyArray_DATA(ends);
+    float* o = (float*)PyArray_DATA(obs);
+    int num_threads = vec->num_threads;
+    Py_BEGIN_ALLOW_THREADS
+#ifdef _OPENMP
+    #pragma omp parallel for schedule(static) num_threads(num_threads) if(num_threads > 1)
+#endif
+    for (npy_intp k = 0; k < n; k++) {
+        c_simulate(envs[id[k]], &st[k], &act[k * horizon], horizon, &ret[k], &end[k], &o[k * obs_size]);
+    }
+    Py_END_ALLOW_THREADS
+    (void)num_threads;
+    result = PyTuple_Pack(3, returns, ends, obs);
+done:
+    Py_DECREF(ids);
+    Py_DECREF(states);
+    Py_XDECREF(actions);
+    Py_XDECREF(returns);
+    Py_XDECREF(ends);
+    Py_XDECREF(obs);
+    return result;
 }
@@ -0,0 +1,123 @@
+"""
+Pre-generated pipe-course bank for Flappy v3.
+
+A bank is one .npy file of float32 gap centers shaped (buckets, courses, len):
+bucket b holds courses sampled at difficulty b / (buckets - 1) with the same
+sampler as the C envs. FlappyCurriculum(course_bank=path) memory-maps it
+read-only, so every worker process shares one page-cache copy; at each reset
+a C env picks a course of the bucket nearest its difficulty (one draw from
+its own RNG) and each pipe spawn just takes the next gap. Courses are the
+same bytes on every process and machine.
+
+Courses must cover a whole episode: faster pipes, tighter spacing or a
+higher max_steps need longer ones (course_length), and FlappyCurriculum
+rejects banks that are too short for its max_steps and physics.
+
+Build one (from repo root):
+  uv run python -m variations.flappyv3.course_bank --out variations/flappyv3/courses.npy
+  uv run python -m variations.flappyv3.course_bank --out courses.npy --buckets 21 --courses 4096
+  uv run python -m variations.flappyv3.course_bank --out fast.npy --pipe-speed-ratio 0.009 --max-steps 8000
+"""
+
+import argparse
+import math
+
+import numpy as np
+
+from . import binding
+
+# flappy.h defaults (a pipe is recycled every pipe_spacing_ratio /
+# pipe_speed_ratio steps), read from the binding; without it, from the
+# NumPy engine, whose copies parity checks against the binding's.
+if binding is not None:
+    _constants = binding.constants()
+    PIPE_SPEED_RATIO = _constants["pipe_speed_ratio"]
+    PIPE_SPACING_RATIO = _constants["pipe_spacing_ratio"]
+    MIN_PIPE_SPACING_RATIO = _constants["min_pipe_spacing_ratio"]
+    MAX_PIPES = _constants["max_pipes"]
+else:
+    from .numpy_engine import MAX_PIPES, MIN_PIPE_SPACING_RATIO, PIPE_SPACING_RATIO, PIPE_SPEED_RATIO
+
+
+def course_length(max_steps: int = 5000, physics=None) -> int:
+    """Gap centers an episode of at most max_steps can spawn (initial pipes + recycles).
+
+    physics is a FlappyCurriculum physics dict; with per-env arrays (or
+    (lo, hi) ranges) the fastest pipes and tightest spacing set the length.
+    """
+    physics = physics or {}
+    speed = float(np.max(physics.get("pipe_speed_ratio", PIPE_SPEED_RATIO)))
+    spacing = float(np.min(physics.get("pipe_spacing_ratio", PIPE_SPACING_RATIO)))
+    return MAX_PIPES + math.ceil(max_steps * speed / spacing) + 1
+
+
+def check_course_length(length: int, max_steps: int, physics=None):
+    """ValueError if courses of length gaps can run out within an episode.
+
+    A course that runs out hands over to the env RNG, which was never
+    advanced by the course's gaps, so the episode would replay its opening.
+    """
+    needed = course_length(max_steps, physics)
+    if length < needed:
+        raise ValueError(
+            f"courses have {length} gaps but an episode (max_steps={max_steps}, pipe_speed_ratio and "
+            f"pipe_spacing_ratio as configured) can spawn {needed}; build them with course_length(max_steps, physics)"
+        )
+
+
+def make_courses(seeds, difficulty: float, length: int | None = None) -> np.ndarray:
+    """(len(seeds), length) float32 courses: row k is the gap sequence a C env seeded with seeds[k] spawns."""
+    length = course_length() if length is None else length
+    courses = np.empty((len(seeds), length), dtype=np.float32)
+    for k, seed in enumerate(seeds):
+        courses[k] = binding.sample_course(int(seed), float(difficulty), length)
+    return courses
+
+
+def build_course_bank(path, buckets=21, courses=4096, length=None, seed=0, max_steps=5000, physics=None):
+    """Write a (buckets, courses, length) bank to path (.npy); course k of bucket b uses seed seed + b*courses + k.
+
+    length defaults to course_length(max_steps, physics).
+    """
+    if buckets < 1 or courses < 1:
+        raise ValueError("a course bank needs at least one bucket and one course")
+    length = course_length(max_steps, physics) if length is None else length
+    bank = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(buckets, courses, length))
+    for b in range(buckets):
+        difficulty = b / max(1, buckets - 1)
+        bank[b] = make_courses(seed + b * courses + np.arange(courses), difficulty, length)
+    bank.flush()
+    del bank
+    return load_course_bank(path)
+
+
+def load_course_bank(path):
+    """Read-only memory map of a bank written by build_course_bank."""
+    bank = np.load(path, mmap_mode="r")
+    if bank.ndim != 3 or bank.dtype != np.float32:
+        raise ValueError(f"{path} is not a course bank: expected 3D float32, got {bank.ndim}D {bank.dtype}")
+    return bank
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a Flappy v3 pipe-course bank")
+    parser.add_argument("--out", type=str, required=True, help="Output .npy path")
+    parser.add_argument("--buckets", type=int, default=21, help="Difficulty buckets over [0, 1]")
+    parser.add_argument("--courses", type=int, default=4096, help="Courses per bucket")
+    parser.add_argument("--length", type=int, default=None, help="Gaps per course (default: enough for --max-steps)")
+    parser.add_argument("--max-steps", type=int, default=5000, help="Longest episode the bank must cover")
+    parser.add_argument(
+        "--pipe-speed-ratio", type=float, default=PIPE_SPEED_RATIO, help="Fastest pipe speed trained with (physics)"
+    )
+    parser.add_argument(
+        "--pipe-spacing-ratio", type=float, default=PIPE_SPACING_RATIO, help="Tightest pipe spacing trained with (physics)"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    physics = {"pipe_speed_ratio": args.pipe_speed_ratio, "pipe_spacing_ratio": args.pipe_spacing_ratio}
+    bank = build_course_bank(args.out, args.buckets, args.courses, args.length, args.seed, args.max_steps, physics)
+    print(f"Wrote {args.out}: {bank.shape[0]} buckets x {bank.shape[1]} courses x {bank.shape[2]} gaps ({bank.nbytes / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,62 @@ difficulty is a float in [0.0, 1.0] that controls the gap distribution:
 Difficulty is stored in a multiprocessing.Value("f") shared between trainer
 and env.  Trainer sets it each epoch; env reads it every step and pushes it
 into the C envs so auto-resets use the current value.
+
+Alternatively pass curriculum_difficulty_array: a shared float32 array
+(multiprocessing.RawArray("f", total_envs)) with one entry per C env; this
+env maps entries [difficulty_offset, difficulty_offset + num_envs) straight
+into its C envs, which read them at every reset. No lock, no per-step
+Python read, and envs in one batch can run at different difficulties.
+
+Either way an episode keeps the difficulty it started with: a new value
+applies from each env's next episode, so every logged episode and episode
+record has been played at exactly the difficulty it reports.
+
+engine="batch" steps the same envs with the structure-of-arrays engine in
+flappy_batch.h (identical trajectories, faster for large num_envs; no render).
+engine="numpy" runs the batch engine's game in NumPy (numpy_engine.py): no
+C build needed, same trajectories up to float tolerance (see parity.py).
+
+episode_buffer_size > 0 makes the C envs append every finished episode to a
+NumPy ring buffer (EPISODE_DTYPE); step() then returns no info and callers
+read lossless per-episode stats with drain_episodes(). shared_episodes (one
+pair from scheduler.shared_episode_buffers) puts that ring in shared memory
+instead, for a reader in another process (the trainer; see scheduler.py);
+step() keeps returning logs then.
+
+set_courses() attaches pre-generated pipe courses (make_courses) and
+reset_envs(..., course_ids) makes selected envs play them, so different
+policies can be compared on exactly the same gaps (struct engine only).
+
+course_bank (a .npy path from course_bank.py, or the loaded array) makes
+every reset pick a pre-sampled course for the env's difficulty instead of
+sampling gaps; the file is memory-mapped read-only and shared by workers.
+Courses shorter than an episode can consume (course_length for max_steps and
+physics) are rejected.
+
+gap_table (an .npz path from gap_table.save_gap_table, or the dict from
+build_gap_table) replaces the built-in gap sampler with O(1) alias-method
+draws from per-difficulty-bucket tables.
+
+physics overrides the game constants of flappy.h (PHYSICS_KEYS): each value
+is a number for all C envs or, with engine="struct", an array with one entry
+per C env (domain randomization), so physics sweeps need no rebuild.
+
+frame_skip=k (engine="struct") repeats each action for k game frames inside
+c_step, summing rewards and stopping at the end of an episode: one policy
+step and buffer exchange per k frames. max_steps still counts frames; logs
+report agent_steps next to episode_length (frames).
+
+obs_stack=k (engine="struct", k <= MAX_OBS_STACK) makes each C env keep its
+last k observations and write them stacked, oldest first: observations are
+OBS_DIM * k wide, enough for a feedforward policy to see velocity and trend.
+
+restart_prob=p (engine="struct") turns on death-state restarts: each C env
+keeps the state restart_lag agent steps before each of its recent deaths,
+and an auto-reset restores one of them with probability p instead of
+starting fresh, so training sees more of the situations that kill the bird.
+Restarted episodes are left out of the logs (restarted = 1 in episode
+records); explicit reset()/reset_envs() always start fresh.
 """
 
 import gymnasium
@@ -17,8 +73,16 @@ import numpy as np
 import pufferlib
 
 from . import binding
+from .course_bank import check_course_length, load_course_bank
+from .flappy import EPISODE_DTYPE, read_episodes
+from .gap_table import GAP_TABLE_KEYS, load_gap_table
+from .numpy_engine import FlappyNumpy
+from .scheduler import episode_views
 
 OBS_DIM = 5
+MAX_OBS_STACK = 8  # flappy.h
+# Physics kwargs of the C envs; defaults are the #defines in flappy.h
+PHYSICS_KEYS = ("gravity", "flap_velocity", "pipe_speed_ratio", "pipe_spacing_ratio", "gap_height_ratio", "bird_radius_ratio")
 
 
 WARMUP_FRAC = 0.10  # hold difficulty at 0.0 for the first 10 % of training
@@ -52,22 +116,112 @@ class FlappyCurriculum(pufferlib.PufferEnv):
         buf=None,
         seed=0,
         curriculum_difficulty_value=None,
+        curriculum_difficulty_array=None,
+        difficulty_offset=0,
+        num_threads=1,
+        engine="struct",
+        episode_buffer_size=0,
+        course_bank=None,
+        gap_table=None,
+        physics=None,
+        frame_skip=1,
+        obs_stack=1,
+        restart_prob=0.0,
+        restart_lag=30,
+        shared_episodes=None,
     ):
         self.single_observation_space = gymnasium.spaces.Box(
-            low=-1.0, high=1.0, shape=(OBS_DIM,), dtype=np.float32
+            low=-1.0, high=1.0, shape=(OBS_DIM * obs_stack,), dtype=np.float32
         )
         self.single_action_space = gymnasium.spaces.Discrete(2)
         self.render_mode = render_mode
         self.num_agents = num_envs
         self.log_interval = log_interval
         self.difficulty_value = curriculum_difficulty_value
-        if binding is None:
+        self.difficulty_array = None
+        if curriculum_difficulty_array is not None:
+            shared = np.frombuffer(curriculum_difficulty_array, dtype=np.float32)
+            self.difficulty_array = shared[difficulty_offset : difficulty_offset + num_envs]
+            if len(self.difficulty_array) != num_envs:
+                raise ValueError(
+                    f"curriculum_difficulty_array has no entries {difficulty_offset}..{difficulty_offset + num_envs - 1}"
+                )
+        if engine not in ("struct", "batch", "numpy"):
+            raise ValueError(f"engine must be 'struct', 'batch' or 'numpy', got {engine!r}")
+        if binding is None and engine != "numpy":
             raise ImportError(
                 "Flappy v3 C extension not loaded. Build it from the variations/flappyv3 directory: "
-                "cd variations/flappyv3 && make"
+                "cd variations/flappyv3 && make (or use engine='numpy')"
             )
+        if engine != "struct" and num_threads != 1:
+            raise ValueError("num_threads is only supported by engine='struct'")
+        if engine != "struct" and frame_skip != 1:
+            raise ValueError("frame_skip is only supported by engine='struct'")
+        if engine != "struct" and obs_stack != 1:
+            raise ValueError("obs_stack is only supported by engine='struct'")
+        if engine != "struct" and restart_prob:
+            raise ValueError("restart_prob is only supported by engine='struct'")
+        if not 0.0 <= restart_prob <= 1.0:
+            raise ValueError(f"restart_prob must be in [0, 1], got {restart_prob}")
+        if not 1 <= obs_stack <= MAX_OBS_STACK:
+            raise ValueError(f"obs_stack must be in [1, {MAX_OBS_STACK}], got {obs_stack}")
+        if frame_skip < 1:
+            raise ValueError(f"frame_skip must be >= 1, got {frame_skip}")
+        if engine != "struct" and render_mode is not None:
+            raise ValueError("render is only supported by engine='struct'")
+        self.engine = engine
+        if engine == "batch":
+            self._init, self._reset, self._step = binding.batch_init, binding.batch_reset, binding.batch_step
+            self._log, self._close = binding.batch_log, binding.batch_close
+            self._reset_envs = binding.batch_reset_envs
+            self._get_state, self._set_state = binding.batch_get_state, binding.batch_set_state
+        elif engine == "numpy":
+            # Unbound methods: the FlappyNumpy object is the handle
+            self._init, self._reset, self._step = FlappyNumpy, FlappyNumpy.reset, FlappyNumpy.step
+            self._log, self._close = FlappyNumpy.log, FlappyNumpy.close
+            self._reset_envs = FlappyNumpy.reset_envs
+            self._get_state = self._set_state = None
+        else:
+            self._init, self._reset, self._step = binding.vec_init, binding.vec_reset, binding.vec_step
+            self._log, self._close = binding.vec_log, binding.vec_close
+            self._reset_envs = binding.vec_reset_envs
+            self._get_state, self._set_state = binding.vec_get_state, binding.vec_set_state
         super().__init__(buf)
-        self.c_envs = binding.vec_init(
+        c_kwargs = {"num_threads": num_threads} if engine == "struct" else {}
+        if self.difficulty_array is not None:
+            c_kwargs["difficulty"] = self.difficulty_array
+        self.course_bank = load_course_bank(course_bank) if isinstance(course_bank, str) else course_bank
+        self._max_steps, self._physics = max_steps, physics
+        if self.course_bank is not None:
+            check_course_length(self.course_bank.shape[2], max_steps, physics)
+            c_kwargs["course_bank"] = self.course_bank  # the C envs point into this array
+        self.gap_table = load_gap_table(gap_table) if isinstance(gap_table, str) else gap_table
+        if self.gap_table is not None:
+            c_kwargs.update({f"gap_{key}": self.gap_table[key] for key in GAP_TABLE_KEYS})
+        for key, value in (physics or {}).items():
+            if key not in PHYSICS_KEYS:
+                raise ValueError(f"unknown physics key {key!r}; expected one of {PHYSICS_KEYS}")
+            if np.ndim(value) == 0:
+                c_kwargs[key] = float(value)
+                continue
+            if engine != "struct":
+                raise ValueError("per-env physics arrays are only supported by engine='struct'")
+            value = np.ascontiguousarray(value, dtype=np.float32)
+            if value.shape != (num_envs,):
+                raise ValueError(f"physics {key!r} array must have shape ({num_envs},), got {value.shape}")
+            c_kwargs[key] = value
+        self.episodes = None
+        if episode_buffer_size > 0:
+            self.episodes = np.zeros(episode_buffer_size, dtype=EPISODE_DTYPE)
+            self.episode_count = np.zeros(2, dtype=np.int64)  # records written, slots reserved
+            self._episode_tail = 0
+            self.episodes_dropped = 0
+            c_kwargs.update(episodes=self.episodes, episode_count=self.episode_count)
+        elif shared_episodes is not None:
+            self._shared_episodes = episode_views(shared_episodes)  # the C envs write into these
+            c_kwargs.update(episodes=self._shared_episodes[0], episode_count=self._shared_episodes[1])
+        self.courses = None
+        self.c_envs = self._init(
             self.observations,
             self.actions,
             self.rewards,
@@ -78,26 +232,102 @@ class FlappyCurriculum(pufferlib.PufferEnv):
             width=width,
             height=height,
             max_steps=max_steps,
+            frame_skip=int(frame_skip),
+            obs_stack=int(obs_stack),
+            restart_prob=float(restart_prob),
+            restart_lag=int(restart_lag),
+            **c_kwargs,
         )
         self._tick = 0
 
     def reset(self, seed=None):
         if seed is None:
             seed = int(np.random.default_rng().integers(0, 2**31))
-        difficulty = float(self.difficulty_value.value) if self.difficulty_value is not None else 0.0
-        binding.vec_reset(self.c_envs, seed, difficulty)
+        self._reset(self.c_envs, seed, self._difficulty())
         self._tick = 0
         return self.observations, []
 
+    def reset_envs(self, env_ids, seeds, course_ids=None):
+        """Reseed and reset only env_ids (seeds[k] for env_ids[k]); others keep running.
+
+        A C env given seed s starts the same episode as reset(seed=s) on a
+        single-env FlappyCurriculum. Observations of the reset envs are
+        overwritten in place. With course_ids, env env_ids[k] plays row
+        course_ids[k] of set_courses() for this episode (-1 = sample gaps).
+        """
+        if course_ids is not None:
+            if self.courses is None:
+                raise ValueError("reset_envs(course_ids=...) requires set_courses() first")
+            binding.vec_queue_courses(self.c_envs, env_ids, course_ids)
+        self._reset_envs(self.c_envs, env_ids, seeds, self._difficulty())
+
+    def set_courses(self, courses):
+        """Attach a (num_courses, course_len) array of gap centers, or None to detach.
+
+        Episodes started with reset_envs(..., course_ids) spawn their gaps
+        from these rows in order instead of the env RNG; once a row runs out
+        the RNG takes over.
+        """
+        if self.engine != "struct":
+            raise ValueError("courses are only supported by engine='struct'")
+        if courses is not None:
+            courses = np.ascontiguousarray(courses, dtype=np.float32)
+            if courses.ndim == 2:
+                check_course_length(courses.shape[1], self._max_steps, self._physics)
+        binding.vec_set_courses(self.c_envs, courses)
+        self.courses = courses  # the C envs point into this array
+
+    def get_state(self, env_ids=None):
+        """Snapshot env_ids (default: all) as a (len(env_ids), state_size) uint8 array.
+
+        A row holds everything the env's future depends on besides its
+        configuration: bird, pipes, score, RNG, current course position and
+        observation history. set_state() of a row into any env with the same
+        configuration (either C engine) continues exactly where it left off.
+        """
+        if self._get_state is None:
+            raise ValueError("state snapshots are only supported by the C engines")
+        return self._get_state(self.c_envs, self._env_ids(env_ids))
+
+    def set_state(self, states, env_ids=None):
+        """Restore rows of get_state() into env_ids (default: all) and rewrite their observations.
+
+        Rows can go to other envs than they came from, e.g. one state
+        copied into many envs to branch rollouts from it.
+        """
+        if self._set_state is None:
+            raise ValueError("state snapshots are only supported by the C engines")
+        self._set_state(self.c_envs, self._env_ids(env_ids), states)
+
+    def simulate(self, states, actions, env_ids=None):
+        """K-step lookahead: play actions[n] (shape (N, K)) from states[n] without touching the envs.
+
+        Row n runs on a private copy of env env_ids[n] (default: all envs, so
+        N = num_envs), which lends its configuration only. Returns
+        (returns, ends, obs): summed reward per row, the step its episode
+        ended on (-1 = survived all K steps) and its last observation, at
+        the end of the episode when it ended. Episodes do not auto-reset,
+        log or write the episode buffer.
+        """
+        if self.engine != "struct":
+            raise ValueError("simulate is only supported by engine='struct' (states load into either engine)")
+        return binding.vec_simulate(self.c_envs, self._env_ids(env_ids), states, actions)
+
+    def _env_ids(self, env_ids):
+        return np.arange(self.num_agents, dtype=np.int32) if env_ids is None else env_ids
+
     def step(self, actions):
         self._tick += 1
         self.actions[:] = actions
-        # Push current difficulty into C envs so auto-resets use it
-        difficulty = float(self.difficulty_value.value) if self.difficulty_value is not None else 0.0
-        binding.vec_step(self.c_envs, difficulty)
+        if self.difficulty_array is not None:
+            # C envs read their own entries of the shared array
+            self._step(self.c_envs)
+        else:
+            # Push current difficulty into C envs so auto-resets use it
+            self._step(self.c_envs, self._difficulty())
         info = []
-        if self._tick % self.log_interval == 0:
-            log = binding.vec_log(self.c_envs)
+        if self.episodes is None and self._tick % self.log_interval == 0:
+            log = self._log(self.c_envs)
             if log:
                 info.append(log)
         return (
@@ -108,11 +338,28 @@ class FlappyCurriculum(pufferlib.PufferEnv):
             info,
         )
 
+    def _difficulty(self):
+        # Ignored by the C envs when curriculum_difficulty_array is mapped
+        return float(self.difficulty_value.value) if self.difficulty_value is not None else 0.0
+
+    def drain_episodes(self):
+        """Episodes finished since the last call (EPISODE_DTYPE array).
+
+        Records overwritten before being drained are added to episodes_dropped.
+        """
+        if self.episodes is None:
+            raise ValueError("drain_episodes requires episode_buffer_size > 0")
+        records, self._episode_tail, dropped = read_episodes(
+            self.episodes, self.episode_count, self._episode_tail
+        )
+        self.episodes_dropped += dropped
+        return records
+
     def render(self):
         binding.vec_render(self.c_envs, 0)
 
     def close(self):
-        binding.vec_close(self.c_envs)
+        self._close(self.c_envs)
 
 
 def curriculum_env_creator(**kwargs):
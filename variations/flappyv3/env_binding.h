@@ -142,9 +142,7 @@ static PyObject* env_init(PyObject* self, PyObject* args, PyObject* kwargs) {
         return NULL;
     }
     int seed = PyLong_AsLong(seed_arg);
- 
-    // Assumes each process has the same number of environments
-    srand(seed);
+    c_seed(env, (uint32_t)seed);
 
     // If kwargs is NULL, create a new dictionary
     if (kwargs == NULL) {
@@ -196,6 +194,12 @@ static PyObject* env_reset(PyObject* self, PyObject* args) {
             return NULL;
         }
     }
+    PyObject* seed_arg = PyTuple_GetItem(args, 1);
+    if (!PyObject_TypeCheck(seed_arg, &PyLong_Type)) {
+        PyErr_SetString(PyExc_TypeError, "seed must be an integer");
+        return NULL;
+    }
+    c_seed(env, (uint32_t)PyLong_AsLong(seed_arg));
     c_reset(env, difficulty);
     Py_RETURN_NONE;
 }
@@ -274,6 +278,7 @@ static PyObject* env_put(PyObject* self, PyObject* args, PyObject* kwargs) {
 typedef struct {
     Env** envs;
     int num_envs;
+    int num_threads;  // > 1: vec_step runs OpenMP chunks with the GIL released
 } VecEnv;
 
 static VecEnv* unpack_vecenv(PyObject* args) {
@@ -325,6 +330,26 @@ static PyObject* vec_init(PyObject* self, PyObject* args, PyObject* kwargs) {
         return NULL;
     }
 
+    vec->num_threads = 1;
+    PyObject* threads_arg = kwargs ? PyDict_GetItemString(kwargs, "num_threads") : NULL;
+    if (threads_arg != NULL && threads_arg != Py_None) {
+        if (!PyLong_Check(threads_arg)) {
+            PyErr_SetString(PyExc_TypeError, "num_threads must be an integer");
+            return NULL;
+        }
+        vec->num_threads = (int)PyLong_AsLong(threads_arg);
+        if (vec->num_threads <= 0) {
+            PyErr_SetString(PyExc_ValueError, "num_threads must be greater than 0");
+            return NULL;
+        }
+#ifndef _OPENMP
+        if (vec->num_threads > 1) {
+            PyErr_SetString(PyExc_ValueError, "num_threads > 1 requires building the binding with OpenMP (make OPENMP=1)");
+            return NULL;
+        }
+#endif
+    }
+
     PyObject* seed_obj = PyTuple_GetItem(args, 6);
     if (!PyObject_TypeCheck(seed_obj, &PyLong_Type)) {
         PyErr_SetString(PyExc_TypeError, "seed must be an integer");
@@ -434,7 +459,7 @@ static PyObject* vec_init(PyObject* self, PyObject* args, PyObject* kwargs) {
 
         // Assumes each process has the same number of environments
         int env_seed = i + seed*vec->num_envs;
-        srand(env_seed);
+        c_seed(env, (uint32_t)env_seed);
  
         // Add the seed to kwargs for this environment
         PyObject* py_seed = PyLong_FromLong(env_seed);
@@ -446,6 +471,16 @@ static PyObject* vec_init(PyObject* self, PyObject* args, PyObject* kwargs) {
         }
         Py_DECREF(py_seed);
 
+        // And the env's index within this vec env
+        PyObject* py_env_id = PyLong_FromLong(i);
+        if (PyDict_SetItemString(kwargs, "env_id", py_env_id) < 0) {
+            PyErr_SetString(PyExc_RuntimeError, "Failed to set env_id in kwargs");
+            Py_DECREF(py_env_id);
+            Py_DECREF(kwargs);
+            return NULL;
+        }
+        Py_DECREF(py_env_id);
+
         PyObject* empty_args = PyTuple_New(0);
         my_init(env, empty_args, kwargs);
         if (PyErr_Occurred()) {
@@ -522,7 +557,7 @@ static PyObject* vec_reset(PyObject* self, PyObject* args) {
     }
 
     for (int i = 0; i < vec->num_envs; i++) {
-        srand(i + seed*vec->num_envs);
+        c_seed(vec->envs[i], (uint32_t)(i + seed*vec->num_envs));
         c_reset(vec->envs[i], difficulty);
     }
     Py_RETURN_NONE;
@@ -541,7 +576,8 @@ static PyObject* vec_step(PyObject* self, PyObject* arg) {
     }
 
     /* If a difficulty argument is provided, push it into every sub-env
-       so that auto-resets inside c_step use the up-to-date difficulty. */
+       so that auto-resets inside c_step start the next episode with the
+       up-to-date difficulty (running episodes keep theirs). */
     if (num_args == 2) {
         PyObject* diff_arg = PyTuple_GetItem(arg, 1);
         float difficulty;
@@ -554,8 +590,25 @@ static PyObject* vec_step(PyObject* self, PyObject* arg) {
             return NULL;
         }
         for (int i = 0; i < vec->num_envs; i++) {
-            vec->envs[i]->curriculum_difficulty = difficulty;
+            vec->envs[i]->next_difficulty = difficulty;
+        }
+    }
+
+    // Threaded mode: every env owns its RNG and log, so contiguous chunks
+    // can be stepped in parallel without the GIL. Joins before returning.
+    if (vec->num_threads > 1) {
+        Env** envs = vec->envs;
+        int num_envs = vec->num_envs;
+        Py_BEGIN_ALLOW_THREADS
+#ifdef _OPENMP
+        int num_threads = vec->num_threads;
+        #pragma omp parallel for schedule(static) num_threads(num_threads)
+#endif
+        for (int i = 0; i < num_envs; i++) {
+            c_step(envs[i]);
         }
+        Py_END_ALLOW_THREADS
+        Py_RETURN_NONE;
     }
 
     for (int i = 0; i < vec->num_envs; i++) {
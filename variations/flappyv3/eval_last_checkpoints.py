@@ -7,21 +7,53 @@ Examples (from repo root):
   uv run python -m variations.flappyv3.eval_last_checkpoints
   uv run python -m variations.flappyv3.eval_last_checkpoints --run-id 177087020156 --last 5 --episodes 50
   uv run python -m variations.flappyv3.eval_last_checkpoints --difficulty 1.0
+  uv run python -m variations.flappyv3.eval_last_checkpoints --last 20 --jobs 8
+
+--jobs N spreads (checkpoint, episode shard) tasks over N worker processes,
+each with its own pre-built env and policy. Episode ep is always seeded with
+seed + ep, so merged results are identical to the serial (--jobs 1) run.
+
+Per-episode results are cached in experiments/eval_cache.sqlite (keyed by
+checkpoint content, difficulty, engine, evaluate.DYNAMICS_VERSION and seed;
+see flappy_rl.eval_cache), so only
+episodes not evaluated before are played. --no-cache disables it.
+
+--early-stop ranks by sequential testing instead of a fixed budget: all
+candidates play rounds of --round-episodes shared seeds, and a checkpoint is
+dropped once the upper confidence bound of its mean pipes falls below the
+best lower bound. The Bonferroni correction splits 1 - --confidence over
+candidates and rounds, so the whole run holds at --confidence, and interval
+widths use a standard deviation of at least MIN_STD pipes, so a candidate
+that happened to score the same on every seed is not dropped on a
+zero-width interval. Rounds stop when one candidate is left or --episodes
+is reached.
+
+--paired plays every checkpoint on the same pre-generated pipe course per
+episode (variations.flappyv3.make_courses from the episode seeds) and reports
+each checkpoint's paired difference in pipes against the best one, with its
+confidence interval next to the unpaired one. Course difficulty is shared by
+both sides of a pair and cancels out of the difference, so rankings need far
+fewer episodes. With --early-stop, elimination uses the paired difference
+against the current leader. Courses are sampled exactly as a seeded env
+would, so paired results equal (and share cache entries with) seeded ones.
 """
 
 import argparse
 import glob
-import multiprocessing
+import math
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from statistics import NormalDist
 
 import numpy as np
-import pufferlib.pytorch
-import pufferlib.vector
 import torch
 
-from variations.flappyv3 import curriculum_env_creator
-from variations.flappyv3.train import make_flappyv3_lstm_policy
+from flappy_rl.eval_cache import EvalCache, merge, missing_seeds
+from variations.flappyv3 import make_courses
+from variations.flappyv3.evaluate import CACHE_PATH, VARIANT, cache_config, checkpoint_policy, load_policy, make_eval_env, run_episodes
+from variations.flappyv3.train import make_flappyv3_policy
 
 EXPERIMENTS_DIR = os.path.join(os.path.dirname(__file__), "experiments")
 
@@ -40,46 +72,14 @@ def checkpoint_step(path: str) -> int:
     return int(m.group(1)) if m else -1
 
 
-def run_episode(vecenv, policy, device, seed: int):
-    obs, _ = vecenv.reset(seed=seed)
-    h = getattr(policy, "hidden_size", 128)
-    state = {
-        "lstm_h": torch.zeros(vecenv.num_agents, h, device=device),
-        "lstm_c": torch.zeros(vecenv.num_agents, h, device=device),
-    }
-    steps = 0
-    pipes_passed = 0
-    with torch.no_grad():
-        while True:
-            ob = torch.as_tensor(obs).to(device)
-            logits, _ = policy.forward_eval(ob, state)
-            action = logits.argmax(dim=-1).cpu().numpy().reshape(vecenv.action_space.shape)
-            obs, rewards, terms, truncs, _ = vecenv.step(action)
-            if float(rewards.flat[0]) >= 1.0:
-                pipes_passed += 1
-            steps += 1
-            if terms.any() or truncs.any():
-                break
-    return pipes_passed, steps
-
-
-def eval_checkpoint(vecenv, policy, model_path: str, episodes: int, seed: int, device: str):
-    state_dict = torch.load(model_path, map_location=device)
-    state_dict = {k.replace("module.", ""): v for k, v in state_dict.items()}
-    policy.load_state_dict(state_dict, strict=True)
-    policy.eval()
-
-    pipes = []
-    lengths = []
-    for ep in range(episodes):
-        p, l = run_episode(vecenv, policy, device, seed + ep)
-        pipes.append(p)
-        lengths.append(l)
-
-    pipes_np = np.array(pipes)
-    lengths_np = np.array(lengths)
+def summarize(model_path: str, pipes, lengths, computed: int):
+    pipes_np = np.asarray(pipes)
+    lengths_np = np.asarray(lengths)
     return {
         "model_path": model_path,
+        "pipes": pipes_np,
+        "episodes": int(len(pipes_np)),
+        "computed": computed,
         "mean_pipes": float(pipes_np.mean()),
         "std_pipes": float(pipes_np.std()),
         "min_pipes": int(pipes_np.min()),
@@ -88,14 +88,164 @@ def eval_checkpoint(vecenv, policy, model_path: str, episodes: int, seed: int, d
     }
 
 
+# Per-process env + policy for --jobs, built once by the pool initializer
+_worker = {}
+
+
+def _init_worker(num_envs: int, difficulty: float, device: str, paired: bool = False, spec=("lstm", 1)):
+    torch.set_num_threads(1)
+    policy_type, obs_stack = spec
+    env = make_eval_env(num_envs, difficulty, obs_stack=obs_stack)
+    courses = partial(make_courses, difficulty=difficulty) if paired else None
+    _worker.update(env=env, policy=make_flappyv3_policy(env, policy_type).to(device), device=device, courses=courses)
+
+
+def _eval_shard(model_path: str, seeds):
+    policy = load_policy(_worker["policy"], model_path, _worker["device"])
+    courses = _worker["courses"](seeds) if _worker["courses"] else None
+    return run_episodes(_worker["env"], policy, _worker["device"], seeds, courses)
+
+
+def serial_runner(env, policy, device: str, courses=None):
+    """runner(work) for this process: work maps checkpoint -> seeds, returns checkpoint -> (pipes, lengths).
+
+    courses(seeds), if given, builds the pipe courses the episodes play.
+    """
+
+    def run(work):
+        out = {}
+        for ckpt, seeds in work.items():
+            load_policy(policy, ckpt, device)
+            out[ckpt] = run_episodes(env, policy, device, seeds, courses(seeds) if courses else None)
+        return out
+
+    return run
+
+
+def pool_runner(pool, shards: int):
+    """runner(work) on a --jobs pool; each checkpoint's seeds are split into shards tasks."""
+
+    def run(work):
+        futures = {
+            ckpt: [pool.submit(_eval_shard, ckpt, part) for part in np.array_split(seeds, shards) if len(part)]
+            for ckpt, seeds in work.items()
+        }
+        out = {}
+        for ckpt, parts in futures.items():
+            parts = [f.result() for f in parts]
+            out[ckpt] = (np.concatenate([p for p, _ in parts]), np.concatenate([l for _, l in parts]))
+        return out
+
+    return run
+
+
+def eval_episodes(run, checkpoints, seeds, cache=None, config=None):
+    """checkpoint -> (pipes, lengths, computed) for seeds; only uncached episodes go to run()."""
+    todo = {ckpt: missing_seeds(cache, ckpt, VARIANT, config, seeds) for ckpt in checkpoints}
+    new = run({ckpt: missing for ckpt, (_, missing) in todo.items() if len(missing)})
+    out = {}
+    for ckpt, (found, missing) in todo.items():
+        new_pipes, new_lengths = new.get(ckpt, ([], []))
+        pipes, lengths = merge(cache, ckpt, VARIANT, config, seeds, found, missing, new_pipes, new_lengths)
+        out[ckpt] = (pipes, lengths, len(missing))
+    return out
+
+
+MIN_STD = 0.5  # pipes; floor on the std behind --early-stop intervals
+
+
+def mean_interval(pipes, z: float, min_std: float = 0.0):
+    """(lower, upper) normal-approximation bound on mean pipes, std at least min_std."""
+    pipes = np.asarray(pipes, dtype=np.float64)
+    half = z * max(pipes.std(ddof=1), min_std) / np.sqrt(len(pipes)) if len(pipes) > 1 else np.inf
+    return pipes.mean() - half, pipes.mean() + half
+
+
+def paired_interval(pipes, reference, z: float, min_std: float = 0.0):
+    """(lower, upper) normal-approximation bound on mean(pipes - reference) over the shared episodes."""
+    n = min(len(pipes), len(reference))
+    diff = np.asarray(pipes[:n], dtype=np.float64) - np.asarray(reference[:n], dtype=np.float64)
+    half = z * max(diff.std(ddof=1), min_std) / np.sqrt(n) if n > 1 else np.inf
+    return diff.mean() - half, diff.mean() + half
+
+
+def unpaired_half_width(pipes, reference, z: float):
+    """Half-width of the same interval if the two samples were independent."""
+    n = min(len(pipes), len(reference))
+    a = np.asarray(pipes[:n], dtype=np.float64)
+    b = np.asarray(reference[:n], dtype=np.float64)
+    return z * np.sqrt((a.var(ddof=1) + b.var(ddof=1)) / n) if n > 1 else np.inf
+
+
+def sequential_eval(
+    run, checkpoints, seed: int, max_episodes: int, round_episodes: int, confidence: float, cache=None, config=None, paired=False
+):
+    """Rounds of shared seeds; drop checkpoints that can no longer be best.
+
+    Returns (checkpoint -> summary, surviving checkpoints). Every checkpoint
+    alive in a round plays the same seeds, so comparisons stay paired by course.
+    paired=True drops a checkpoint once its paired difference to the current
+    leader is confidently negative instead of comparing separate intervals.
+    Every round re-tests every interval, so alpha is split over candidates
+    and rounds, and stds are floored at MIN_STD.
+    """
+    rounds = math.ceil(max_episodes / round_episodes)
+    alpha = (1.0 - confidence) / (max(1, len(checkpoints)) * max(1, rounds))
+    z = NormalDist().inv_cdf(1.0 - alpha / 2)
+    pipes = {c: np.zeros(0, dtype=np.int64) for c in checkpoints}
+    lengths = {c: np.zeros(0, dtype=np.int64) for c in checkpoints}
+    computed = {c: 0 for c in checkpoints}
+    alive = list(checkpoints)
+    start = 0
+    while start < max_episodes and len(alive) > 1:
+        seeds = seed + np.arange(start, min(start + round_episodes, max_episodes))
+        for ckpt, (p, l, n) in eval_episodes(run, alive, seeds, cache, config).items():
+            pipes[ckpt] = np.concatenate([pipes[ckpt], p])
+            lengths[ckpt] = np.concatenate([lengths[ckpt], l])
+            computed[ckpt] += n
+        start += len(seeds)
+        if paired:
+            leader = max(alive, key=lambda c: pipes[c].mean())
+            dropped = [c for c in alive if c != leader and paired_interval(pipes[c], pipes[leader], z, MIN_STD)[1] < 0]
+        else:
+            bounds = {c: mean_interval(pipes[c], z, MIN_STD) for c in alive}
+            best_lower = max(lo for lo, _ in bounds.values())
+            dropped = [c for c in alive if bounds[c][1] < best_lower]
+        alive = [c for c in alive if c not in dropped]
+        print(
+            f"  round {start // round_episodes}: {start} episodes, dropped {len(dropped)}, "
+            f"{len(alive)} left: {', '.join(os.path.basename(c) for c in alive)}"
+        )
+    if start == 0:  # a single candidate still gets one round
+        seeds = seed + np.arange(min(round_episodes, max_episodes))
+        for ckpt, (p, l, n) in eval_episodes(run, alive, seeds, cache, config).items():
+            pipes[ckpt], lengths[ckpt], computed[ckpt] = p, l, n
+    summaries = {c: summarize(c, pipes[c], lengths[c], computed[c]) for c in checkpoints}
+    return summaries, alive
+
+
 def main():
     parser = argparse.ArgumentParser(description="Evaluate last N checkpoints and pick best")
     parser.add_argument("--run-id", type=str, default=None, help="Experiment run id under variations/flappyv3/experiments/")
     parser.add_argument("--last", type=int, default=5, help="How many latest checkpoints to evaluate")
-    parser.add_argument("--episodes", type=int, default=50, help="Episodes per checkpoint")
+    parser.add_argument("--episodes", type=int, default=50, help="Episodes per checkpoint (max per checkpoint with --early-stop)")
     parser.add_argument("--difficulty", type=float, default=1.0, help="Eval difficulty in [0,1]")
     parser.add_argument("--seed", type=int, default=42, help="Base RNG seed")
     parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--num-envs", type=int, default=256, help="Envs stepped in lockstep per process")
+    parser.add_argument("--jobs", type=int, default=1, help="Worker processes (1 = evaluate in this process)")
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=0,
+        help="Episode shards per checkpoint with --jobs (0 = auto: enough to keep all jobs busy)",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Ignore and do not update the eval cache")
+    parser.add_argument("--cache", type=str, default=CACHE_PATH, help="Eval cache file (SQLite)")
+    parser.add_argument("--early-stop", action="store_true", help="Sequential rounds; drop checkpoints that cannot be best")
+    parser.add_argument("--round-episodes", type=int, default=10, help="Episodes per checkpoint per --early-stop round")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level for --early-stop and --paired intervals")
+    parser.add_argument("--paired", action="store_true", help="Same pre-generated pipe courses for every checkpoint; report paired differences")
     args = parser.parse_args()
 
     experiments_root = EXPERIMENTS_DIR
@@ -112,49 +262,63 @@ def main():
 
     selected = checkpoints[-max(1, args.last):]
 
-    difficulty_value = multiprocessing.Value("f", float(args.difficulty))
-    vecenv = pufferlib.vector.make(
-        curriculum_env_creator,
-        env_kwargs={
-            "num_envs": 1,
-            "width": 400,
-            "height": 600,
-            "curriculum_difficulty_value": difficulty_value,
-        },
-        backend=pufferlib.vector.Serial,
-        num_envs=1,
-        seed=args.seed,
-    )
-    policy = make_flappyv3_lstm_policy(vecenv.driver_env).to(args.device)
-
     print(f"Run: {run_id}")
     print(f"Eval difficulty: {args.difficulty:.2f}")
-    print(f"Episodes/checkpoint: {args.episodes}")
+    print(f"Episodes/checkpoint: {args.episodes}" + (" (max, --early-stop)" if args.early_stop else ""))
     print(f"Evaluating {len(selected)} checkpoints:")
     for p in selected:
         print(f"  - {p}")
     print("")
 
-    results = []
-    for ckpt in selected:
-        res = eval_checkpoint(
-            vecenv=vecenv,
-            policy=policy,
-            model_path=ckpt,
-            episodes=args.episodes,
-            seed=args.seed,
-            device=args.device,
+    cache = None if args.no_cache else EvalCache(args.cache)
+    config = cache_config(args.difficulty)
+    batch = min(args.episodes, args.round_episodes) if args.early_stop else args.episodes
+    # Checkpoints of one run share the policy type and observation stacking
+    spec = checkpoint_policy(selected[-1])
+    pool = None
+    if args.jobs > 1:
+        shards = args.shards or max(1, math.ceil(args.jobs / len(selected)))
+        shards = min(shards, batch)
+        pool = ProcessPoolExecutor(
+            max_workers=args.jobs,
+            initializer=_init_worker,
+            initargs=(min(args.num_envs, math.ceil(batch / shards)), args.difficulty, args.device, args.paired, spec),
         )
-        results.append(res)
+        run = pool_runner(pool, shards)
+    else:
+        env = make_eval_env(min(args.num_envs, batch), args.difficulty, obs_stack=spec[1])
+        courses = partial(make_courses, difficulty=args.difficulty) if args.paired else None
+        run = serial_runner(env, make_flappyv3_policy(env, spec[0]).to(args.device), args.device, courses)
+
+    if args.early_stop:
+        summaries, alive = sequential_eval(
+            run, selected, args.seed, args.episodes, args.round_episodes, args.confidence,
+            cache=cache, config=config, paired=args.paired,
+        )
+        results = [summaries[c] for c in selected]
+    else:
+        evaluated = eval_episodes(run, selected, args.seed + np.arange(args.episodes), cache=cache, config=config)
+        results = [summarize(c, *evaluated[c]) for c in selected]
+        alive = selected
+
+    if pool is not None:
+        pool.shutdown()
+    else:
+        env.close()
+
+    for res in results:
         print(
-            f"{os.path.basename(ckpt)} | pipes mean {res['mean_pipes']:.2f} "
+            f"{os.path.basename(res['model_path'])} | pipes mean {res['mean_pipes']:.2f} "
             f"(std {res['std_pipes']:.2f}, min {res['min_pipes']}, max {res['max_pipes']}) "
-            f"| len mean {res['mean_length']:.1f}"
+            f"| len mean {res['mean_length']:.1f} | {res['episodes']} episodes, {res['episodes'] - res['computed']} cached"
         )
+    total = sum(r["episodes"] for r in results)
+    print(f"Episodes used: {total} of a fixed budget of {args.episodes * len(selected)}")
+    if cache is not None:
+        cache.close()
+        print(f"Played {sum(r['computed'] for r in results)} new episodes (cache: {args.cache})")
 
-    vecenv.close()
-
-    best = max(results, key=lambda r: (r["mean_pipes"], r["mean_length"]))
+    best = max((r for r in results if r["model_path"] in alive), key=lambda r: (r["mean_pipes"], r["mean_length"]))
     print("\nBest checkpoint:")
     print(f"  {best['model_path']}")
     print(
@@ -162,6 +326,19 @@ def main():
         f"min {best['min_pipes']}, max {best['max_pipes']}, mean len {best['mean_length']:.1f}"
     )
 
+    if args.paired and len(results) > 1:
+        z = NormalDist().inv_cdf(0.5 + args.confidence / 2)
+        print(f"\nPaired difference in pipes vs best ({args.confidence:.0%} CI, same courses):")
+        for res in results:
+            if res is best:
+                continue
+            lo, hi = paired_interval(res["pipes"], best["pipes"], z)
+            n = min(len(res["pipes"]), len(best["pipes"]))
+            print(
+                f"  {os.path.basename(res['model_path'])} | {(lo + hi) / 2:+.2f} [{lo:+.2f}, {hi:+.2f}] "
+                f"| unpaired ±{unpaired_half_width(res['pipes'], best['pipes'], z):.2f} | {n} episodes"
+            )
+
 
 if __name__ == "__main__":
     main()
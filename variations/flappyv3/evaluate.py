@@ -0,0 +1,146 @@
+"""
+Batched headless evaluation for Flappy v3 policies.
+
+run_episodes plays a list of episodes greedily on one FlappyCurriculum with
+many C envs stepped in lockstep: one batched LSTM forward per step, per-env
+LSTM state zeroed when an env starts a new episode, and each episode seeded
+on its own (episode k uses seeds[k]) so results match the one-env-at-a-time
+loop (vecenv.reset(seed=seed + ep)) episode for episode.
+
+Passing courses (make_courses) plays episode k on row k instead of the gaps
+drawn from the env RNG: every policy evaluated on the same courses faces
+exactly the same pipes, which is what paired comparisons rely on.
+"""
+
+import multiprocessing
+import os
+
+import numpy as np
+import torch
+
+from flappy_rl.eval_cache import eval_config
+from variations.flappyv3 import FlappyCurriculum
+from variations.flappyv3.curriculum import OBS_DIM
+
+VARIANT = "flappyv3"
+# Per-episode result cache shared by run_eval and eval_last_checkpoints (flappy_rl.eval_cache)
+CACHE_PATH = os.path.join(os.path.dirname(__file__), "experiments", "eval_cache.sqlite")
+# Part of the cache key: bump with any change to what a seeded episode plays
+# (step, RNG or gap sampling in flappy.h, flappy_batch.h or numpy_engine.py)
+# so stale rows are not reused.
+DYNAMICS_VERSION = 1
+
+
+def cache_config(difficulty, engine="struct"):
+    """Cache config of greedy make_eval_env episodes at difficulty on engine."""
+    return eval_config(difficulty=difficulty, max_steps=5000, policy="greedy", engine=engine, dynamics=DYNAMICS_VERSION)
+
+
+def make_eval_env(num_envs, difficulty, engine="struct", obs_stack=1):
+    """FlappyCurriculum with num_envs C envs at a fixed difficulty."""
+    return FlappyCurriculum(
+        num_envs=num_envs,
+        width=400,
+        height=600,
+        curriculum_difficulty_value=multiprocessing.Value("f", float(difficulty)),
+        engine=engine,
+        obs_stack=obs_stack,
+    )
+
+
+def checkpoint_policy(model_path):
+    """(policy_type, obs_stack) a checkpoint was trained with, read from its weights.
+
+    policy_type is "lstm" or "mlp" (see train.make_flappyv3_policy); obs_stack
+    follows from the encoder input width.
+    """
+    state_dict = torch.load(model_path, map_location="cpu")
+    state_dict = {k.replace("module.", ""): v for k, v in state_dict.items()}
+    policy_type = "lstm" if any(k.startswith("lstm.") for k in state_dict) else "mlp"
+    encoder = next(v for k, v in state_dict.items() if k.endswith("encoder.0.weight"))
+    return policy_type, encoder.shape[1] // OBS_DIM
+
+
+def load_policy(policy, model_path, device):
+    state_dict = torch.load(model_path, map_location=device)
+    state_dict = {k.replace("module.", ""): v for k, v in state_dict.items()}
+    policy.load_state_dict(state_dict, strict=True)
+    policy.eval()
+    return policy
+
+
+def run_episodes(env, policy, device, seeds, courses=None):
+    """Play one greedy episode per seed; return (pipes_passed, lengths) arrays in seeds order.
+
+    Envs beyond len(seeds), and envs whose episode finished after the last
+    seed was handed out, keep stepping but are ignored. courses, if given,
+    has one row per seed and episode k plays row k.
+    """
+    seeds = np.asarray(seeds, dtype=np.int64)
+    num_episodes = len(seeds)
+    num_envs = env.num_agents
+    pipes = np.zeros(num_episodes, dtype=np.int64)
+    lengths = np.zeros(num_episodes, dtype=np.int64)
+    if num_episodes == 0:
+        return pipes, lengths
+
+    h = getattr(policy, "hidden_size", 128)
+    state = {
+        "lstm_h": torch.zeros(num_envs, h, device=device),
+        "lstm_c": torch.zeros(num_envs, h, device=device),
+    }
+    obs = torch.from_numpy(env.observations)
+    if torch.device(device).type != "cpu":
+        obs_device = torch.empty(obs.shape, dtype=obs.dtype, device=device)
+    else:
+        obs_device = obs
+    actions = torch.zeros(num_envs, dtype=torch.int64, device=device)
+    actions_cpu = torch.from_numpy(env.actions)
+
+    episode = np.full(num_envs, -1, dtype=np.int64)  # episode index per env, -1 = idle
+    ep_pipes = np.zeros(num_envs, dtype=np.int64)
+    ep_steps = np.zeros(num_envs, dtype=np.int64)
+    if courses is not None:
+        env.set_courses(courses)
+    first = min(num_envs, num_episodes)
+    episode[:first] = np.arange(first)
+    env.reset_envs(np.arange(first, dtype=np.int32), seeds[:first], _course_ids(courses, 0, first))
+    next_episode = first
+    remaining = num_episodes
+
+    with torch.no_grad():
+        while remaining:
+            if obs_device is not obs:
+                obs_device.copy_(obs, non_blocking=True)
+            logits, _ = policy.forward_eval(obs_device, state)
+            torch.argmax(logits, dim=-1, out=actions)
+            actions_cpu.copy_(actions)
+            _, rewards, terms, truncs, _ = env.step(env.actions)
+            active = episode >= 0
+            ep_pipes += (rewards >= 1.0) & active
+            ep_steps += active
+            done = np.flatnonzero((terms | truncs) & active)
+            if len(done) == 0:
+                continue
+            pipes[episode[done]] = ep_pipes[done]
+            lengths[episode[done]] = ep_steps[done]
+            remaining -= len(done)
+            ep_pipes[done] = 0
+            ep_steps[done] = 0
+            done_t = torch.from_numpy(done).to(device)
+            state["lstm_h"][done_t] = 0.0
+            state["lstm_c"][done_t] = 0.0
+            restart = done[: num_episodes - next_episode]
+            episode[done] = -1
+            if len(restart):
+                new = np.arange(next_episode, next_episode + len(restart))
+                episode[restart] = new
+                env.reset_envs(restart.astype(np.int32), seeds[new], _course_ids(courses, next_episode, len(restart)))
+                next_episode += len(restart)
+    if courses is not None:
+        env.set_courses(None)
+    return pipes, lengths
+
+
+def _course_ids(courses, start, count):
+    return None if courses is None else np.arange(start, start + count, dtype=np.int32)
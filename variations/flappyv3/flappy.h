@@ -1,5 +1,8 @@
-/* Flappy: single-agent Flappy Bird-style env. C + raylib. */
+/* Flappy: single-agent Flappy Bird-style env. C + raylib.
+ * Bump DYNAMICS_VERSION in evaluate.py when a seeded episode changes
+ * (it keys the eval cache). */
 
+#include <stdint.h>
 #include <stdlib.h>
 #include <string.h>
 #include <math.h>
@@ -7,6 +10,9 @@
 
 #define MAX_PIPES 5
 #define OBS_DIM 5
+#define MAX_OBS_STACK 8  /* frames of history an env can stack into its observation */
+#define RESTART_STATES 32  /* pre-death states an env keeps for restarts */
+#define MAX_RESTART_LAG 256
 #define BIRD_X_RATIO 0.2f
 #define PIPE_WIDTH_RATIO 0.15f
 #define BIRD_RADIUS_RATIO 0.025f  /* was 0.03; smaller = more margin through gap */
@@ -21,6 +27,9 @@
 #define FLAP_VEL 0.02f   /* upward velocity per flap; lower = finer control, less overshoot */
 #define GRAVITY 0.0018f
 #define PIPE_SPACING_RATIO 0.45f
+/* Tightest pipe_spacing_ratio at which MAX_PIPES pipes still span the
+ * screen plus a pipe width; unpack_physics rejects anything tighter */
+#define MIN_PIPE_SPACING_RATIO ((1.0f + PIPE_WIDTH_RATIO) / MAX_PIPES)
 /* Sparse reward: +1 pipe pass, -1 death. No shaping. */
 
 typedef struct {
@@ -29,9 +38,47 @@ typedef struct {
     float episode_return;
     float episode_length;
     float difficulty;  /* curriculum difficulty (0.0–1.0) for dashboard */
+    float agent_steps;  /* c_step calls; episode_length / agent_steps = frame_skip */
     float n;
 } Log;
 
+/* One completed episode, appended to the optional episode ring buffer.
+ * Matches EPISODE_DTYPE in flappy.py. seed is the env's RNG state at the
+ * start of the episode (replaying it reproduces the pipe sequence). */
+typedef struct {
+    float score;
+    float episode_return;
+    float episode_length;
+    float difficulty;
+    int32_t env_id;
+    uint32_t seed;
+    int32_t restarted;  /* 1 = started from a pre-death state, not logged */
+} EpisodeRecord;
+
+/* Optional course bank: pre-sampled gap-center sequences, float32
+ * (buckets, courses, len) with bucket b holding courses sampled at
+ * difficulty b / (buckets - 1). Read-only and owned by the caller, usually
+ * a np.load(mmap_mode="r") of one .npy file so every worker process
+ * shares the same page cache. */
+typedef struct {
+    const float* gaps;  /* NULL = no bank */
+    int buckets;
+    int courses;
+    int len;
+} CourseBank;
+
+/* Optional gap-center distribution tables (gap_table.py): per difficulty
+ * bucket b = d * (buckets - 1), rounded, an alias table of size entries
+ * (values, keep probability, alias index), each (buckets, size). Replaces
+ * sample_gap_center; owned by the caller. */
+typedef struct {
+    const float* values;  /* NULL = built-in curriculum sampler */
+    const float* prob;
+    const int32_t* alias;
+    int buckets;
+    int size;
+} GapTable;
+
 typedef struct {
     float x;
     float gap_center_y;
@@ -53,38 +100,209 @@ typedef struct {
 
     int width;
     int height;
+    /* Physics: defaults from the #defines above, overridable per env
+     * (binding kwargs) before configure() derives the rest */
     float gravity;
     float flap_velocity;
-    float pipe_speed;
+    float pipe_speed_ratio;
     float pipe_spacing;
     float gap_height;
-    int max_steps;
+    float bird_radius_ratio;
+    float pipe_speed;  /* derived: width * pipe_speed_ratio */
+    int max_steps;  /* frames, not agent steps */
+    int frame_skip;  /* frames per c_step, action repeated; default 1 */
 
     float bird_y;
     float bird_vy;
-    Pipe pipes[MAX_PIPES];
+    Pipe pipes[MAX_PIPES];  /* ring buffer, strictly increasing x from head */
     int num_pipes;
+    int head;  /* slot of the leftmost pipe */
+    int next;  /* offset from head of the nearest pipe ahead of the bird; num_pipes = none */
     int score;
     int step_count;
-    float curriculum_difficulty;  /* 0.0 = fixed center, 1.0 = full uniform */
+    int agent_steps;
+    float episode_return;  /* this episode's rewards, for its record; vec_log clears the Log's copy */
+    /* Difficulty is locked for a whole episode, so each episode (and its
+     * log and record) has exactly one: new values only apply at the next
+     * reset, taken from difficulty_src if set, else next_difficulty. */
+    float curriculum_difficulty;  /* this episode's; 0.0 = fixed center, 1.0 = full uniform */
+    float* difficulty_src;  /* optional shared per-env difficulty; read at each reset */
+    float next_difficulty;  /* pushed by vec_step for the next episode */
+    uint32_t rng;  /* per-env xorshift32 state; never shared between envs */
+    GapTable gap_table;
+    uint32_t episode_seed;  /* rng at the last c_reset */
+    int env_id;
+    /* Optional episode ring buffer (shared by all envs of a vec_init):
+     * record k goes to episodes[k % episode_capacity]; episode_count[0] is
+     * the number of records written, episode_count[1] of slots reserved. */
+    EpisodeRecord* episodes;
+    int64_t* episode_count;
+    int episode_capacity;
+    /* Optional pre-generated pipe courses (paired eval), owned by the
+     * caller: row r of courses is courses_len gap centers. c_reset plays
+     * row pending_course (then clears it) instead of sampling. */
+    const float* courses;
+    int num_courses;
+    int courses_len;
+    int pending_course;  /* row for the next c_reset, -1 = none */
+    CourseBank bank;  /* otherwise c_reset draws a course from the bank */
+    /* Gaps of the current episode (NULL = sample). Past the end of the
+     * course, gaps come from rng as usual. */
+    const float* course;
+    int course_len;
+    int course_pos;
+    /* Optional observation history: with obs_stack = k > 1 the env writes
+     * its last k frames (oldest first, k * OBS_DIM floats) so a feedforward
+     * policy sees velocity and trend. Ring of frames, newest at
+     * history_head; a reset fills it with the first frame. */
+    int obs_stack;
+    int history_head;
+    int history_len;
+    float obs_history[MAX_OBS_STACK * OBS_DIM];
+    int lookahead;  /* private c_simulate copy: episode ends neither log nor reset */
+    /* Optional death-state restarts (restart_prob > 0): the states of the
+     * last restart_lag agent steps are kept in a ring (recent); at each
+     * death the oldest goes into restart_states (RESTART_STATES slots), and
+     * an auto-reset restores one of those with probability restart_prob
+     * instead of starting fresh. Restarted episodes stay out of the log. */
+    float restart_prob;
+    int restart_lag;
+    struct FlappyState* recent;  /* restart_lag + RESTART_STATES states, one allocation */
+    struct FlappyState* restart_states;
+    int recent_head;
+    int recent_len;
+    int restart_count;
+    int restarted;
     Client* client;
 } Flappy;
 
+/* Snapshot of everything an env's future depends on besides its
+ * configuration (physics, courses, tables): c_get_state / c_set_state copy
+ * it to and from one row of a flat byte buffer. Pipes keep their ring slots.
+ * The batch engine uses the same layout, so states move between engines. */
+typedef struct FlappyState {
+    int64_t course_offset;  /* floats from the start of courses / bank.gaps */
+    int32_t course_source;  /* 0 = none, 1 = courses (set_courses), 2 = bank */
+    int32_t course_len;
+    int32_t course_pos;
+    float bird_y;
+    float bird_vy;
+    float pipe_x[MAX_PIPES];
+    float pipe_gap[MAX_PIPES];
+    float pipe_gap_height[MAX_PIPES];
+    int32_t pipe_scored[MAX_PIPES];
+    int32_t num_pipes;
+    int32_t head;
+    int32_t next;
+    int32_t score;
+    int32_t step_count;
+    int32_t agent_steps;
+    float difficulty;
+    float episode_return;
+    uint32_t rng;
+    uint32_t episode_seed;
+    int32_t obs_stack;
+    int32_t history_head;
+    int32_t history_len;
+    float obs_history[MAX_OBS_STACK * OBS_DIM];
+} FlappyState;
+
+/* Episode ring buffer writers reserve slot k in count[1], fill it, then
+ * publish it by moving count[0] from k to k + 1 with a release store.
+ * Readers (read_episodes) only go up to count[0], so they never see a slot
+ * that is still being filled. Slots are published in order: a writer waits
+ * for the ones reserved before it, which threaded vec_step is filling at
+ * the same moment. */
+static int64_t reserve_episode_record(int64_t* count) {
+    return __atomic_fetch_add(&count[1], 1, __ATOMIC_RELAXED);
+}
+
+static void publish_episode_record(int64_t* count, int64_t k) {
+    while (__atomic_load_n(&count[0], __ATOMIC_ACQUIRE) != k) {
+    }
+    __atomic_store_n(&count[0], k + 1, __ATOMIC_RELEASE);
+}
+
 static void add_log(Flappy* env) {
-    env->log.perf = env->score > 0 ? 1.0f : 0.0f;
-    env->log.score = (float)env->score;
-    env->log.episode_length = (float)env->step_count;
-    env->log.difficulty = env->curriculum_difficulty;
-    env->log.n += 1.0f;
+    if (!env->restarted) {
+        env->log.perf = env->score > 0 ? 1.0f : 0.0f;
+        env->log.score = (float)env->score;
+        env->log.episode_length = (float)env->step_count;
+        env->log.difficulty = env->curriculum_difficulty;
+        env->log.agent_steps = (float)env->agent_steps;
+        env->log.n += 1.0f;
+    }
+    if (env->episodes) {
+        int64_t k = reserve_episode_record(env->episode_count);
+        EpisodeRecord* rec = &env->episodes[k % env->episode_capacity];
+        rec->score = (float)env->score;
+        rec->episode_return = env->episode_return;
+        rec->episode_length = (float)env->step_count;
+        rec->difficulty = env->curriculum_difficulty;
+        rec->env_id = env->env_id;
+        rec->seed = env->episode_seed;
+        rec->restarted = env->restarted;
+        publish_episode_record(env->episode_count, k);
+    }
+}
+
+/* Pipes needed so one is always on screen: the span num_pipes * spacing
+ * must cover width + pipe width before the leftmost one is recycled.
+ * 3 for the default ratios; at most MAX_PIPES for any spacing of at least
+ * MIN_PIPE_SPACING_RATIO (the cap only absorbs rounding). */
+static int pipe_count(int width, float pipe_spacing) {
+    float span = (float)width * (1.0f + PIPE_WIDTH_RATIO);
+    int n = (int)ceilf(span / ((float)width * pipe_spacing));
+    if (n < 1) n = 1;
+    if (n > MAX_PIPES) n = MAX_PIPES;
+    return n;
+}
+
+/* Derived constants; call again after changing the physics fields */
+void configure(Flappy* env) {
+    env->pipe_speed = (float)env->width * env->pipe_speed_ratio;
+    env->num_pipes = pipe_count(env->width, env->pipe_spacing);
 }
 
 void init(Flappy* env) {
     env->gravity = GRAVITY;
     env->flap_velocity = FLAP_VEL;
-    env->pipe_speed = (float)env->width * PIPE_SPEED_RATIO;
+    env->pipe_speed_ratio = PIPE_SPEED_RATIO;
     env->pipe_spacing = PIPE_SPACING_RATIO;
     env->gap_height = GAP_HEIGHT_RATIO;
+    env->bird_radius_ratio = BIRD_RADIUS_RATIO;
+    configure(env);
     if (env->max_steps <= 0) env->max_steps = 5000;
+    if (env->frame_skip <= 0) env->frame_skip = 1;
+    if (env->obs_stack <= 0) env->obs_stack = 1;
+    env->pending_course = -1;
+}
+
+/* Hash a seed into a xorshift32 state (splitmix-style finalizer) so
+ * neighbouring env seeds (i + seed*num_envs) give unrelated streams, and
+ * the state is kept non-zero. */
+static uint32_t seed_rng(uint32_t seed) {
+    uint32_t z = seed + 0x9E3779B9u;
+    z = (z ^ (z >> 16)) * 0x85EBCA6Bu;
+    z = (z ^ (z >> 13)) * 0xC2B2AE35u;
+    z ^= z >> 16;
+    return z ? z : 0x6D2B79F5u;
+}
+
+/* xorshift32: all gap sampling draws from the env's own state, so a
+ * trajectory only depends on that env's seed, not on how many other envs
+ * were stepped. */
+static inline uint32_t xorshift32(uint32_t* state) {
+    uint32_t x = *state;
+    x ^= x << 13;
+    x ^= x >> 17;
+    x ^= x << 5;
+    *state = x;
+    return x;
+}
+
+void c_seed(Flappy* env, uint32_t seed) {
+    env->rng = seed_rng(seed);
 }
 
 static float clampf(float v, float lo, float hi) {
@@ -93,12 +311,10 @@ static float clampf(float v, float lo, float hi) {
     return v;
 }
 
-/* Only sets gap and scored; caller sets x. Gap distribution is a smooth
- * function of curriculum_difficulty (0–1): range widens, extreme-bias
- * ramps up then back down, ending on pure uniform (= eval distribution). */
-static void spawn_pipe(Flappy* env, int idx) {
-    float d = env->curriculum_difficulty;
-
+/* Gap distribution is a smooth function of curriculum difficulty d (0–1):
+ * range widens, extreme-bias ramps up then back down, ending on pure
+ * uniform (= eval distribution). Shared by c_step and c_step_batch. */
+static float sample_gap_center(uint32_t* rng, float d) {
     /* 1. Range expansion: d 0→0.25 widens half-range from 0 to 0.25 */
     float half_range = (d < 0.25f) ? d : 0.25f;
     float gap_min = 0.5f - half_range;
@@ -118,46 +334,83 @@ static void spawn_pipe(Flappy* env, int idx) {
     }
 
     /* 3. Sample gap center */
-    float r = (float)(rand() % 1000) / 1000.0f;
+    float r = (float)(xorshift32(rng) % 1000) / 1000.0f;
     if (r < extreme_prob) {
         /* Extreme band: [0.25, 0.35] or [0.65, 0.75] */
-        if (rand() % 2 == 0)
-            env->pipes[idx].gap_center_y = 0.25f + (float)(rand() % 11) / 100.0f;
-        else
-            env->pipes[idx].gap_center_y = 0.65f + (float)(rand() % 11) / 100.0f;
-    } else {
-        /* Uniform within current range */
-        int steps = (int)((gap_max - gap_min) * 100.0f + 0.5f);
-        if (steps <= 0)
-            env->pipes[idx].gap_center_y = 0.5f;
-        else
-            env->pipes[idx].gap_center_y = gap_min + (float)(rand() % (steps + 1)) / 100.0f;
+        if (xorshift32(rng) % 2 == 0)
+            return 0.25f + (float)(xorshift32(rng) % 11) / 100.0f;
+        return 0.65f + (float)(xorshift32(rng) % 11) / 100.0f;
     }
+    /* Uniform within current range */
+    int steps = (int)((gap_max - gap_min) * 100.0f + 0.5f);
+    if (steps <= 0)
+        return 0.5f;
+    return gap_min + (float)(xorshift32(rng) % (uint32_t)(steps + 1)) / 100.0f;
+}
+
+/* Bucket nearest difficulty d when [0, 1] is split at b / (buckets - 1) */
+static inline int difficulty_bucket(float d, int buckets) {
+    return (int)(clampf(d, 0.0f, 1.0f) * (float)(buckets - 1) + 0.5f);
+}
+
+/* Alias-method draw from the bucket for d: O(1), two RNG draws, no
+ * per-distribution branching. */
+static float sample_gap_table(const GapTable* t, uint32_t* rng, float d) {
+    size_t row = (size_t)difficulty_bucket(d, t->buckets) * t->size;
+    uint32_t k = (uint32_t)(((uint64_t)xorshift32(rng) * (uint32_t)t->size) >> 32);
+    float u = (float)(xorshift32(rng) >> 8) * (1.0f / 16777216.0f);
+    return u < t->prob[row + k] ? t->values[row + k] : t->values[row + t->alias[row + k]];
+}
+
+/* Gap center from the env's table if it has one, else the built-in sampler */
+static inline float sample_gap(const GapTable* t, uint32_t* rng, float d) {
+    return t->values ? sample_gap_table(t, rng, d) : sample_gap_center(rng, d);
+}
+
+/* Bank course for an episode at difficulty d: nearest bucket, row drawn
+ * from the env RNG (one draw, so the episode seed still pins the course). */
+static const float* bank_course(const CourseBank* bank, uint32_t* rng, float d) {
+    int b = difficulty_bucket(d, bank->buckets);
+    uint32_t k = xorshift32(rng) % (uint32_t)bank->courses;
+    return bank->gaps + ((size_t)b * bank->courses + k) * bank->len;
+}
 
+/* Only sets gap and scored; caller sets x. */
+static void spawn_pipe(Flappy* env, int idx) {
+    if (env->course_pos < env->course_len)
+        env->pipes[idx].gap_center_y = env->course[env->course_pos++];
+    else
+        env->pipes[idx].gap_center_y = sample_gap(&env->gap_table, &env->rng, env->curriculum_difficulty);
     env->pipes[idx].gap_height = env->gap_height;
     env->pipes[idx].scored = 0;
 }
 
+/* Ring slot of the pipe at offset k from head */
+static inline int pipe_slot(Flappy* env, int k) {
+    int i = env->head + k;
+    return i < env->num_pipes ? i : i - env->num_pipes;
+}
+
+/* Pipes only move left, so the nearest pipe ahead of the bird only moves
+ * forward in the ring: advance past pipes the bird has cleared. */
+static void advance_next(Flappy* env) {
+    float bird_x = (float)env->width * BIRD_X_RATIO;
+    float pw = (float)env->width * PIPE_WIDTH_RATIO;
+    while (env->next < env->num_pipes && env->pipes[pipe_slot(env, env->next)].x + pw <= bird_x)
+        env->next++;
+}
+
 /* 5-dim obs: bird_y, bird_vy, dist_to_pipe, gap_center, gap_height */
-void compute_observations(Flappy* env) {
-    float* o = env->observations;
+static void observe(Flappy* env, float* o) {
     o[0] = clampf(env->bird_y, 0.0f, 1.0f);
     o[1] = clampf(env->bird_vy / 0.1f, -1.0f, 1.0f);
     float bird_x = (float)env->width * BIRD_X_RATIO;
-    float pw = (float)env->width * PIPE_WIDTH_RATIO;
-    int next = -1;
-    float best_x = 1e9f;
-    for (int i = 0; i < env->num_pipes; i++) {
-        if (env->pipes[i].x + pw > bird_x && env->pipes[i].x < best_x) {
-            best_x = env->pipes[i].x;
-            next = i;
-        }
-    }
-    if (next >= 0) {
-        float dx = env->pipes[next].x - bird_x;
+    if (env->next < env->num_pipes) {
+        Pipe* next = &env->pipes[pipe_slot(env, env->next)];
+        float dx = next->x - bird_x;
         o[2] = clampf(dx / (float)env->width, 0.0f, 1.0f);
-        o[3] = env->pipes[next].gap_center_y;
-        o[4] = env->pipes[next].gap_height;
+        o[3] = next->gap_center_y;
+        o[4] = next->gap_height;
     } else {
         o[2] = 1.0f;
         o[3] = 0.5f;
@@ -165,41 +418,232 @@ void compute_observations(Flappy* env) {
     }
 }
 
+/* Stacked observation from the history ring, oldest first: the slot after
+ * the newest wraps around to it */
+static void write_stack(Flappy* env) {
+    int k = env->obs_stack;
+    for (int j = 0; j < k; j++) {
+        int slot = env->history_head + 1 + j;
+        slot = slot < k ? slot : slot - k;
+        memcpy(&env->observations[j * OBS_DIM], &env->obs_history[slot * OBS_DIM], OBS_DIM * sizeof(float));
+    }
+}
+
+void compute_observations(Flappy* env) {
+    if (env->obs_stack <= 1) {
+        observe(env, env->observations);
+        return;
+    }
+    int k = env->obs_stack;
+    env->history_head = env->history_head + 1 < k ? env->history_head + 1 : 0;
+    float* newest = &env->obs_history[env->history_head * OBS_DIM];
+    observe(env, newest);
+    if (env->history_len == 0) {
+        for (int j = 0; j < k; j++)
+            memcpy(&env->obs_history[j * OBS_DIM], newest, OBS_DIM * sizeof(float));
+        env->history_len = k;
+    }
+    write_stack(env);
+}
+
+static int hits_pipe(Flappy* env, Pipe* p, float by, float br) {
+    float gap_c = p->gap_center_y * (float)env->height;
+    float gap_h = p->gap_height * (float)env->height;
+    float top_bottom = gap_c - gap_h * 0.5f;
+    float bottom_top = gap_c + gap_h * 0.5f;
+    return by - br < top_bottom || by + br > bottom_top;
+}
+
+/* Only pipes overlapping the bird's x band [bx - br, bx + br] can hit it.
+ * Walk outwards from env->next (pipes are ordered by x) and stop at the
+ * first pipe clear of the band on each side: one or two pipes in practice. */
 static int collides(Flappy* env, float bx, float by, float br) {
     float pw = env->width * PIPE_WIDTH_RATIO;
-    float ph_top = env->height * 2.0f;
-    for (int i = 0; i < env->num_pipes; i++) {
-        float px = env->pipes[i].x;
-        if (px + pw < bx - br || px > bx + br) continue;
-        float gap_c = env->pipes[i].gap_center_y * (float)env->height;
-        float gap_h = env->pipes[i].gap_height * (float)env->height;
-        float top_bottom = gap_c - gap_h * 0.5f;
-        float bottom_top = gap_c + gap_h * 0.5f;
-        if (by - br < top_bottom || by + br > bottom_top)
-            return 1;
+    for (int k = env->next - 1; k >= 0; k--) {
+        Pipe* p = &env->pipes[pipe_slot(env, k)];
+        if (p->x + pw < bx - br) break;
+        if (p->x <= bx + br && hits_pipe(env, p, by, br)) return 1;
+    }
+    for (int k = env->next; k < env->num_pipes; k++) {
+        Pipe* p = &env->pipes[pipe_slot(env, k)];
+        if (p->x > bx + br) break;
+        if (p->x + pw >= bx - br && hits_pipe(env, p, by, br)) return 1;
     }
     return 0;
 }
 
+void c_get_state(Flappy* env, FlappyState* st) {
+    memset(st, 0, sizeof(FlappyState));
+    if (env->course && env->bank.gaps && env->course >= env->bank.gaps &&
+            env->course < env->bank.gaps + (size_t)env->bank.buckets * env->bank.courses * env->bank.len) {
+        st->course_source = 2;
+        st->course_offset = env->course - env->bank.gaps;
+    } else if (env->course) {
+        st->course_source = 1;
+        st->course_offset = env->course - env->courses;
+    }
+    st->course_len = env->course_len;
+    st->course_pos = env->course_pos;
+    st->bird_y = env->bird_y;
+    st->bird_vy = env->bird_vy;
+    for (int i = 0; i < MAX_PIPES; i++) {
+        st->pipe_x[i] = env->pipes[i].x;
+        st->pipe_gap[i] = env->pipes[i].gap_center_y;
+        st->pipe_gap_height[i] = env->pipes[i].gap_height;
+        st->pipe_scored[i] = env->pipes[i].scored;
+    }
+    st->num_pipes = env->num_pipes;
+    st->head = env->head;
+    st->next = env->next;
+    st->score = env->score;
+    st->step_count = env->step_count;
+    st->agent_steps = env->agent_steps;
+    st->difficulty = env->curriculum_difficulty;
+    st->episode_return = env->episode_return;
+    st->rng = env->rng;
+    st->episode_seed = env->episode_seed;
+    st->obs_stack = env->obs_stack;
+    st->history_head = env->history_head;
+    st->history_len = env->history_len;
+    memcpy(st->obs_history, env->obs_history, sizeof(st->obs_history));
+}
+
+/* Checks a state fits this env's configuration; NULL if it does, else why not */
+const char* check_state(const FlappyState* st, int num_pipes, int obs_stack, const CourseBank* bank,
+        int num_courses, int courses_len) {
+    if (st->num_pipes != num_pipes) return "state has a different pipe count (pipe_spacing_ratio or width)";
+    if (st->obs_stack != obs_stack) return "state has a different obs_stack";
+    if (st->head < 0 || st->head >= num_pipes || st->next < 0 || st->next > num_pipes) return "state has invalid pipe indices";
+    if (st->history_head < 0 || st->history_head >= MAX_OBS_STACK) return "state has an invalid history index";
+    int64_t size = st->course_source == 2 ? (int64_t)bank->buckets * bank->courses * bank->len
+        : st->course_source == 1 ? (int64_t)num_courses * courses_len : 0;
+    if (st->course_source < 0 || st->course_source > 2 || (st->course_source == 2 && !bank->gaps) ||
+            (st->course_source && (st->course_offset < 0 || st->course_offset + st->course_len > size)))
+        return "state plays a course this env does not have";
+    return NULL;
+}
+
+/* Restores a state from c_get_state (validate with check_state first) and
+ * rewrites the observation. */
+void c_set_state(Flappy* env, const FlappyState* st) {
+    env->course = st->course_source == 2 ? env->bank.gaps + st->course_offset
+        : st->course_source == 1 ? env->courses + st->course_offset : NULL;
+    env->course_len = st->course_len;
+    env->course_pos = st->course_pos;
+    env->bird_y = st->bird_y;
+    env->bird_vy = st->bird_vy;
+    for (int i = 0; i < MAX_PIPES; i++) {
+        env->pipes[i].x = st->pipe_x[i];
+        env->pipes[i].gap_center_y = st->pipe_gap[i];
+        env->pipes[i].gap_height = st->pipe_gap_height[i];
+        env->pipes[i].scored = st->pipe_scored[i];
+    }
+    env->head = st->head;
+    env->next = st->next;
+    env->score = st->score;
+    env->step_count = st->step_count;
+    env->agent_steps = st->agent_steps;
+    env->curriculum_difficulty = st->difficulty;
+    env->episode_return = st->episode_return;
+    env->log.episode_return = st->episode_return;
+    env->rng = st->rng;
+    env->episode_seed = st->episode_seed;
+    env->history_head = st->history_head;
+    env->history_len = st->history_len;
+    memcpy(env->obs_history, st->obs_history, sizeof(env->obs_history));
+    if (env->obs_stack > 1)
+        write_stack(env);
+    else
+        observe(env, env->observations);
+}
+
 void c_reset(Flappy* env, float difficulty) {
+    if (env->difficulty_src) difficulty = *env->difficulty_src;
     env->curriculum_difficulty = difficulty;
+    env->next_difficulty = difficulty;
+    env->episode_return = 0.0f;
     env->log.episode_return = 0.0f;
     env->bird_y = 0.5f;
     env->bird_vy = 0.0f;
     env->score = 0;
     env->step_count = 0;
-    env->num_pipes = 3;
+    env->agent_steps = 0;
+    env->history_len = 0;
+    env->recent_len = 0;
+    env->restarted = 0;
+    env->episode_seed = env->rng;
+    env->head = 0;
+    env->next = 0;
+    env->course = NULL;
+    env->course_len = 0;
+    env->course_pos = 0;
+    if (env->pending_course >= 0) {
+        env->course = env->courses + (size_t)env->pending_course * env->courses_len;
+        env->course_len = env->courses_len;
+        env->pending_course = -1;
+    } else if (env->bank.gaps) {
+        env->course = bank_course(&env->bank, &env->rng, difficulty);
+        env->course_len = env->bank.len;
+    }
     float start_x = (float)env->width * 0.5f;
     for (int i = 0; i < env->num_pipes; i++) {
         env->pipes[i].x = start_x + (float)i * env->width * env->pipe_spacing;
         spawn_pipe(env, i);
     }
+    advance_next(env);
     compute_observations(env);
 }
 
-void c_step(Flappy* env) {
-    env->rewards[0] = 0.0f;
-    env->terminals[0] = 0;
+/* Restart buffers for restart_prob > 0; returns -1 if out of memory */
+int restart_alloc(Flappy* env) {
+    env->recent = (FlappyState*)calloc(env->restart_lag + RESTART_STATES, sizeof(FlappyState));
+    if (!env->recent) return -1;
+    env->restart_states = env->recent + env->restart_lag;
+    return 0;
+}
+
+/* Called before each agent step: the state it starts from */
+static void push_recent(Flappy* env) {
+    c_get_state(env, &env->recent[env->recent_head]);
+    env->recent_head = env->recent_head + 1 < env->restart_lag ? env->recent_head + 1 : 0;
+    if (env->recent_len < env->restart_lag) env->recent_len++;
+}
+
+/* On death: keep the state restart_lag agent steps back (or the oldest
+ * of a shorter episode). The ring is not rewound at resets, so the oldest
+ * entry is recent_len slots behind the head. */
+static void save_death_state(Flappy* env) {
+    int oldest = (env->recent_head - env->recent_len + env->restart_lag) % env->restart_lag;
+    env->restart_states[env->restart_count % RESTART_STATES] = env->recent[oldest];
+    env->restart_count++;
+}
+
+/* End of episode: fresh c_reset, or with probability restart_prob a
+ * restart from a saved pre-death state. The env keeps its own RNG
+ * stream, so pipes spawned after the restart differ from the original
+ * run; the next episode's difficulty applies to them. */
+static void auto_reset(Flappy* env) {
+    int saved = env->restart_count < RESTART_STATES ? env->restart_count : RESTART_STATES;
+    if (saved > 0 && (float)(xorshift32(&env->rng) % 1000) / 1000.0f < env->restart_prob) {
+        const FlappyState* st = &env->restart_states[xorshift32(&env->rng) % (uint32_t)saved];
+        /* Courses may have been detached since the state was saved */
+        if (!check_state(st, env->num_pipes, env->obs_stack, &env->bank, env->num_courses, env->courses_len)) {
+            uint32_t rng = env->rng;
+            float difficulty = env->difficulty_src ? *env->difficulty_src : env->next_difficulty;
+            c_set_state(env, st);
+            env->rng = rng;
+            env->curriculum_difficulty = difficulty;
+            env->recent_len = 0;
+            env->restarted = 1;
+            return;
+        }
+    }
+    c_reset(env, env->next_difficulty);
+}
+
+/* One frame of the game with the current action: adds its reward to
+ * rewards[0]. Returns 1 when the episode ended (env already auto-reset). */
+static int step_frame(Flappy* env) {
     env->step_count++;
 
     /* Physics */
@@ -210,65 +654,112 @@ void c_step(Flappy* env) {
     env->bird_y += env->bird_vy;
     env->bird_y = clampf(env->bird_y, 0.0f, 1.0f);
 
-    /* Collision: ceiling / floor */
+    /* Collision: ceiling / floor, pipes */
     float by_px = env->bird_y * (float)env->height;
     float bx_px = (float)env->width * BIRD_X_RATIO;
-    float br = (float)env->height * BIRD_RADIUS_RATIO;
-    if (by_px - br <= 0.0f || by_px + br >= (float)env->height) {
-        env->rewards[0] = -1.0f;
+    float br = (float)env->height * env->bird_radius_ratio;
+    if (by_px - br <= 0.0f || by_px + br >= (float)env->height || collides(env, bx_px, by_px, br)) {
+        env->rewards[0] += -1.0f;
         env->terminals[0] = 1;
-        env->log.episode_return += env->rewards[0];
+        env->episode_return += -1.0f;
+        env->log.episode_return += -1.0f;
+        if (env->lookahead) return 1;
+        if (env->recent && env->recent_len) save_death_state(env);
         add_log(env);
-        c_reset(env, env->curriculum_difficulty);
-        return;
-    }
-    /* Collision: pipes */
-    if (collides(env, bx_px, by_px, br)) {
-        env->rewards[0] = -1.0f;
-        env->terminals[0] = 1;
-        env->log.episode_return += env->rewards[0];
-        add_log(env);
-        c_reset(env, env->curriculum_difficulty);
-        return;
+        auto_reset(env);
+        return 1;
     }
 
-    /* Scoring: +1 per pipe passed */
+    /* Scoring: +1 per pipe passed. Only pipes behind env->next can have
+     * passed the bird. */
+    float reward = 0.0f;
     float pw = env->width * PIPE_WIDTH_RATIO;
-    for (int i = 0; i < env->num_pipes; i++) {
-        if (!env->pipes[i].scored && env->pipes[i].x + pw < bx_px) {
-            env->pipes[i].scored = 1;
-            env->rewards[0] += 1.0f;
+    for (int k = 0; k < env->next; k++) {
+        Pipe* p = &env->pipes[pipe_slot(env, k)];
+        if (!p->scored && p->x + pw < bx_px) {
+            p->scored = 1;
+            reward += 1.0f;
             env->score++;
         }
     }
+    env->rewards[0] += reward;
+    env->episode_return += reward;
+    env->log.episode_return += reward;
 
-    /* Move pipes & recycle */
+    /* Move pipes & recycle: the head is the leftmost pipe; once off screen
+     * it goes behind the tail (the rightmost) and becomes the new tail. */
     for (int i = 0; i < env->num_pipes; i++)
         env->pipes[i].x -= env->pipe_speed;
 
-    int leftmost = 0;
-    for (int i = 1; i < env->num_pipes; i++)
-        if (env->pipes[i].x < env->pipes[leftmost].x) leftmost = i;
+    int leftmost = env->head;
     if (env->pipes[leftmost].x + pw < 0) {
-        float rightmost = env->pipes[0].x;
-        for (int i = 1; i < env->num_pipes; i++)
-            if (env->pipes[i].x > rightmost) rightmost = env->pipes[i].x;
+        float rightmost = env->pipes[pipe_slot(env, env->num_pipes - 1)].x;
         env->pipes[leftmost].x = rightmost + (float)env->width * env->pipe_spacing;
         spawn_pipe(env, leftmost);
+        env->head = pipe_slot(env, 1);
+        if (env->next > 0) env->next--;
     }
+    advance_next(env);
 
     /* Truncation */
     if (env->step_count >= env->max_steps) {
         env->terminals[0] = 1;
-        env->log.episode_return += env->rewards[0];
+        if (env->lookahead) return 1;
         add_log(env);
-        c_reset(env, env->curriculum_difficulty);
-        return;
+        auto_reset(env);
+        return 1;
+    }
+    return 0;
+}
+
+/* Action repeat: play frame_skip frames with actions[0], summing rewards
+ * and stopping at the end of the episode; observations only once. */
+void c_step(Flappy* env) {
+    env->rewards[0] = 0.0f;
+    env->terminals[0] = 0;
+    if (env->recent) push_recent(env);
+    env->agent_steps++;
+    for (int f = 0; f < env->frame_skip; f++) {
+        if (step_frame(env)) return;
     }
-    env->log.episode_return += env->rewards[0];
     compute_observations(env);
 }
 
+/* K-step lookahead: plays actions[0..k) from state st (checked) on a
+ * private copy of env, which only lends its configuration; env itself is
+ * not touched. Writes the summed reward, the step the episode ended on
+ * (-1 = still running after k steps) and the last observation, taken at
+ * the end of the episode when it ended. */
+void c_simulate(const Flappy* env, const FlappyState* st, const int* actions, int k,
+        float* ret, int* end, float* obs) {
+    Flappy sim = *env;
+    int action = 0;
+    float reward;
+    unsigned char terminal;
+    sim.observations = obs;
+    sim.actions = &action;
+    sim.rewards = &reward;
+    sim.terminals = &terminal;
+    sim.difficulty_src = NULL;  /* the state's difficulty, not the live one */
+    sim.episodes = NULL;
+    sim.client = NULL;
+    sim.lookahead = 1;
+    sim.recent = NULL;
+    c_set_state(&sim, st);
+    *ret = 0.0f;
+    *end = -1;
+    for (int t = 0; t < k; t++) {
+        action = actions[t];
+        c_step(&sim);
+        *ret += reward;
+        if (terminal) {
+            compute_observations(&sim);
+            *end = t;
+            return;
+        }
+    }
+}
+
 void c_render(Flappy* env) {
     if (env->client == NULL) {
         env->client = (Client*)calloc(1, sizeof(Client));
@@ -302,7 +793,7 @@ void c_render(Flappy* env) {
 
     float by = env->bird_y * (float)env->height;
     float bx = (float)env->width * BIRD_X_RATIO;
-    float br = (float)env->height * BIRD_RADIUS_RATIO * 2.0f;
+    float br = (float)env->height * env->bird_radius_ratio * 2.0f;
     DrawTexturePro(c->bird,
         (Rectangle){0, 0, (float)c->bird.width, (float)c->bird.height},
         (Rectangle){bx - br, by - br, br * 2, br * 2},
@@ -320,4 +811,6 @@ void c_close(Flappy* env) {
         free(env->client);
         env->client = NULL;
     }
+    free(env->recent);
+    env->recent = NULL;
 }
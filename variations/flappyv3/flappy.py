@@ -8,6 +8,51 @@ from . import binding
 
 OBS_DIM = 5
 
+# Completed-episode record written by the C envs (EpisodeRecord in flappy.h).
+# seed is the env RNG state at the start of the episode.
+EPISODE_DTYPE = np.dtype(
+    [
+        ("score", np.float32),
+        ("episode_return", np.float32),
+        ("episode_length", np.float32),
+        ("difficulty", np.float32),
+        ("env_id", np.int32),
+        ("seed", np.uint32),
+        ("restarted", np.int32),
+    ]
+)
+
+
+def read_episodes(episodes, episode_count, tail):
+    """Copy records written since tail out of an episode ring buffer.
+
+    episodes/episode_count are the arrays passed to vec_init; tail is the
+    number of records already read. Only records published in
+    episode_count[0] are read, never slots a C env is still filling in.
+    Returns (records, new_tail, dropped), where dropped counts records
+    overwritten before they were read.
+    """
+    head = int(episode_count[0])
+    capacity = len(episodes)
+    dropped = max(0, head - tail - capacity)
+    tail += dropped
+    idx = np.arange(tail, head) % capacity
+    return episodes[idx], head, dropped
+
+
+def summarize_episodes(records):
+    """vec_log-style dict (means + n) from episode records; {} if empty."""
+    if len(records) == 0:
+        return {}
+    return {
+        "perf": float(np.mean(records["score"] > 0)),
+        "score": float(np.mean(records["score"])),
+        "episode_return": float(np.mean(records["episode_return"])),
+        "episode_length": float(np.mean(records["episode_length"])),
+        "difficulty": float(np.mean(records["difficulty"])),
+        "n": float(len(records)),
+    }
+
 
 class Flappy(pufferlib.PufferEnv):
     """Single-agent Flappy. Actions: 0 = no flap, 1 = flap. Obs: bird y, vy, next pipe dist/gap, signed gap error (above/below)."""
@@ -22,6 +67,7 @@ class Flappy(pufferlib.PufferEnv):
         max_steps=5000,
         buf=None,
         seed=0,
+        num_threads=1,
     ):
         self.single_observation_space = gymnasium.spaces.Box(
             low=-1.0, high=1.0, shape=(OBS_DIM,), dtype=np.float32
@@ -47,6 +93,7 @@ class Flappy(pufferlib.PufferEnv):
             width=width,
             height=height,
             max_steps=max_steps,
+            num_threads=num_threads,
         )
         self._tick = 0
 
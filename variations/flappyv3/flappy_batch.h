@@ -0,0 +1,423 @@
+/* FlappyBatch: structure-of-arrays layout of N Flappy envs in one block.
+ *
+ * Same game as flappy.h (same constants, gap sampler and per-env RNG), but
+ * every field is an array over envs and pipes are stored slot-major
+ * (pipe_x[p * num_envs + i]). c_step_batch runs physics, collision,
+ * scoring, pipe movement and observations as flat loops over envs that
+ * the compiler can auto-vectorize; only the rare branchy work (pipe
+ * recycle and episode reset, which draw from the RNG) runs per env.
+ * Each env's slots form a ring like Flappy.pipes (pipe_head = leftmost),
+ * so recycling is O(1); the vector loops simply test every slot.
+ * Trajectories match c_step bit-for-bit for the same seeds and actions.
+ */
+
+#define BATCH_ALIGN 64
+
+typedef struct {
+    int num_envs;
+    int num_pipes;
+    int width;
+    int height;
+    int max_steps;
+    float gravity;
+    float flap_velocity;
+    float pipe_speed_ratio;
+    float pipe_spacing;
+    float gap_height;
+    float bird_radius_ratio;
+    float pipe_speed;  /* derived, as in Flappy */
+
+    float* observations;
+    int* actions;
+    float* rewards;
+    unsigned char* terminals;
+
+    /* Per env, length num_envs */
+    float* bird_y;
+    float* bird_vy;
+    int* score;
+    int* step_count;
+    float* difficulty;  /* this episode's, locked at reset as in Flappy */
+    float* next_difficulty;  /* pushed by batch_step for the next episode */
+    const float* difficulty_src;  /* optional caller's shared array, read at each reset */
+    float* episode_return;  /* this episode's rewards, for its record */
+    float* log_return;  /* live Log.episode_return, kept contiguous; batch_log clears it */
+    uint32_t* rng;
+    GapTable gap_table;  /* shared by all envs, as in Flappy */
+    uint32_t* episode_seed;
+    Log* logs;
+
+    /* Per pipe slot, length num_pipes * num_envs (slot-major) */
+    float* pipe_x;
+    float* pipe_gap;
+    int* pipe_scored;
+    int* pipe_head;  /* per env: slot of the leftmost pipe */
+
+    /* Scratch, length num_envs */
+    unsigned char* done;  /* 1 = died this step, 2 = truncated */
+    unsigned char* recycle;
+    float* next_x;
+    float* next_gap;
+
+    /* Optional course bank, as in Flappy; per env, the current course
+     * (NULL = sample) and the next gap to take from it */
+    CourseBank bank;
+    const float** course;
+    int* course_pos;
+
+    /* Optional episode ring buffer, as in Flappy */
+    EpisodeRecord* episodes;
+    int64_t* episode_count;
+    int episode_capacity;
+
+    void* block;
+} FlappyBatch;
+
+static size_t batch_align(size_t n) {
+    return (n + BATCH_ALIGN - 1) & ~(size_t)(BATCH_ALIGN - 1);
+}
+
+/* One calloc for every array; returns NULL on allocation failure. */
+FlappyBatch* batch_alloc(int num_envs) {
+    FlappyBatch* b = (FlappyBatch*)calloc(1, sizeof(FlappyBatch));
+    if (!b) return NULL;
+    size_t n = (size_t)num_envs;
+    size_t np = n * MAX_PIPES;
+    void** slots[] = {
+        (void**)&b->bird_y, (void**)&b->bird_vy, (void**)&b->score, (void**)&b->step_count,
+        (void**)&b->difficulty, (void**)&b->next_difficulty, (void**)&b->episode_return, (void**)&b->log_return,
+        (void**)&b->rng, (void**)&b->episode_seed, (void**)&b->logs,
+        (void**)&b->pipe_x, (void**)&b->pipe_gap, (void**)&b->pipe_scored, (void**)&b->pipe_head,
+        (void**)&b->done, (void**)&b->recycle, (void**)&b->next_x, (void**)&b->next_gap,
+        (void**)&b->course, (void**)&b->course_pos,
+    };
+    size_t sizes[] = {
+        n * sizeof(float), n * sizeof(float), n * sizeof(int), n * sizeof(int),
+        n * sizeof(float), n * sizeof(float), n * sizeof(float), n * sizeof(float),
+        n * sizeof(uint32_t), n * sizeof(uint32_t), n * sizeof(Log),
+        np * sizeof(float), np * sizeof(float), np * sizeof(int), n * sizeof(int),
+        n, n, n * sizeof(float), n * sizeof(float),
+        n * sizeof(const float*), n * sizeof(int),
+    };
+    int num_arrays = sizeof(sizes) / sizeof(sizes[0]);
+    size_t total = 0;
+    for (int k = 0; k < num_arrays; k++) total += batch_align(sizes[k]);
+    char* p = (char*)calloc(1, total + BATCH_ALIGN);
+    if (!p) {
+        free(b);
+        return NULL;
+    }
+    b->block = p;
+    p = (char*)batch_align((size_t)p);
+    for (int k = 0; k < num_arrays; k++) {
+        *slots[k] = p;
+        p += batch_align(sizes[k]);
+    }
+    b->num_envs = num_envs;
+    return b;
+}
+
+void batch_free(FlappyBatch* b) {
+    free(b->block);
+    free(b);
+}
+
+/* Same physics defaults as init() in flappy.h */
+void batch_defaults(FlappyBatch* b) {
+    b->gravity = GRAVITY;
+    b->flap_velocity = FLAP_VEL;
+    b->pipe_speed_ratio = PIPE_SPEED_RATIO;
+    b->pipe_spacing = PIPE_SPACING_RATIO;
+    b->gap_height = GAP_HEIGHT_RATIO;
+    b->bird_radius_ratio = BIRD_RADIUS_RATIO;
+}
+
+/* Same derived constants as configure() in flappy.h */
+void batch_configure(FlappyBatch* b) {
+    b->pipe_speed = (float)b->width * b->pipe_speed_ratio;
+    if (b->max_steps <= 0) b->max_steps = 5000;
+    b->num_pipes = pipe_count(b->width, b->pipe_spacing);
+}
+
+void batch_seed(FlappyBatch* b, int i, uint32_t seed) {
+    b->rng[i] = seed_rng(seed);
+}
+
+static void batch_add_log(FlappyBatch* b, int i) {
+    Log* log = &b->logs[i];
+    log->perf = b->score[i] > 0 ? 1.0f : 0.0f;
+    log->score = (float)b->score[i];
+    log->episode_length = (float)b->step_count[i];
+    log->difficulty = b->difficulty[i];
+    log->agent_steps = (float)b->step_count[i];  /* no frame skip */
+    log->n += 1.0f;
+    if (b->episodes) {
+        int64_t k = reserve_episode_record(b->episode_count);
+        EpisodeRecord* rec = &b->episodes[k % b->episode_capacity];
+        rec->score = (float)b->score[i];
+        rec->episode_return = b->episode_return[i];
+        rec->episode_length = (float)b->step_count[i];
+        rec->difficulty = b->difficulty[i];
+        rec->env_id = i;
+        rec->seed = b->episode_seed[i];
+        rec->restarted = 0;
+        publish_episode_record(b->episode_count, k);
+    }
+}
+
+/* Next gap for env i: from its bank course while it lasts, as spawn_pipe */
+static inline float batch_gap(FlappyBatch* b, int i, float difficulty) {
+    if (b->course[i] && b->course_pos[i] < b->bank.len)
+        return b->course[i][b->course_pos[i]++];
+    return sample_gap(&b->gap_table, &b->rng[i], difficulty);
+}
+
+/* Per-env reset, mirrors c_reset (without observations; see batch_observations) */
+static void batch_reset_env(FlappyBatch* b, int i, float difficulty) {
+    int n = b->num_envs;
+    if (b->difficulty_src) difficulty = b->difficulty_src[i];
+    b->difficulty[i] = difficulty;
+    b->next_difficulty[i] = difficulty;
+    b->episode_return[i] = 0.0f;
+    b->log_return[i] = 0.0f;
+    b->bird_y[i] = 0.5f;
+    b->bird_vy[i] = 0.0f;
+    b->score[i] = 0;
+    b->step_count[i] = 0;
+    b->episode_seed[i] = b->rng[i];
+    b->pipe_head[i] = 0;
+    b->course[i] = b->bank.gaps ? bank_course(&b->bank, &b->rng[i], difficulty) : NULL;
+    b->course_pos[i] = 0;
+    float start_x = (float)b->width * 0.5f;
+    for (int p = 0; p < b->num_pipes; p++) {
+        b->pipe_x[p * n + i] = start_x + (float)p * b->width * b->pipe_spacing;
+        b->pipe_gap[p * n + i] = batch_gap(b, i, difficulty);
+        b->pipe_scored[p * n + i] = 0;
+    }
+}
+
+/* Nearest pipe ahead of the bird, as compute_observations in flappy.h.
+ * Slot-outer so each pass is a straight select over envs. */
+static void batch_observations(FlappyBatch* b) {
+    int n = b->num_envs;
+    float bird_x = (float)b->width * BIRD_X_RATIO;
+    float pw = (float)b->width * PIPE_WIDTH_RATIO;
+    float width = (float)b->width;
+    float* restrict next_x = b->next_x;
+    float* restrict next_gap = b->next_gap;
+    for (int i = 0; i < n; i++) {
+        next_x[i] = 1e9f;
+        next_gap[i] = 0.5f;
+    }
+    for (int p = 0; p < b->num_pipes; p++) {
+        const float* restrict px = b->pipe_x + (size_t)p * n;
+        const float* restrict gap = b->pipe_gap + (size_t)p * n;
+        for (int i = 0; i < n; i++) {
+            int ahead = (px[i] + pw > bird_x) & (px[i] < next_x[i]);
+            next_x[i] = ahead ? px[i] : next_x[i];
+            next_gap[i] = ahead ? gap[i] : next_gap[i];
+        }
+    }
+    const float* restrict bird_y = b->bird_y;
+    const float* restrict bird_vy = b->bird_vy;
+    float* restrict o = b->observations;
+    float gap_height = b->gap_height;
+    for (int i = 0; i < n; i++) {
+        float y = bird_y[i];
+        float vy = bird_vy[i] / 0.1f;
+        float dx = (next_x[i] - bird_x) / width;
+        y = y < 0.0f ? 0.0f : y;
+        y = y > 1.0f ? 1.0f : y;
+        vy = vy < -1.0f ? -1.0f : vy;
+        vy = vy > 1.0f ? 1.0f : vy;
+        dx = dx < 0.0f ? 0.0f : dx;
+        dx = dx > 1.0f ? 1.0f : dx;
+        o[i*OBS_DIM + 0] = y;
+        o[i*OBS_DIM + 1] = vy;
+        o[i*OBS_DIM + 2] = next_x[i] < 1e9f ? dx : 1.0f;
+        o[i*OBS_DIM + 3] = next_gap[i];
+        o[i*OBS_DIM + 4] = gap_height;
+    }
+}
+
+void c_reset_batch(FlappyBatch* b, float difficulty) {
+    for (int i = 0; i < b->num_envs; i++)
+        batch_reset_env(b, i, difficulty);
+    batch_observations(b);
+}
+
+void c_step_batch(FlappyBatch* b) {
+    int n = b->num_envs;
+    int np = b->num_pipes;
+    float height = (float)b->height;
+    float bx_px = (float)b->width * BIRD_X_RATIO;
+    float br = height * b->bird_radius_ratio;
+    float pw = b->width * PIPE_WIDTH_RATIO;
+    float gap_h = b->gap_height * height;
+    float pipe_speed = b->pipe_speed;
+    int max_steps = b->max_steps;
+    float* restrict bird_y = b->bird_y;
+    float* restrict bird_vy = b->bird_vy;
+    float* restrict rewards = b->rewards;
+    float* restrict episode_return = b->episode_return;
+    float* restrict log_return = b->log_return;
+    unsigned char* restrict terminals = b->terminals;
+    unsigned char* restrict done = b->done;
+    unsigned char* restrict recycle = b->recycle;
+    int* restrict score = b->score;
+    int* restrict step_count = b->step_count;
+    const int* restrict actions = b->actions;
+
+    /* Physics (one straight loop per concern so each one vectorizes) */
+    float flap = b->flap_velocity;
+    float gravity = b->gravity;
+    for (int i = 0; i < n; i++) {
+        float vy = actions[i] == 1 ? -flap : bird_vy[i];
+        vy += gravity;
+        float y = bird_y[i] + vy;
+        y = y < 0.0f ? 0.0f : y;
+        y = y > 1.0f ? 1.0f : y;
+        bird_vy[i] = vy;
+        bird_y[i] = y;
+    }
+    for (int i = 0; i < n; i++) {
+        recycle[i] = 0;
+        step_count[i]++;
+    }
+
+    /* Collision: ceiling / floor */
+    for (int i = 0; i < n; i++) {
+        float by_px = bird_y[i] * height;
+        done[i] = (by_px - br <= 0.0f) | (by_px + br >= height);
+    }
+
+    /* Pipe collision: every slot tested, no early exit (same result as collides) */
+    for (int p = 0; p < np; p++) {
+        const float* restrict px = b->pipe_x + (size_t)p * n;
+        const float* restrict gap = b->pipe_gap + (size_t)p * n;
+        for (int i = 0; i < n; i++) {
+            float by = bird_y[i] * height;
+            int overlap = !((px[i] + pw < bx_px - br) | (px[i] > bx_px + br));
+            float gap_c = gap[i] * height;
+            float top_bottom = gap_c - gap_h * 0.5f;
+            float bottom_top = gap_c + gap_h * 0.5f;
+            int hit = overlap & ((by - br < top_bottom) | (by + br > bottom_top));
+            done[i] |= (unsigned char)hit;
+        }
+    }
+
+    /* Deaths: -1 and no scoring/movement, like the early return in c_step.
+     * Logged with truncations below, once the return includes the -1. */
+    for (int i = 0; i < n; i++) {
+        rewards[i] = done[i] ? -1.0f : 0.0f;
+        terminals[i] = done[i];
+    }
+
+    /* Scoring (+1 per pipe passed), movement, off-screen check for survivors */
+    for (int p = 0; p < np; p++) {
+        float* restrict px = b->pipe_x + (size_t)p * n;
+        int* restrict scored = b->pipe_scored + (size_t)p * n;
+        for (int i = 0; i < n; i++) {
+            int alive = done[i] == 0;
+            int pass = alive & (scored[i] == 0) & (px[i] + pw < bx_px);
+            scored[i] |= pass;
+            score[i] += pass;
+            rewards[i] += (float)pass;
+        }
+        for (int i = 0; i < n; i++) {
+            float x = px[i] - (done[i] == 0 ? pipe_speed : 0.0f);
+            px[i] = x;
+            recycle[i] |= (unsigned char)((done[i] == 0) & (x + pw < 0));
+        }
+    }
+
+    /* Episode return and truncation */
+    for (int i = 0; i < n; i++) {
+        episode_return[i] += rewards[i];
+        log_return[i] += rewards[i];
+        int truncated = !done[i] & (step_count[i] >= max_steps);
+        terminals[i] |= (unsigned char)truncated;
+        done[i] |= (unsigned char)(truncated << 1);
+    }
+
+    /* Rare per-env work: recycle the head (any off-screen pipe means the
+     * leftmost one is) behind the tail, then episode logs and auto-resets.
+     * Same order of RNG draws as c_step. */
+    for (int i = 0; i < n; i++) {
+        if (recycle[i]) {
+            int leftmost = b->pipe_head[i];
+            int tail = leftmost == 0 ? np - 1 : leftmost - 1;
+            float rightmost = b->pipe_x[tail * n + i];
+            b->pipe_x[leftmost * n + i] = rightmost + (float)b->width * b->pipe_spacing;
+            b->pipe_gap[leftmost * n + i] = batch_gap(b, i, b->difficulty[i]);
+            b->pipe_scored[leftmost * n + i] = 0;
+            b->pipe_head[i] = leftmost + 1 < np ? leftmost + 1 : 0;
+        }
+        if (done[i]) {
+            batch_add_log(b, i);
+            batch_reset_env(b, i, b->next_difficulty[i]);
+        }
+    }
+
+    batch_observations(b);
+}
+
+/* Env i as a FlappyState, same layout as c_get_state (next is recomputed
+ * from the pipes; the batch engine has no frame skip or history). */
+void c_get_state_batch(FlappyBatch* b, int i, FlappyState* st) {
+    int n = b->num_envs;
+    memset(st, 0, sizeof(FlappyState));
+    if (b->course[i]) {
+        st->course_source = 2;
+        st->course_offset = b->course[i] - b->bank.gaps;
+        st->course_len = b->bank.len;
+    }
+    st->course_pos = b->course_pos[i];
+    st->bird_y = b->bird_y[i];
+    st->bird_vy = b->bird_vy[i];
+    for (int p = 0; p < b->num_pipes; p++) {
+        st->pipe_x[p] = b->pipe_x[p * n + i];
+        st->pipe_gap[p] = b->pipe_gap[p * n + i];
+        st->pipe_gap_height[p] = b->gap_height;
+        st->pipe_scored[p] = b->pipe_scored[p * n + i];
+    }
+    st->num_pipes = b->num_pipes;
+    st->head = b->pipe_head[i];
+    float bird_x = (float)b->width * BIRD_X_RATIO;
+    float pw = (float)b->width * PIPE_WIDTH_RATIO;
+    while (st->next < b->num_pipes) {
+        int slot = (st->head + st->next) % b->num_pipes;
+        if (b->pipe_x[slot * n + i] + pw > bird_x) break;
+        st->next++;
+    }
+    st->score = b->score[i];
+    st->step_count = b->step_count[i];
+    st->agent_steps = b->step_count[i];
+    st->difficulty = b->difficulty[i];
+    st->episode_return = b->episode_return[i];
+    st->rng = b->rng[i];
+    st->episode_seed = b->episode_seed[i];
+    st->obs_stack = 1;
+}
+
+/* Restores env i from a checked state; call batch_observations afterwards. */
+void c_set_state_batch(FlappyBatch* b, int i, const FlappyState* st) {
+    int n = b->num_envs;
+    b->course[i] = st->course_source == 2 ? b->bank.gaps + st->course_offset : NULL;
+    b->course_pos[i] = st->course_pos;
+    b->bird_y[i] = st->bird_y;
+    b->bird_vy[i] = st->bird_vy;
+    for (int p = 0; p < b->num_pipes; p++) {
+        b->pipe_x[p * n + i] = st->pipe_x[p];
+        b->pipe_gap[p * n + i] = st->pipe_gap[p];
+        b->pipe_scored[p * n + i] = st->pipe_scored[p];
+    }
+    b->pipe_head[i] = st->head;
+    b->score[i] = st->score;
+    b->step_count[i] = st->step_count;
+    b->difficulty[i] = st->difficulty;
+    b->episode_return[i] = st->episode_return;
+    b->log_return[i] = st->episode_return;
+    b->rng[i] = st->rng;
+    b->episode_seed[i] = st->episode_seed;
+}
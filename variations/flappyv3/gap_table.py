@@ -0,0 +1,100 @@
+"""
+Table-driven gap-center distributions for Flappy v3 (alias method).
+
+A gap table is three float32/int32 arrays shaped (buckets, size): values
+(gap centers), prob and alias. Bucket b is the distribution at difficulty
+b / (buckets - 1); a C env samples the bucket nearest its difficulty in O(1)
+with two RNG draws (Vose's alias method) instead of the built-in curriculum
+sampler, so a new curriculum is just a new table (no C change, no rebuild).
+
+  table = build_gap_table()                    # the built-in curriculum, 21 buckets
+  table = build_gap_table(101, my_distribution)  # my_distribution(d) -> (values, probs)
+  save_gap_table("gaps.npz", table)
+  FlappyCurriculum(..., gap_table="gaps.npz")
+
+Tables reproduce the curriculum distribution, not its RNG stream: seeded
+trajectories differ from the built-in sampler.
+"""
+
+import numpy as np
+
+GAP_TABLE_KEYS = ("values", "prob", "alias")
+
+
+def curriculum_gap_distribution(difficulty: float):
+    """(values, probs) of the built-in sampler (sample_gap_center in flappy.h) at difficulty."""
+    d = np.float32(difficulty)
+    half_range = d if d < np.float32(0.25) else np.float32(0.25)
+    gap_min = np.float32(0.5) - half_range
+    gap_max = np.float32(0.5) + half_range
+
+    extreme_prob = np.float32(0.0)
+    if np.float32(0.25) < d < np.float32(0.85):
+        peak_d = np.float32(0.55)
+        if d <= peak_d:
+            t = (d - np.float32(0.25)) / (peak_d - np.float32(0.25))
+        else:
+            t = np.float32(1.0) - (d - peak_d) / (np.float32(0.85) - peak_d)
+        extreme_prob = t * np.float32(0.45)
+    # r = (rng % 1000) / 1000 takes the extreme branch when r < extreme_prob
+    p_extreme = np.count_nonzero(np.arange(1000, dtype=np.float32) / np.float32(1000.0) < extreme_prob) / 1000.0
+
+    probs = {}
+    steps = int((gap_max - gap_min) * np.float32(100.0) + np.float32(0.5))
+    uniform = [np.float32(0.5)] if steps <= 0 else [gap_min + np.float32(j) / np.float32(100.0) for j in range(steps + 1)]
+    for v in uniform:
+        probs[float(v)] = probs.get(float(v), 0.0) + (1.0 - p_extreme) / len(uniform)
+    for base in (np.float32(0.25), np.float32(0.65)):
+        for j in range(11):
+            v = float(base + np.float32(j) / np.float32(100.0))
+            probs[v] = probs.get(v, 0.0) + p_extreme / 22
+    values = np.array(sorted(v for v, p in probs.items() if p > 0), dtype=np.float32)
+    return values, np.array([probs[float(v)] for v in values], dtype=np.float64)
+
+
+def alias_table(values, probs, size=None):
+    """(values, prob, alias) for one distribution, padded to size entries (Vose's method)."""
+    values = np.asarray(values, dtype=np.float32)
+    probs = np.asarray(probs, dtype=np.float64)
+    if values.shape != probs.shape or values.ndim != 1 or len(values) == 0:
+        raise ValueError("values and probs must be equal-length non-empty 1D arrays")
+    if (probs < 0).any() or probs.sum() <= 0:
+        raise ValueError("probs must be non-negative with a positive sum")
+    size = len(values) if size is None else size
+    if size < len(values):
+        raise ValueError(f"size {size} is smaller than the {len(values)} values")
+    out_values = np.full(size, values[0], dtype=np.float32)
+    out_values[: len(values)] = values
+    scaled = np.zeros(size)
+    scaled[: len(values)] = probs / probs.sum() * size
+    prob = np.ones(size, dtype=np.float32)
+    alias = np.arange(size, dtype=np.int32)
+    small = [k for k in range(size) if scaled[k] < 1.0]
+    large = [k for k in range(size) if scaled[k] >= 1.0]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] -= 1.0 - scaled[s]
+        (small if scaled[l] < 1.0 else large).append(l)
+    # Leftovers are 1 up to rounding
+    return out_values, prob, alias
+
+
+def build_gap_table(buckets=21, distribution=curriculum_gap_distribution):
+    """{"values", "prob", "alias"} arrays (buckets, size) for distribution(d) at d = b / (buckets - 1)."""
+    if buckets < 1:
+        raise ValueError("a gap table needs at least one bucket")
+    dists = [distribution(b / max(1, buckets - 1)) for b in range(buckets)]
+    size = max(len(values) for values, _ in dists)
+    rows = [alias_table(values, probs, size) for values, probs in dists]
+    return {key: np.ascontiguousarray(np.stack([row[k] for row in rows])) for k, key in enumerate(GAP_TABLE_KEYS)}
+
+
+def save_gap_table(path, table):
+    np.savez(path, **{key: table[key] for key in GAP_TABLE_KEYS})
+
+
+def load_gap_table(path):
+    with np.load(path) as f:
+        return {key: np.ascontiguousarray(f[key]) for key in GAP_TABLE_KEYS}
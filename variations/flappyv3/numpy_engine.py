@@ -0,0 +1,425 @@
+"""
+Pure-NumPy Flappy v3: the batch engine (flappy_batch.h) without the C build.
+
+FlappyNumpy steps N envs as whole-array float32 operations in the same
+order as c_step_batch (physics, collision, scoring, pipe movement, recycle,
+auto-reset, observations), with the same per-env xorshift32 RNG, seed
+hashing and gap samplers (built-in curriculum, gap tables, course banks).
+Seeded trajectories match the C engines up to float tolerance; the gap
+sequences are bit-identical. parity.py checks both.
+
+FlappyCurriculum(engine="numpy") uses it when the C extension is not built,
+or as an oracle for C changes. The methods take the same arguments as the
+batch_* functions of the binding, with the FlappyNumpy object as the handle:
+
+  env = FlappyNumpy(observations, actions, rewards, terminals, truncations, num_envs, seed, width=400, height=600)
+  env.reset(seed, difficulty)
+  env.step(difficulty)
+  env.log()
+
+Struct-engine features (render, num_threads, frame_skip, obs_stack,
+restart_prob, per-env physics arrays, courses, state snapshots, simulate)
+are rejected with ValueError, as by the batch engine.
+"""
+
+import numpy as np
+
+# Mirrors the #defines of flappy.h
+MAX_PIPES = 5
+OBS_DIM = 5
+BIRD_X_RATIO = np.float32(0.2)
+PIPE_WIDTH_RATIO = np.float32(0.15)
+BIRD_RADIUS_RATIO = np.float32(0.025)
+GAP_HEIGHT_RATIO = np.float32(0.28)
+PIPE_SPEED_RATIO = np.float32(0.006)
+FLAP_VEL = np.float32(0.02)
+GRAVITY = np.float32(0.0018)
+PIPE_SPACING_RATIO = np.float32(0.45)
+MIN_PIPE_SPACING_RATIO = (np.float32(1.0) + PIPE_WIDTH_RATIO) / np.float32(MAX_PIPES)
+
+F32 = np.float32
+U32 = np.uint32
+
+
+def seed_rng(seeds):
+    """seed_rng of flappy.h over an array of seeds (taken mod 2**32)."""
+    z = (np.asarray(seeds, dtype=np.int64) & 0xFFFFFFFF).astype(U32) + U32(0x9E3779B9)
+    z = (z ^ (z >> U32(16))) * U32(0x85EBCA6B)
+    z = (z ^ (z >> U32(13))) * U32(0xC2B2AE35)
+    z ^= z >> U32(16)
+    return np.where(z == 0, U32(0x6D2B79F5), z)
+
+
+def xorshift32(x):
+    """Next state (= draw) of an array of xorshift32 states."""
+    x = x ^ (x << U32(13))
+    x = x ^ (x >> U32(17))
+    return x ^ (x << U32(5))
+
+
+def pipe_count(width, pipe_spacing):
+    span = F32(width) * (F32(1.0) + PIPE_WIDTH_RATIO)
+    return int(min(max(np.ceil(span / (F32(width) * F32(pipe_spacing))), 1), MAX_PIPES))
+
+
+def sample_gap_center(rng, d):
+    """(gaps, rng) for sample_gap_center of flappy.h at difficulties d, per state of rng.
+
+    Every branch is computed and each env keeps the state after the
+    number of draws its branch makes (1, 2 or 3), so streams stay exact.
+    """
+    d = np.asarray(d, dtype=F32)
+    half_range = np.where(d < F32(0.25), d, F32(0.25))
+    gap_min = F32(0.5) - half_range
+    gap_max = F32(0.5) + half_range
+    peak_d = F32(0.55)
+    rising = (d - F32(0.25)) / (peak_d - F32(0.25))
+    falling = F32(1.0) - (d - peak_d) / (F32(0.85) - peak_d)
+    t = np.where(d <= peak_d, rising, falling)
+    extreme_prob = np.where((d > F32(0.25)) & (d < F32(0.85)), t * F32(0.45), F32(0.0))
+
+    x1 = xorshift32(rng)
+    x2 = xorshift32(x1)
+    x3 = xorshift32(x2)
+    r = (x1 % U32(1000)).astype(F32) / F32(1000.0)
+    extreme = r < extreme_prob
+    band = np.where(x2 % U32(2) == 0, F32(0.25), F32(0.65))
+    extreme_gap = band + (x3 % U32(11)).astype(F32) / F32(100.0)
+    steps = ((gap_max - gap_min) * F32(100.0) + F32(0.5)).astype(np.int32)
+    uniform_gap = gap_min + (x2 % (np.maximum(steps, 0) + 1).astype(U32)).astype(F32) / F32(100.0)
+    gaps = np.where(extreme, extreme_gap, np.where(steps <= 0, F32(0.5), uniform_gap))
+    rng = np.where(extreme, x3, np.where(steps <= 0, x1, x2))
+    return gaps.astype(F32), rng
+
+
+def difficulty_bucket(d, buckets):
+    return (np.clip(np.asarray(d, dtype=F32), F32(0.0), F32(1.0)) * F32(buckets - 1) + F32(0.5)).astype(np.int64)
+
+
+def sample_gap_table(table, rng, d):
+    """(gaps, rng) for sample_gap_table of flappy.h: two draws per env."""
+    values, prob, alias = table
+    row = difficulty_bucket(d, values.shape[0])
+    x1 = xorshift32(rng)
+    x2 = xorshift32(x1)
+    k = ((x1.astype(np.uint64) * np.uint64(values.shape[1])) >> np.uint64(32)).astype(np.int64)
+    u = (x2 >> U32(8)).astype(F32) * F32(1.0 / 16777216.0)
+    gaps = np.where(u < prob[row, k], values[row, k], values[row, alias[row, k]])
+    return gaps, x2
+
+
+def sample_course(seed, difficulty, length):
+    """binding.sample_course in NumPy: the first length gaps an env seeded with seed spawns."""
+    rng = seed_rng([seed])
+    d = np.full(1, difficulty, dtype=F32)
+    out = np.empty(length, dtype=F32)
+    for k in range(length):
+        gap, rng = sample_gap_center(rng, d)
+        out[k] = gap[0]
+    return out
+
+
+class FlappyNumpy:
+    """N Flappy v3 envs as (num_pipes, num_envs) pipe arrays and per-env arrays, like FlappyBatch."""
+
+    def __init__(
+        self,
+        observations,
+        actions,
+        rewards,
+        terminals,
+        truncations,
+        num_envs,
+        seed,
+        width,
+        height,
+        max_steps=5000,
+        frame_skip=1,
+        obs_stack=1,
+        restart_prob=0.0,
+        restart_lag=30,
+        difficulty=None,
+        course_bank=None,
+        gap_values=None,
+        gap_prob=None,
+        gap_alias=None,
+        episodes=None,
+        episode_count=None,
+        gravity=None,
+        flap_velocity=None,
+        pipe_speed_ratio=None,
+        pipe_spacing_ratio=None,
+        gap_height_ratio=None,
+        bird_radius_ratio=None,
+    ):
+        if num_envs <= 0:
+            raise ValueError("num_envs must be greater than 0")
+        if frame_skip != 1:
+            raise ValueError("frame_skip is only supported by the struct engine")
+        if obs_stack != 1:
+            raise ValueError("obs_stack is only supported by the struct engine")
+        if restart_prob:
+            raise ValueError("restart_prob is only supported by the struct engine")
+        physics = dict(
+            gravity=(gravity, GRAVITY),
+            flap_velocity=(flap_velocity, FLAP_VEL),
+            pipe_speed_ratio=(pipe_speed_ratio, PIPE_SPEED_RATIO),
+            pipe_spacing_ratio=(pipe_spacing_ratio, PIPE_SPACING_RATIO),
+            gap_height_ratio=(gap_height_ratio, GAP_HEIGHT_RATIO),
+            bird_radius_ratio=(bird_radius_ratio, BIRD_RADIUS_RATIO),
+        )
+        for key, (value, _) in physics.items():
+            if value is not None and np.ndim(value) != 0:
+                raise ValueError(f"per-env {key} arrays are only supported by the struct engine")
+        physics = {key: F32(default if value is None else value) for key, (value, default) in physics.items()}
+        if physics["pipe_speed_ratio"] <= 0 or physics["gap_height_ratio"] <= 0 or physics["bird_radius_ratio"] < 0:
+            raise ValueError("pipe_speed_ratio and gap_height_ratio must be > 0, bird_radius_ratio >= 0")
+        if physics["pipe_spacing_ratio"] < MIN_PIPE_SPACING_RATIO:
+            raise ValueError(
+                f"pipe_spacing_ratio must be >= {MIN_PIPE_SPACING_RATIO:g} (MAX_PIPES pipes must span the screen)"
+            )
+
+        self.obs = observations.reshape(num_envs, OBS_DIM)
+        if not np.shares_memory(self.obs, observations):
+            raise ValueError("observations must be a contiguous buffer of num_envs * OBS_DIM floats")
+        self.actions = actions
+        self.rewards = rewards
+        self.terminals = terminals
+        self.num_envs = num_envs
+        self.width = F32(width)
+        self.height = F32(height)
+        self.max_steps = max_steps if max_steps > 0 else 5000
+        self.gravity = physics["gravity"]
+        self.flap_velocity = physics["flap_velocity"]
+        self.pipe_spacing = physics["pipe_spacing_ratio"]
+        self.gap_height = physics["gap_height_ratio"]
+        self.bird_radius_ratio = physics["bird_radius_ratio"]
+        self.pipe_speed = self.width * physics["pipe_speed_ratio"]
+        self.num_pipes = pipe_count(width, self.pipe_spacing)
+
+        n, p = num_envs, self.num_pipes
+        self.bird_y = np.zeros(n, dtype=F32)
+        self.bird_vy = np.zeros(n, dtype=F32)
+        self.score = np.zeros(n, dtype=np.int32)
+        self.step_count = np.zeros(n, dtype=np.int32)
+        self.episode_return = np.zeros(n, dtype=F32)  # this episode's, for its record
+        self.log_return = np.zeros(n, dtype=F32)  # live Log.episode_return, cleared by log()
+        self.episode_seed = np.zeros(n, dtype=U32)
+        self.pipe_x = np.zeros((p, n), dtype=F32)
+        self.pipe_gap = np.zeros((p, n), dtype=F32)
+        self.pipe_scored = np.zeros((p, n), dtype=bool)
+        self.pipe_head = np.zeros(n, dtype=np.int64)
+        # Per-env Log of flappy.h (last episode's values, episode count)
+        self.logs = {key: np.zeros(n, dtype=F32) for key in ("perf", "score", "episode_length", "difficulty", "agent_steps", "n")}
+
+        # Each episode keeps the difficulty it started with; new values
+        # (shared array or pushed by step) apply from the next reset
+        self.difficulty = np.zeros(n, dtype=F32)
+        self.next_difficulty = np.zeros(n, dtype=F32)
+        self.difficulty_src = None
+        if difficulty is not None:
+            if len(difficulty) < n:
+                raise ValueError("difficulty array is too small for num_envs")
+            self.difficulty_src = difficulty[:n]
+
+        self.gap_table = None
+        if gap_values is not None:
+            self.gap_table = (np.asarray(gap_values, F32), np.asarray(gap_prob, F32), np.asarray(gap_alias, np.int64))
+            if self.gap_table[0].ndim != 2 or any(t.shape != self.gap_table[0].shape for t in self.gap_table):
+                raise ValueError("gap_values, gap_prob and gap_alias must be 2D arrays of the same shape")
+        self.bank = None
+        self.course = np.full(n, -1, dtype=np.int64)  # row of bank_rows, -1 = sample
+        self.course_pos = np.zeros(n, dtype=np.int64)
+        if course_bank is not None:
+            if course_bank.ndim != 3 or course_bank.dtype != F32:
+                raise ValueError("course_bank must be a 3D float32 array")
+            self.bank = course_bank
+            self.bank_rows = course_bank.reshape(-1, course_bank.shape[2])
+        self.episodes = episodes
+        self.episode_count = episode_count
+        if (episodes is None) != (episode_count is None):
+            raise TypeError("episodes and episode_count must both be NumPy arrays")
+        if episode_count is not None and len(episode_count) < 2:
+            raise ValueError("episode_count must be a contiguous int64 array of 2 counters")
+
+        self.rng = seed_rng(np.arange(n, dtype=np.int64) + np.int64(seed) * n)
+
+    def reset(self, seed, difficulty=0.0):
+        self.rng = seed_rng(np.arange(self.num_envs, dtype=np.int64) + np.int64(seed) * self.num_envs)
+        self._reset_envs(np.arange(self.num_envs), F32(difficulty))
+        self._observe()
+
+    def reset_envs(self, env_ids, seeds, difficulty=0.0):
+        env_ids = np.asarray(env_ids, dtype=np.int64)
+        if len(env_ids) != len(seeds):
+            raise ValueError("env_ids and seeds must have the same length")
+        if len(env_ids) and (env_ids.min() < 0 or env_ids.max() >= self.num_envs):
+            raise IndexError(f"env id out of range for {self.num_envs} envs")
+        # One env at a time, as batch_reset_envs, so a repeated id keeps its last seed
+        for i, seed in zip(env_ids, seeds):
+            self.rng[i] = seed_rng([seed])[0]
+            self._reset_envs(np.array([i]), F32(difficulty))
+        self._observe()
+
+    def step(self, difficulty=None):
+        if difficulty is not None and self.difficulty_src is None:
+            self.next_difficulty[:] = difficulty
+        height = self.height
+        bx_px = self.width * BIRD_X_RATIO
+        br = height * self.bird_radius_ratio
+        pw = self.width * PIPE_WIDTH_RATIO
+        half_gap = self.gap_height * height * F32(0.5)
+
+        # Physics
+        vy = np.where(self.actions == 1, -self.flap_velocity, self.bird_vy) + self.gravity
+        self.bird_vy[:] = vy
+        np.clip(self.bird_y + vy, F32(0.0), F32(1.0), out=self.bird_y)
+        self.step_count += 1
+
+        # Collision: ceiling / floor, then every pipe slot (no early exit)
+        by = self.bird_y * height
+        done = (by - br <= F32(0.0)) | (by + br >= height)
+        px = self.pipe_x
+        overlap = ~((px + pw < bx_px - br) | (px > bx_px + br))
+        gap_c = self.pipe_gap * height
+        hit = overlap & ((by - br < gap_c - half_gap) | (by + br > gap_c + half_gap))
+        done |= hit.any(axis=0)
+        alive = ~done
+
+        # Deaths: -1 and no scoring or movement; survivors score and move
+        passed = alive & ~self.pipe_scored & (px + pw < bx_px)
+        self.pipe_scored |= passed
+        gained = passed.sum(axis=0, dtype=np.int32)
+        self.score += gained
+        self.rewards[:] = np.where(done, F32(-1.0), gained.astype(F32))
+        self.terminals[:] = done
+        np.subtract(px, self.pipe_speed, out=px, where=alive)
+        recycle = alive & (px + pw < F32(0.0)).any(axis=0)
+
+        # Episode return and truncation
+        self.episode_return += self.rewards
+        self.log_return += self.rewards
+        truncated = alive & (self.step_count >= self.max_steps)
+        self.terminals[:] |= truncated
+
+        # Recycle the head behind the tail, then log and reset finished envs
+        ids = np.flatnonzero(recycle)
+        if len(ids):
+            head = self.pipe_head[ids]
+            tail = np.where(head == 0, self.num_pipes - 1, head - 1)
+            px[head, ids] = px[tail, ids] + self.width * self.pipe_spacing
+            self.pipe_gap[head, ids] = self._gap(ids, self.difficulty[ids])
+            self.pipe_scored[head, ids] = False
+            self.pipe_head[ids] = np.where(head + 1 < self.num_pipes, head + 1, 0)
+        ids = np.flatnonzero(done | truncated)
+        if len(ids):
+            self._add_log(ids)
+            self._reset_envs(ids, self.next_difficulty[ids])
+        self._observe()
+
+    def log(self):
+        """batch_log: means of the per-env logs (with the live episode return, which it zeroes) and n."""
+        logs = self.logs
+        n = logs["n"].sum(dtype=F32)
+        aggregate = {
+            "perf": logs["perf"].sum(dtype=F32),
+            "score": logs["score"].sum(dtype=F32),
+            "episode_return": self.log_return.sum(dtype=F32),
+            "episode_length": logs["episode_length"].sum(dtype=F32),
+            "difficulty": logs["difficulty"].sum(dtype=F32),
+            "agent_steps": logs["agent_steps"].sum(dtype=F32),
+        }
+        self.log_return[:] = 0.0
+        for value in logs.values():
+            value[:] = 0.0
+        if n == 0:
+            return {}
+        out = {key: float(value / n) for key, value in aggregate.items()}
+        out["n"] = float(n)
+        return out
+
+    def close(self):
+        pass
+
+    def _gap(self, ids, difficulty):
+        """Next gap for envs ids: from their bank course while it lasts, else sampled."""
+        gaps = np.empty(len(ids), dtype=F32)
+        sample = np.ones(len(ids), dtype=bool)
+        if self.bank is not None:
+            course, pos = self.course[ids], self.course_pos[ids]
+            take = (course >= 0) & (pos < self.bank.shape[2])
+            gaps[take] = self.bank_rows[course[take], pos[take]]
+            self.course_pos[ids[take]] += 1
+            sample = ~take
+        if sample.any():
+            sids = ids[sample]
+            if self.gap_table is not None:
+                gaps[sample], self.rng[sids] = sample_gap_table(self.gap_table, self.rng[sids], difficulty[sample])
+            else:
+                gaps[sample], self.rng[sids] = sample_gap_center(self.rng[sids], difficulty[sample])
+        return gaps
+
+    def _reset_envs(self, ids, difficulty):
+        """batch_reset_env for envs ids (without observations)."""
+        if self.difficulty_src is not None:
+            difficulty = self.difficulty_src[ids]
+        self.difficulty[ids] = difficulty
+        self.next_difficulty[ids] = difficulty
+        difficulty = self.difficulty[ids]
+        self.episode_return[ids] = 0.0
+        self.log_return[ids] = 0.0
+        self.bird_y[ids] = 0.5
+        self.bird_vy[ids] = 0.0
+        self.score[ids] = 0
+        self.step_count[ids] = 0
+        self.episode_seed[ids] = self.rng[ids]
+        self.pipe_head[ids] = 0
+        self.course_pos[ids] = 0
+        if self.bank is not None:
+            buckets, courses = self.bank.shape[:2]
+            draw = xorshift32(self.rng[ids])
+            self.rng[ids] = draw
+            self.course[ids] = difficulty_bucket(difficulty, buckets) * courses + (draw % U32(courses))
+        start_x = self.width * F32(0.5)
+        for p in range(self.num_pipes):
+            self.pipe_x[p, ids] = start_x + F32(p) * self.width * self.pipe_spacing
+            self.pipe_gap[p, ids] = self._gap(ids, difficulty)
+            self.pipe_scored[p, ids] = False
+
+    def _add_log(self, ids):
+        score = self.score[ids].astype(F32)
+        length = self.step_count[ids].astype(F32)
+        self.logs["perf"][ids] = score > 0
+        self.logs["score"][ids] = score
+        self.logs["episode_length"][ids] = length
+        self.logs["difficulty"][ids] = self.difficulty[ids]
+        self.logs["agent_steps"][ids] = length  # no frame skip
+        self.logs["n"][ids] += 1.0
+        if self.episodes is not None:
+            start = int(self.episode_count[1])
+            self.episode_count[1] = start + len(ids)
+            slots = np.arange(start, start + len(ids)) % len(self.episodes)
+            self.episodes["score"][slots] = score
+            self.episodes["episode_return"][slots] = self.episode_return[ids]
+            self.episodes["episode_length"][slots] = length
+            self.episodes["difficulty"][slots] = self.difficulty[ids]
+            self.episodes["env_id"][slots] = ids
+            self.episodes["seed"][slots] = self.episode_seed[ids]
+            self.episodes["restarted"][slots] = 0
+            self.episode_count[0] = start + len(ids)  # published once written
+
+    def _observe(self):
+        """batch_observations: nearest pipe ahead of the bird (lowest x, first slot on ties)."""
+        bird_x = self.width * BIRD_X_RATIO
+        pw = self.width * PIPE_WIDTH_RATIO
+        ahead = np.where(self.pipe_x + pw > bird_x, self.pipe_x, F32(1e9))
+        slot = ahead.argmin(axis=0)
+        cols = np.arange(self.num_envs)
+        next_x = ahead[slot, cols]
+        found = next_x < F32(1e9)
+        o = self.obs
+        np.clip(self.bird_y, F32(0.0), F32(1.0), out=o[:, 0])
+        np.clip(self.bird_vy / F32(0.1), F32(-1.0), F32(1.0), out=o[:, 1])
+        o[:, 2] = np.where(found, np.clip((next_x - bird_x) / self.width, F32(0.0), F32(1.0)), F32(1.0))
+        o[:, 3] = np.where(found, self.pipe_gap[slot, cols], F32(0.5))
+        o[:, 4] = self.gap_height
@@ -0,0 +1,255 @@
+"""
+Parity harness: C engines vs the NumPy engine (numpy_engine.py).
+
+0. Constants: the flappy.h #defines the binding exports must equal the
+   NumPy engine's copies.
+1. Gap sampler: numpy_engine.sample_course must return the same float32
+   gaps as binding.sample_course for every seed and difficulty.
+2. Trajectories: FlappyCurriculum(engine=C) and FlappyCurriculum(engine=
+   "numpy") get the same seed, per-env difficulties spread over [0, 1] and
+   the same seeded action stream (a noisy gap-following controller, so
+   episodes last and score). Halfway through, the difficulties are reversed
+   in place, so each engine must hold a running episode's difficulty and
+   apply the new one from its next episode. Each step the observations must match within
+   --atol and rewards and terminals exactly; logs within --rtol. Every run
+   is repeated with a course bank from make_courses, so both engines are
+   also fed the identical gap sequences explicitly.
+3. Restarts (struct only): every death-state restart must start from the
+   state restart_lag agent steps before a death, or from the start of a
+   shorter life.
+4. Episode records: on each engine, with the log read every few steps,
+   every record's episode_return must be the rewards summed over its
+   episode.
+
+The first mismatch is reported (engine, step, env, buffer, both values) and
+the exit status is 1. --bench adds steps/sec of each engine.
+
+Run from repo root (the C checks need the built binding):
+  uv run python -m variations.flappyv3.parity
+  uv run python -m variations.flappyv3.parity --engines batch struct --num-envs 1024 --steps 20000 --bench
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from . import binding
+from .course_bank import make_courses
+from .curriculum import FlappyCurriculum
+from . import numpy_engine
+from .numpy_engine import sample_course
+from .scheduler import EpisodeStream, shared_episode_buffers
+
+RESTART_STATES = 32  # flappy.h
+
+
+def check_constants():
+    """flappy.h constants (binding.constants) whose numpy_engine copy differs."""
+    return [name for name, value in binding.constants().items() if getattr(numpy_engine, name.upper()) != value]
+
+
+def check_gaps(seeds=256, length=64):
+    """First (seed, difficulty, index) where the NumPy gap sampler differs from C, or None."""
+    for difficulty in np.linspace(0.0, 1.0, 41):
+        for seed in range(seeds):
+            c_gaps = binding.sample_course(seed, float(difficulty), length)
+            np_gaps = sample_course(seed, float(difficulty), length)
+            if not np.array_equal(c_gaps, np_gaps):
+                return seed, float(difficulty), int(np.flatnonzero(c_gaps != np_gaps)[0])
+    return None
+
+
+def make_env(engine, difficulty, seed, max_steps, course_bank=None):
+    num_envs = len(difficulty)
+    env = FlappyCurriculum(
+        num_envs=num_envs,
+        seed=seed,
+        max_steps=max_steps,
+        engine=engine,
+        curriculum_difficulty_array=difficulty,
+        course_bank=course_bank,
+    )
+    env.reset(seed)
+    return env
+
+
+def policy(obs, rng, noise):
+    """Flap when below the gap and falling, with a share noise of actions flipped."""
+    actions = ((obs[:, 0] > obs[:, 3] + 0.04) & (obs[:, 1] > 0.0)).astype(np.int32)
+    flip = rng.random(len(actions)) < noise
+    actions[flip] = 1 - actions[flip]
+    return actions
+
+
+def compare(engine, num_envs, steps, seed, max_steps, atol, rtol, course_bank=None):
+    """First mismatch between engine and the NumPy engine as a message, or None."""
+    c_difficulty = np.linspace(0.0, 1.0, num_envs, dtype=np.float32)
+    np_difficulty = c_difficulty.copy()
+    c_env = make_env(engine, c_difficulty, seed, max_steps, course_bank)
+    np_env = make_env("numpy", np_difficulty, seed, max_steps, course_bank)
+    rng = np.random.default_rng(seed)
+    try:
+        if not np.allclose(c_env.observations, np_env.observations, rtol=0.0, atol=atol):
+            return "observations differ after reset"
+        for t in range(steps):
+            if t == steps // 2:
+                c_difficulty[:] = c_difficulty[::-1].copy()
+                np_difficulty[:] = np_difficulty[::-1].copy()
+            actions = policy(c_env.observations, rng, noise=0.01)
+            c_obs, c_rew, c_term, _, c_info = c_env.step(actions)
+            np_obs, np_rew, np_term, _, np_info = np_env.step(actions)
+            for name, a, b, tol in (
+                ("observations", c_obs, np_obs, atol),
+                ("rewards", c_rew, np_rew, 0.0),
+                ("terminals", c_term, np_term, 0.0),
+            ):
+                bad = np.abs(a.astype(np.float64) - b) > tol
+                if bad.any():
+                    env_id = int(np.argwhere(bad)[0][0])
+                    return f"step {t} env {env_id}: {name} {a[env_id]} (C) vs {b[env_id]} (NumPy)"
+            for c_log, np_log in zip(c_info, np_info):
+                if c_log.keys() != np_log.keys() or not all(np.isclose(c_log[k], np_log[k], rtol=rtol) for k in c_log):
+                    return f"step {t}: log {c_log} (C) vs {np_log} (NumPy)"
+    finally:
+        c_env.close()
+        np_env.close()
+    return None
+
+
+def check_restarts(steps=20000, lag=30, seed=0):
+    """First death-state restart that does not start lag agent steps before a death, or None.
+
+    One struct env with restart_prob=1 and frame_skip=1 (agent steps =
+    frames): a life that starts at step s0 and dies at step a saves its state
+    from step max(s0, a - lag), and every restarted life must start from one
+    of the last RESTART_STATES saves. A life's start is its record's
+    episode_length minus the steps counted here.
+    """
+    env = FlappyCurriculum(num_envs=1, seed=seed, engine="struct", restart_prob=1.0, restart_lag=lag,
+                           episode_buffer_size=64)
+    env.reset(seed)
+    rng = np.random.default_rng(seed)
+    saved, life_steps = [], 0
+    try:
+        for t in range(steps):
+            _, rewards, terminals, _, _ = env.step(policy(env.observations, rng, noise=0.05))
+            life_steps += 1
+            if not terminals[0]:
+                continue
+            (record,) = env.drain_episodes()
+            end = int(record["episode_length"])
+            start = end - life_steps
+            if record["restarted"] and start not in saved[-RESTART_STATES:]:
+                return f"step {t}: restarted from agent step {start}, saved {saved[-RESTART_STATES:]}"
+            if rewards[0] < 0.0:
+                saved.append(max(start, end - lag))
+            life_steps = 0
+    finally:
+        env.close()
+    return None
+
+
+def check_records(engine, num_envs=64, steps=5000, seed=0, log_interval=16):
+    """First episode record whose return is not its summed rewards, or None.
+
+    Records go to a shared episode buffer, so step() keeps calling the log
+    every log_interval steps, which clears the Log's running return.
+    """
+    buffers = shared_episode_buffers(1, 4 * num_envs)
+    stream = EpisodeStream(buffers)
+    difficulty = np.linspace(0.0, 1.0, num_envs, dtype=np.float32)
+    env = FlappyCurriculum(num_envs=num_envs, seed=seed, engine=engine, curriculum_difficulty_array=difficulty,
+                           log_interval=log_interval, shared_episodes=buffers[0])
+    env.reset(seed)
+    rng = np.random.default_rng(seed)
+    returns = np.zeros(num_envs, dtype=np.float32)
+    try:
+        for t in range(steps):
+            _, rewards, terminals, _, _ = env.step(policy(env.observations, rng, noise=0.01))
+            returns += rewards
+            ended = np.flatnonzero(terminals)
+            records = np.sort(stream.read(), order="env_id")
+            if not np.array_equal(records["env_id"], ended):
+                return f"step {t}: records for envs {records['env_id']}, episodes ended in {ended}"
+            bad = np.flatnonzero(records["episode_return"] != returns[ended])
+            if len(bad):
+                i = ended[bad[0]]
+                return f"step {t} env {i}: record return {records['episode_return'][bad[0]]}, rewards sum {returns[i]}"
+            returns[ended] = 0.0
+    finally:
+        env.close()
+    return None
+
+
+def bench(engine, num_envs, seconds=2.0, seed=0):
+    """Env steps/sec of engine with random actions at difficulty 1."""
+    env = FlappyCurriculum(num_envs=num_envs, seed=seed, engine=engine)
+    env.reset(seed)
+    actions = (np.random.default_rng(seed).random((64, num_envs)) < 0.08).astype(np.int32)
+    steps = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for k in range(64):
+            env.step(actions[k])
+        steps += 64
+    elapsed = time.perf_counter() - start
+    env.close()
+    return steps * num_envs / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the NumPy Flappy v3 engine against the C engines")
+    parser.add_argument("--engines", nargs="+", choices=("struct", "batch"), default=["batch", "struct"])
+    parser.add_argument("--num-envs", type=int, default=256)
+    parser.add_argument("--steps", type=int, default=5000)
+    parser.add_argument("--max-steps", type=int, default=1000, help="Episode cap, low so truncations are tested")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--atol", type=float, default=1e-5, help="Absolute tolerance on observations")
+    parser.add_argument("--rtol", type=float, default=1e-5, help="Relative tolerance on log means")
+    parser.add_argument("--bench", action="store_true", help="Also report steps/sec per engine")
+    parser.add_argument("--bench-envs", type=int, default=16384)
+    args = parser.parse_args()
+
+    if binding is None:
+        sys.exit("The C extension is not built: cd variations/flappyv3 && make")
+    ok = True
+    constant_mismatch = check_constants()
+    print(f"constants: {'FAIL ' + ', '.join(constant_mismatch) if constant_mismatch else 'OK'}")
+    ok = ok and not constant_mismatch
+    gap_mismatch = check_gaps()
+    if gap_mismatch:
+        seed, difficulty, index = gap_mismatch
+        print(f"gaps: FAIL (seed {seed}, difficulty {difficulty:.3f}, gap {index})")
+        ok = False
+    else:
+        print("gaps: OK")
+
+    restart_mismatch = check_restarts()
+    print(f"restarts: {'FAIL ' + restart_mismatch if restart_mismatch else 'OK'}")
+    ok = ok and restart_mismatch is None
+
+    for engine in (*args.engines, "numpy"):
+        record_mismatch = check_records(engine)
+        print(f"{engine} episode records: {'FAIL ' + record_mismatch if record_mismatch else 'OK'}")
+        ok = ok and record_mismatch is None
+
+    bank = np.stack([make_courses(args.seed + b * 64 + np.arange(64), b / 10) for b in range(11)])
+    for engine in args.engines:
+        for label, course_bank in (("sampled gaps", None), ("course bank", bank)):
+            mismatch = compare(
+                engine, args.num_envs, args.steps, args.seed, args.max_steps, args.atol, args.rtol, course_bank
+            )
+            print(f"{engine} vs numpy, {label}: {'FAIL ' + mismatch if mismatch else 'OK'}")
+            ok = ok and mismatch is None
+
+    if args.bench:
+        for engine in (*args.engines, "numpy"):
+            sps = bench(engine, args.bench_envs)
+            print(f"  {engine:>6} | {args.bench_envs} envs | {sps / 1e6:8.2f} M steps/s")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,9 +7,15 @@ Run from repo root:
   uv run python -m variations.flappyv3.run_eval
   uv run python -m variations.flappyv3.run_eval --model variations/flappyv3/experiments/<run_id>/model_009765.pt
   uv run python -m variations.flappyv3.run_eval --episodes 50 --no-render
+  uv run python -m variations.flappyv3.run_eval --episodes 1000 --no-render --num-envs 256
   uv run python -m variations.flappyv3.run_eval --difficulty 1.0
 
 Actions are always argmax (greedy). Press ESC in the game window to exit when rendering.
+Headless --episodes runs up to --num-envs episodes in lockstep (evaluate.py);
+episode ep is seeded with seed + ep, as in the interactive loop. Episode
+results are cached in experiments/eval_cache.sqlite (shared with
+eval_last_checkpoints; --no-cache to bypass), so repeat runs only play
+episodes not seen before.
 """
 import argparse
 import glob
@@ -22,8 +28,10 @@ import torch
 import pufferlib.vector
 import pufferlib.pytorch
 
+from flappy_rl.eval_cache import EvalCache, cached_episodes
 from variations.flappyv3 import curriculum_env_creator
-from variations.flappyv3.train import make_flappyv3_lstm_policy
+from variations.flappyv3.evaluate import CACHE_PATH, VARIANT, cache_config, checkpoint_policy, load_policy, make_eval_env, run_episodes
+from variations.flappyv3.train import make_flappyv3_policy
 
 FPS = 60
 EXPERIMENTS_DIR = os.path.join(os.path.dirname(__file__), "experiments")
@@ -45,27 +53,6 @@ def _init_state(policy, batch, device):
     }
 
 
-def run_episode(vecenv, policy, device, seed=None):
-    """Run one episode; return (pipes_passed, episode_length). Uses argmax (greedy)."""
-    obs, _ = vecenv.reset(seed=seed)
-    state = _init_state(policy, vecenv.num_agents, device)
-    steps = 0
-    pipes_passed = 0
-    with torch.no_grad():
-        while True:
-            ob = torch.as_tensor(obs).to(device)
-            logits, _ = policy.forward_eval(ob, state)
-            action = logits.argmax(dim=-1).cpu().numpy().reshape(vecenv.action_space.shape)
-            obs, rewards, terms, truncs, info = vecenv.step(action)
-            r = float(rewards.flat[0])
-            if r >= 1.0:
-                pipes_passed += 1
-            steps += 1
-            if terms.any() or truncs.any():
-                break
-    return pipes_passed, steps
-
-
 def main():
     parser = argparse.ArgumentParser(description="Eval Flappy v3 policy")
     parser.add_argument(
@@ -92,6 +79,14 @@ def main():
         action="store_true",
         help="Run headless (use with --episodes for numerical eval)",
     )
+    parser.add_argument(
+        "--num-envs",
+        type=int,
+        default=256,
+        help="Envs stepped in lockstep for headless --episodes (1 = one episode at a time)",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Ignore and do not update the eval cache")
+    parser.add_argument("--cache", type=str, default=CACHE_PATH, help="Eval cache file (SQLite)")
     parser.add_argument(
         "--difficulty",
         type=float,
@@ -109,10 +104,38 @@ def main():
         print("No checkpoint found. Train first or pass --model path/to/model_XXXXXX.pt")
         return
 
-    # Shared difficulty value — fixed for eval (not ramped)
-    difficulty_value = multiprocessing.Value("f", args.difficulty)
     print(f"Eval difficulty: {args.difficulty:.2f}")
+    policy_type, obs_stack = checkpoint_policy(model_path)
 
+    if args.episodes > 0:
+        # Numerical eval: run N episodes, report pipes passed and length
+        env = make_eval_env(min(args.num_envs, args.episodes), args.difficulty, obs_stack=obs_stack)
+        policy = load_policy(make_flappyv3_policy(env, policy_type).to(args.device), model_path, args.device)
+        print(f"Checkpoint: {model_path}")
+        print(f"Policy params: {sum(p.numel() for p in policy.parameters()):,}")
+        cache = None if args.no_cache else EvalCache(args.cache)
+        config = cache_config(args.difficulty)
+        played = []
+
+        def evaluate(seeds):
+            played.append(len(seeds))
+            return run_episodes(env, policy, args.device, seeds)
+
+        start = time.perf_counter()
+        scores, lengths = cached_episodes(cache, model_path, VARIANT, config, args.seed + np.arange(args.episodes), evaluate)
+        elapsed = time.perf_counter() - start
+        env.close()
+        if cache is not None:
+            cache.close()
+            print(f"Played {sum(played)} new episodes, {args.episodes - sum(played)} from cache")
+        print(f"\n--- Results ({args.episodes} episodes, difficulty={args.difficulty:.2f}) ---")
+        print(f"Pipes passed — mean: {scores.mean():.2f}, std: {scores.std():.2f}, min: {scores.min()}, max: {scores.max()}")
+        print(f"Length       — mean: {lengths.mean():.1f}, std: {lengths.std():.1f}, min: {lengths.min()}, max: {lengths.max()}")
+        print(f"Eval time    — {elapsed:.2f}s ({env.num_agents} envs)")
+        return
+
+    # Shared difficulty value — fixed for eval (not ramped)
+    difficulty_value = multiprocessing.Value("f", args.difficulty)
     vecenv = pufferlib.vector.make(
         curriculum_env_creator,
         env_kwargs={
@@ -120,39 +143,18 @@ def main():
             "width": 400,
             "height": 600,
             "curriculum_difficulty_value": difficulty_value,
+            "obs_stack": obs_stack,
         },
         backend=pufferlib.vector.Serial,
         num_envs=1,
         seed=args.seed,
     )
     driver = vecenv.driver_env
-    policy = make_flappyv3_lstm_policy(driver).to(args.device)
-    state_dict = torch.load(model_path, map_location=args.device)
-    state_dict = {k.replace("module.", ""): v for k, v in state_dict.items()}
-    policy.load_state_dict(state_dict, strict=True)
-    policy.eval()
+    policy = load_policy(make_flappyv3_policy(driver, policy_type).to(args.device), model_path, args.device)
 
     print(f"Checkpoint: {model_path}")
     print(f"Policy params: {sum(p.numel() for p in policy.parameters()):,}")
 
-    if args.episodes > 0:
-        # Numerical eval: run N episodes, report pipes passed and length
-        scores = []
-        lengths = []
-        for ep in range(args.episodes):
-            pipes, length = run_episode(vecenv, policy, args.device, seed=args.seed + ep)
-            scores.append(pipes)
-            lengths.append(length)
-            if (ep + 1) % 10 == 0:
-                print(f"  [{ep+1}/{args.episodes}] last: {pipes} pipes, {length} steps")
-        vecenv.close()
-        scores = np.array(scores)
-        lengths = np.array(lengths)
-        print(f"\n--- Results ({args.episodes} episodes, difficulty={args.difficulty:.2f}) ---")
-        print(f"Pipes passed — mean: {scores.mean():.2f}, std: {scores.std():.2f}, min: {scores.min()}, max: {scores.max()}")
-        print(f"Length       — mean: {lengths.mean():.1f}, std: {lengths.std():.1f}, min: {lengths.min()}, max: {lengths.max()}")
-        return
-
     # Interactive render mode
     episode_num = 0
     obs, info = vecenv.reset(seed=args.seed + episode_num)
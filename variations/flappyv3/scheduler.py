@@ -0,0 +1,177 @@
+"""
+Adaptive difficulty scheduling for Flappy v3 from live episode results.
+
+The C envs of each FlappyCurriculum append finished episodes to a ring
+buffer in shared memory (shared_episode_buffers); the trainer reads them at
+epoch boundaries (EpisodeStream) without any IPC, so trainer.evaluate()
+never waits on it. LearningProgressScheduler bins the episodes by
+difficulty bucket, tracks per-bucket competence (mean score / success_score,
+capped at 1) with a fast and a slow EMA, and samples each env's next
+difficulty in proportion to
+
+  |fast - slow|            absolute learning progress (ALP-GMM style)
+  + frontier * 4 c (1 - c)   buckets near 50 % competence
+
+mixed with explore of uniform sampling; buckets never played get the
+highest priority. The new difficulties go straight into the shared
+difficulty array the C envs read at each reset: running episodes finish at
+the difficulty they started with, so every record is credited to the
+bucket it was actually played at.
+
+  stream = EpisodeStream(buffers)
+  scheduler = LearningProgressScheduler(difficulty_array)
+  ...each epoch:
+  records = stream.read()
+  scheduler.update(records)
+  scheduler.assign()
+
+TimeToTarget reports the wall-clock time until the mean score at the eval
+difficulty first reaches a target, for comparing schedules.
+"""
+
+import multiprocessing
+import time
+
+import numpy as np
+
+from .flappy import EPISODE_DTYPE, read_episodes
+
+
+def shared_episode_buffers(num_buffers: int, capacity: int):
+    """num_buffers (records, count) RawArray pairs, one per FlappyCurriculum(shared_episodes=...)."""
+    return [
+        (multiprocessing.RawArray("b", capacity * EPISODE_DTYPE.itemsize), multiprocessing.RawArray("q", 2))
+        for _ in range(num_buffers)
+    ]
+
+
+def episode_views(shared):
+    """(episodes, episode_count) NumPy views of one shared_episode_buffers pair."""
+    records, count = shared
+    return np.frombuffer(records, dtype=EPISODE_DTYPE), np.frombuffer(count, dtype=np.int64)
+
+
+class EpisodeStream:
+    """Reads the episodes written to shared episode buffers since the last read.
+
+    The C envs publish a record only once it is filled in, so every record
+    read is complete.
+    """
+
+    def __init__(self, buffers):
+        self.views = [episode_views(shared) for shared in buffers]
+        self.tails = [0] * len(self.views)
+        self.dropped = 0
+
+    def read(self):
+        chunks = []
+        for k, (episodes, count) in enumerate(self.views):
+            records, self.tails[k], dropped = read_episodes(episodes, count, self.tails[k])
+            self.dropped += dropped
+            chunks.append(records)
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=EPISODE_DTYPE)
+
+
+class LearningProgressScheduler:
+    """Per-env difficulty from per-bucket learning progress and competence."""
+
+    def __init__(
+        self,
+        difficulty_array,
+        buckets=11,
+        success_score=60.0,
+        fast_rate=0.3,
+        slow_rate=0.05,
+        frontier=0.1,
+        explore=0.2,
+        seed=0,
+    ):
+        if buckets < 2:
+            raise ValueError("the scheduler needs at least two difficulty buckets")
+        if not 0.0 <= explore <= 1.0:
+            raise ValueError(f"explore must be in [0, 1], got {explore}")
+        self.difficulty = np.frombuffer(difficulty_array, dtype=np.float32)
+        self.values = np.linspace(0.0, 1.0, buckets, dtype=np.float32)
+        self.success_score = float(success_score)
+        self.fast_rate = fast_rate
+        self.slow_rate = slow_rate
+        self.frontier = frontier
+        self.explore = explore
+        self.fast = np.zeros(buckets)
+        self.slow = np.zeros(buckets)
+        self.episodes = np.zeros(buckets, dtype=np.int64)
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, records):
+        """Fold a batch of EPISODE_DTYPE records (restarted episodes ignored) into the bucket EMAs."""
+        records = records[records["restarted"] == 0]
+        if len(records) == 0:
+            return
+        bucket = np.rint(records["difficulty"] * (len(self.values) - 1)).astype(np.int64)
+        bucket = np.clip(bucket, 0, len(self.values) - 1)
+        competence = np.minimum(records["score"] / self.success_score, 1.0)
+        n = np.bincount(bucket, minlength=len(self.values))
+        total = np.bincount(bucket, weights=competence, minlength=len(self.values))
+        for b in np.flatnonzero(n):
+            c = total[b] / n[b]
+            if self.episodes[b] == 0:
+                self.fast[b] = self.slow[b] = c
+            else:
+                self.fast[b] += self.fast_rate * (c - self.fast[b])
+                self.slow[b] += self.slow_rate * (c - self.slow[b])
+            self.episodes[b] += n[b]
+
+    def probabilities(self):
+        progress = np.abs(self.fast - self.slow)
+        priority = progress + self.frontier * 4.0 * self.fast * (1.0 - self.fast)
+        unseen = self.episodes == 0
+        if unseen.any():
+            priority = unseen.astype(np.float64)
+        if priority.sum() <= 0:
+            priority = np.ones(len(self.values))
+        return (1.0 - self.explore) * priority / priority.sum() + self.explore / len(self.values)
+
+    def assign(self):
+        """Sample a difficulty per env into the shared array; returns the probabilities used."""
+        probs = self.probabilities()
+        self.difficulty[:] = self.values[self.rng.choice(len(self.values), size=len(self.difficulty), p=probs)]
+        return probs
+
+    def summary(self):
+        """One line: competence (fast EMA) per bucket and the mean assigned difficulty."""
+        buckets = " ".join(f"{v:.2f}:{c:.2f}" for v, c, n in zip(self.values, self.fast, self.episodes) if n)
+        return f"mean difficulty {self.difficulty.mean():.2f} | competence {buckets}"
+
+
+class TimeToTarget:
+    """Wall-clock time until the mean score at difficulty first reaches target.
+
+    Mean over the last window fresh episodes played at difficulty (within
+    tolerance), so fixed and adaptive schedules are measured alike.
+    """
+
+    def __init__(self, target=60.0, difficulty=1.0, window=256, tolerance=1e-3):
+        self.target = target
+        self.difficulty = difficulty
+        self.tolerance = tolerance
+        self.window = window
+        self.scores = np.zeros(window, dtype=np.float32)
+        self.seen = 0
+        self.start = time.time()
+        self.reached = None  # (seconds, global_step) once reached
+        self.best = 0.0
+
+    def update(self, records, global_step):
+        """Returns (seconds, global_step) on the update the target is first reached, else None."""
+        keep = (records["restarted"] == 0) & (np.abs(records["difficulty"] - self.difficulty) <= self.tolerance)
+        for score in records["score"][keep]:
+            self.scores[self.seen % len(self.scores)] = score
+            self.seen += 1
+        if self.seen < len(self.scores):
+            return None
+        mean = float(self.scores.mean())
+        self.best = max(self.best, mean)
+        if self.reached is None and mean >= self.target:
+            self.reached = (time.time() - self.start, global_step)
+            return self.reached
+        return None
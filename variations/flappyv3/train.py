@@ -2,7 +2,7 @@
 Train Flappy v3 with Target-style policy/hyperparameters.
 
 Key differences from v2:
-- No curriculum ramp (fixed difficulty throughout training)
+- No curriculum ramp (fixed difficulty throughout training) unless --env.curriculum adaptive
 - No custom/manual LR schedule (uses PuffeRL defaults like Target)
 - LSTM policy (Default + LSTMWrapper), matching Target policy family
 - Outputs are isolated under variations/flappyv3/experiments/
@@ -19,12 +19,16 @@ import os
 import sys
 import math
 
+import numpy as np
 import torch
 import pufferlib.models
 import pufferlib.vector
 from pufferlib import pufferl
 
+from flappy_rl.autotune import autotune
 from variations.flappyv3 import curriculum_env_creator
+from variations.flappyv3.course_bank import MIN_PIPE_SPACING_RATIO
+from variations.flappyv3.scheduler import EpisodeStream, LearningProgressScheduler, TimeToTarget, shared_episode_buffers
 
 
 DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "experiments")
@@ -40,6 +44,109 @@ def make_flappyv3_lstm_policy(env, hidden_size=128, lstm_hidden_size=128):
     )
 
 
+def make_flappyv3_policy(env, policy_type="lstm", hidden_size=128):
+    """LSTM policy, or (policy_type="mlp") the bare feedforward Default policy for stacked observations."""
+    if policy_type == "mlp":
+        return pufferlib.models.Default(env, hidden_size=hidden_size)
+    return make_flappyv3_lstm_policy(env, hidden_size=hidden_size)
+
+
+# Smallest values the C envs accept (unpack_physics in binding.c): pipes must
+# move left, MAX_PIPES of them must span the screen, gaps must be open
+PHYSICS_FLOORS = {
+    "pipe_speed_ratio": float(np.finfo(np.float32).tiny),
+    "pipe_spacing_ratio": MIN_PIPE_SPACING_RATIO,
+    "gap_height_ratio": float(np.finfo(np.float32).tiny),
+    "bird_radius_ratio": 0.0,
+}
+
+
+def parse_physics(items):
+    """--env.physics items "key=value" or "key=lo:hi" -> {key: value or (lo, hi)}.
+
+    Ranges are clamped to PHYSICS_FLOORS, so every draw is accepted by the
+    C envs; fixed values out of bounds are left for them to reject.
+    """
+    physics = {}
+    for item in items or []:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise SystemExit(f"--env.physics expects key=value or key=lo:hi, got {item!r}")
+        key = key.replace("-", "_")
+        lo, sep, hi = value.partition(":")
+        if not sep:
+            physics[key] = float(value)
+            continue
+        floor = PHYSICS_FLOORS.get(key, -math.inf)
+        if float(hi) < floor:
+            raise SystemExit(f"--env.physics {key} range {value} lies below the smallest accepted value {floor:g}")
+        physics[key] = (max(float(lo), floor), float(hi))
+    return physics
+
+
+def sample_physics(physics, num_envs, rng):
+    return {
+        key: rng.uniform(*value, num_envs).astype(np.float32) if isinstance(value, tuple) else value
+        for key, value in physics.items()
+    }
+
+
+def make_vecenv(
+    vec_kwargs, vec_num_envs, env_num_envs, difficulty, engine, course_bank=None, gap_table=None, physics=None, frame_skip=1,
+    obs_stack=1, restart_prob=0.0, restart_lag=30, difficulty_array=None, episode_buffers=None,
+):
+    """vec_num_envs FlappyCurriculum objects of env_num_envs C envs each.
+
+    Fixed difficulty in one shared float per C env, mapped straight into the
+    envs (no lock, no per-step read). course_bank is a .npy path each env
+    memory-maps, so all workers share one copy. gap_table is an .npz of
+    alias tables (gap_table.py) replacing the built-in gap sampler.
+    physics maps PHYSICS_KEYS to a number, or to a (lo, hi) range drawn
+    uniformly per C env (domain randomization; env object i uses seed i).
+    frame_skip repeats each action for that many frames inside C; obs_stack
+    stacks that many past observations in C (for feedforward policies).
+    restart_prob > 0 restarts that share of episodes from restart_lag agent
+    steps before a recent death (unlogged) instead of a fresh start.
+    difficulty_array (one float per C env) and episode_buffers (one
+    shared_episode_buffers pair per env object) let the trainer read
+    episodes and set difficulties (scheduler.py); by default a private
+    array filled with difficulty and no buffers.
+    """
+    if difficulty_array is None:
+        difficulty_array = multiprocessing.RawArray("f", vec_num_envs * env_num_envs)
+        difficulty_array[:] = [float(difficulty)] * len(difficulty_array)
+    env_kwargs = [
+        {
+            "num_envs": env_num_envs,
+            "width": 400,
+            "height": 600,
+            "curriculum_difficulty_array": difficulty_array,
+            "difficulty_offset": i * env_num_envs,
+            "engine": engine,
+            "course_bank": course_bank,
+            "gap_table": gap_table,
+            "physics": sample_physics(physics or {}, env_num_envs, np.random.default_rng(i)),
+            "frame_skip": frame_skip,
+            "obs_stack": obs_stack,
+            "restart_prob": restart_prob,
+            "restart_lag": restart_lag,
+            "shared_episodes": episode_buffers[i] if episode_buffers else None,
+        }
+        for i in range(vec_num_envs)
+    ]
+    return pufferlib.vector.make(
+        [curriculum_env_creator] * vec_num_envs,
+        env_args=[[] for _ in range(vec_num_envs)],
+        env_kwargs=env_kwargs,
+        **{**vec_kwargs, "num_envs": vec_num_envs},
+    )
+
+
+def _strip_flag(flag):
+    while flag in sys.argv:
+        sys.argv.remove(flag)
+
+
 def _strip_arg(flag):
     if flag in sys.argv:
         i = sys.argv.index(flag)
@@ -55,6 +162,107 @@ def main():
     parser.add_argument("--train.learning-rate", type=float, default=None, dest="train_learning_rate")
     parser.add_argument("--train.output-dir", type=str, default=None, dest="train_output_dir")
     parser.add_argument("--env.fixed-difficulty", type=float, default=1.0, dest="env_fixed_difficulty")
+    parser.add_argument(
+        "--env.num-envs",
+        type=str,
+        default="auto",
+        dest="env_num_envs",
+        help="C envs per FlappyCurriculum (auto = all of a worker's agents; 1 = one Python env per agent)",
+    )
+    parser.add_argument(
+        "--env.engine",
+        choices=("struct", "batch", "numpy"),
+        default="struct",
+        dest="env_engine",
+        help="C struct or structure-of-arrays engine, or numpy (no C build needed; numpy_engine.py)",
+    )
+    parser.add_argument(
+        "--env.course-bank",
+        type=str,
+        default=None,
+        dest="env_course_bank",
+        help="Pre-generated pipe-course bank (.npy from variations.flappyv3.course_bank), memory-mapped by all workers",
+    )
+    parser.add_argument(
+        "--env.gap-table",
+        type=str,
+        default=None,
+        dest="env_gap_table",
+        help="Gap-center alias tables (.npz from variations.flappyv3.gap_table) instead of the built-in sampler",
+    )
+    parser.add_argument(
+        "--env.physics",
+        action="append",
+        default=None,
+        dest="env_physics",
+        metavar="KEY=VALUE|KEY=LO:HI",
+        help="Override a physics constant (gravity, flap_velocity, pipe_speed_ratio, pipe_spacing_ratio, "
+        "gap_height_ratio, bird_radius_ratio); LO:HI draws it per C env. Repeatable.",
+    )
+    parser.add_argument(
+        "--env.frame-skip",
+        type=int,
+        default=1,
+        dest="env_frame_skip",
+        help="Game frames per agent step, action repeated inside C (struct engine)",
+    )
+    parser.add_argument(
+        "--env.obs-stack",
+        type=int,
+        default=1,
+        dest="env_obs_stack",
+        help="Stack the last K observations in C (struct engine); pair with --policy.type mlp",
+    )
+    parser.add_argument(
+        "--env.restart-prob",
+        type=float,
+        default=0.0,
+        dest="env_restart_prob",
+        help="Share of auto-resets restarted from a pre-death state (struct engine; restarted episodes are not logged)",
+    )
+    parser.add_argument(
+        "--env.restart-lag",
+        type=int,
+        default=30,
+        dest="env_restart_lag",
+        help="Agent steps before a death to restart from",
+    )
+    parser.add_argument(
+        "--env.curriculum",
+        choices=("fixed", "adaptive"),
+        default="fixed",
+        dest="env_curriculum",
+        help="fixed: --env.fixed-difficulty throughout; adaptive: per-env difficulty from learning progress (scheduler.py)",
+    )
+    parser.add_argument(
+        "--env.curriculum-buckets",
+        type=int,
+        default=11,
+        dest="env_curriculum_buckets",
+        help="Difficulty buckets over [0, 1] for --env.curriculum adaptive",
+    )
+    parser.add_argument(
+        "--env.target-pipes",
+        type=float,
+        default=60.0,
+        dest="env_target_pipes",
+        help="Report wall-clock time until the mean score at the eval difficulty reaches this (and adaptive success score)",
+    )
+    parser.add_argument(
+        "--policy.type",
+        choices=("lstm", "mlp"),
+        default="lstm",
+        dest="policy_type",
+        help="lstm (LSTMWrapper, default) or mlp (feedforward Default, no BPTT state)",
+    )
+    parser.add_argument(
+        "--vec.autotune",
+        action="store_true",
+        dest="vec_autotune",
+        help="Probe num_workers / agents per worker / batching / torch threads; cached per host",
+    )
+    parser.add_argument("--vec.autotune-refresh", action="store_true", dest="vec_autotune_refresh")
+    parser.add_argument("--vec.autotune-seconds", type=float, default=5.0, dest="vec_autotune_seconds")
     known, _ = parser.parse_known_args()
 
     _strip_arg("--train.total-timesteps")
@@ -62,6 +270,24 @@ def main():
     _strip_arg("--train.learning-rate")
     _strip_arg("--train.output-dir")
     _strip_arg("--env.fixed-difficulty")
+    _strip_arg("--env.engine")
+    _strip_arg("--env.course-bank")
+    _strip_arg("--env.gap-table")
+    _strip_arg("--env.frame-skip")
+    _strip_arg("--env.obs-stack")
+    _strip_arg("--env.restart-prob")
+    _strip_arg("--env.restart-lag")
+    _strip_arg("--env.curriculum")
+    _strip_arg("--env.curriculum-buckets")
+    _strip_arg("--env.target-pipes")
+    _strip_arg("--policy.type")
+    while "--env.physics" in sys.argv:
+        _strip_arg("--env.physics")
+    physics = parse_physics(known.env_physics)
+    _strip_arg("--env.num-envs")
+    _strip_flag("--vec.autotune")
+    _strip_flag("--vec.autotune-refresh")
+    _strip_arg("--vec.autotune-seconds")
 
     args = pufferl.load_config("default")
     args["train"]["env"] = "flappyv3_targetlike"
@@ -72,7 +298,7 @@ def main():
     args["train"]["minibatch_size"] = 32768
     args["train"]["ent_coef"] = 0.02
     args["train"]["anneal_lr"] = True
-    args["train"]["use_rnn"] = True
+    args["train"]["use_rnn"] = known.policy_type == "lstm"
     args["train"]["data_dir"] = known.train_output_dir or DEFAULT_OUTPUT_DIR
     os.makedirs(args["train"]["data_dir"], exist_ok=True)
     print(f"[flappyv3] checkpoint dir: {args['train']['data_dir']}")
@@ -98,20 +324,79 @@ def main():
             f"batch_size ({required_envs * bptt}) >= minibatch_size ({minibatch})"
         )
 
-    # No curriculum in v3: keep difficulty fixed for the whole run.
-    difficulty_value = multiprocessing.Value("f", float(known.env_fixed_difficulty))
-    vecenv = pufferlib.vector.make(
-        curriculum_env_creator,
-        env_kwargs={
-            "num_envs": 1,
-            "width": 400,
-            "height": 600,
-            "curriculum_difficulty_value": difficulty_value,
-        },
-        **vec_kwargs,
+    # Pack agents into one FlappyCurriculum (a single vec_init) per worker so
+    # PufferLib makes one Python step call per worker instead of one per agent.
+    # vec.num_envs now counts env objects; total agents are unchanged.
+    def objects_per_worker(agents_per_worker):
+        if known.env_num_envs == "auto":
+            return 1, agents_per_worker
+        env_num_envs = int(known.env_num_envs)
+        return math.ceil(agents_per_worker / env_num_envs), env_num_envs
+
+    if known.vec_autotune:
+        def build_vecenv(geometry):
+            per_worker, env_num_envs = objects_per_worker(geometry.agents_per_worker)
+            vec_num_envs = per_worker * geometry.num_workers
+            probe_kwargs = dict(
+                vec_kwargs,
+                num_workers=geometry.num_workers,
+                batch_size=vec_num_envs // geometry.async_batches,
+            )
+            return make_vecenv(
+                probe_kwargs, vec_num_envs, env_num_envs, known.env_fixed_difficulty, known.env_engine,
+                known.env_course_bank, known.env_gap_table, physics, known.env_frame_skip, known.env_obs_stack,
+                known.env_restart_prob, known.env_restart_lag,
+            )
+
+        key = (
+            f"flappyv3:{known.env_engine}:{known.env_num_envs}:{vec_kwargs.get('backend')}:{args['train']['device']}"
+            f":{minibatch}:{bptt}:{known.policy_type}:{known.env_obs_stack}"
+        )
+        geometry = autotune(
+            build_vecenv,
+            lambda env: make_flappyv3_policy(env, known.policy_type),
+            args["train"],
+            key,
+            probe_seconds=known.vec_autotune_seconds,
+            refresh=known.vec_autotune_refresh,
+        )
+        torch.set_num_threads(geometry.torch_threads)
+        num_workers = geometry.num_workers
+        per_worker, env_num_envs = objects_per_worker(geometry.agents_per_worker)
+        vec_num_envs = per_worker * num_workers
+        vec_kwargs["num_workers"] = num_workers
+        vec_kwargs["batch_size"] = vec_num_envs // geometry.async_batches
+    else:
+        agents = vec_kwargs["num_envs"]
+        num_workers = int(vec_kwargs.get("num_workers") or 1)
+        per_worker, env_num_envs = objects_per_worker(math.ceil(agents / num_workers))
+        vec_num_envs = per_worker * num_workers
+    print(
+        f"[flappyv3] {vec_num_envs} env objects x {env_num_envs} C envs "
+        f"= {vec_num_envs * env_num_envs} agents over {num_workers} workers"
+    )
+
+    # Fixed difficulty by default; --env.curriculum adaptive reassigns it per
+    # env at epoch boundaries from the episodes the workers write to shared
+    # memory (read without IPC, so evaluate() never waits on it).
+    difficulty_array = multiprocessing.RawArray("f", vec_num_envs * env_num_envs)
+    difficulty_array[:] = [float(known.env_fixed_difficulty)] * len(difficulty_array)
+    episode_buffers = shared_episode_buffers(vec_num_envs, max(1024, 8 * env_num_envs))
+    scheduler = None
+    eval_difficulty = known.env_fixed_difficulty
+    if known.env_curriculum == "adaptive":
+        scheduler = LearningProgressScheduler(
+            difficulty_array, buckets=known.env_curriculum_buckets, success_score=known.env_target_pipes
+        )
+        scheduler.assign()
+        eval_difficulty = 1.0
+    vecenv = make_vecenv(
+        vec_kwargs, vec_num_envs, env_num_envs, known.env_fixed_difficulty, known.env_engine,
+        known.env_course_bank, known.env_gap_table, physics, known.env_frame_skip, known.env_obs_stack,
+        known.env_restart_prob, known.env_restart_lag, difficulty_array, episode_buffers,
     )
 
-    policy = make_flappyv3_lstm_policy(vecenv.driver_env).to(args["train"]["device"])
+    policy = make_flappyv3_policy(vecenv.driver_env, known.policy_type).to(args["train"]["device"])
 
     if known.train_load_checkpoint:
         state_dict = torch.load(known.train_load_checkpoint, map_location=args["train"]["device"])
@@ -119,13 +404,47 @@ def main():
         print(f"Loaded policy from {known.train_load_checkpoint} (fine-tuning)")
 
     trainer = pufferl.PuffeRL(args["train"], vecenv, policy)
+    episodes = EpisodeStream(episode_buffers)
+    target = TimeToTarget(known.env_target_pipes, difficulty=eval_difficulty)
+    # Frames the engines played, from the episode lengths (frames) of finished
+    # episodes; restarted ones are skipped, their length includes the frames
+    # before the state they restarted from
+    frames = 0
 
     while trainer.epoch < trainer.total_epochs:
         trainer.evaluate()
+        records = episodes.read()
+        frames += int(records["episode_length"][records["restarted"] == 0].sum(dtype=np.float64))
+        if scheduler is not None:
+            scheduler.update(records)
+            scheduler.assign()
+        target.update(records, trainer.global_step)
         trainer.train()
         trainer.print_dashboard()
 
     trainer.close()
+    if scheduler is not None:
+        print(f"[flappyv3] adaptive curriculum: {scheduler.summary()}")
+    if target.reached is not None:
+        seconds, step = target.reached
+        print(
+            f"[flappyv3] {known.env_curriculum} schedule reached {known.env_target_pipes:g} mean pipes at difficulty "
+            f"{eval_difficulty:g} after {seconds:.0f}s ({step} steps)"
+        )
+    else:
+        print(
+            f"[flappyv3] {known.env_curriculum} schedule did not reach {known.env_target_pipes:g} mean pipes at "
+            f"difficulty {eval_difficulty:g} (best {target.window}-episode mean {target.best:.1f})"
+        )
+    if known.env_frame_skip > 1:
+        # Dashboard env/episode_length counts frames, env/agent_steps policy steps
+        print(
+            f"[flappyv3] {trainer.global_step} agent steps, {frames} env frames in finished episodes "
+            f"(frame skip {known.env_frame_skip}"
+            + (", restarted episodes not counted" if known.env_restart_prob > 0 else "")
+            + (f", {episodes.dropped} episode records dropped" if episodes.dropped else "")
+            + ")"
+        )
     print(f"Training finished. Check {args['train']['data_dir']}/ for checkpoints.")
 
 